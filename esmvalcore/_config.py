@@ -49,6 +49,25 @@ def read_config_user_file(config_file, recipe_name):
         'profile_diagnostic': False,
         'config_developer_file': None,
         'drs': {},
+        'use_file_index': False,
+        'max_parallel_file_discovery': 1,
+        'read_time_coverage': False,
+        'cache_file_attributes': False,
+        'cache_cmor_tables': False,
+        'max_parallel_initialization': 1,
+        'incremental': False,
+        'preprocessing_cache_dir': None,
+        'preprocessing_cache_max_size': 100,
+        'max_memory': None,
+        'use_task_history': False,
+        'task_executor': 'multiprocessing',
+        'dask_scheduler': None,
+        'realization_audit': None,
+        'streaming_time_window': None,
+        'preprocessing_read_ahead': 0,
+        'intermediary_cubes_steps': None,
+        'intermediary_cubes_region': None,
+        'max_parallel_file_loading': 1,
     }
 
     for key in defaults:
@@ -90,11 +109,18 @@ def read_config_user_file(config_file, recipe_name):
     cfg_developer = read_config_developer_file(cfg['config_developer_file'])
     for key, value in cfg_developer.items():
         CFG[key] = value
-    read_cmor_tables(CFG)
+    read_cmor_tables(CFG, get_cmor_tables_cache_dir(cfg))
 
     return cfg
 
 
+def get_cmor_tables_cache_dir(config_user):
+    """Return the directory where parsed CMOR tables are cached or None."""
+    if not config_user.get('cache_cmor_tables'):
+        return None
+    return os.path.join(config_user['auxiliary_data_dir'], 'cmor_tables')
+
+
 def get_config_user_file():
     """Return user configuration dictionary."""
     return CFG_USER
@@ -9,11 +9,19 @@ import logging
 import os
 import re
 import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 from ._config import get_project_config
+from ._file_index import get_file_index
+from ._file_metadata import covers_period, get_time_coverage
 
 logger = logging.getLogger(__name__)
 
+DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+"""Format of the start_date and end_date of a variable."""
+
 
 def find_files(dirnames, filenames):
     """Find files matching filenames in dirnames."""
@@ -29,21 +37,8 @@ def find_files(dirnames, filenames):
     return result
 
 
-def get_start_end_year(filename):
-    """Get the start and end year from a file name.
-
-    This works for filenames matching
-
-    *[-,_]YYYY*[-,_]YYYY*.*
-      or
-    *[-,_]YYYY*.*
-      or
-    YYYY*[-,_]*.*
-      or
-    YYYY*[-,_]YYYY*[-,_]*.*
-      or
-    YYYY*[-,_]*[-,_]YYYY*.* (Does this make sense? Is this worth catching?)
-    """
+def _get_filename_dates(filename):
+    """Get the date strings from a file name."""
     name = os.path.splitext(filename)[0]
 
     filename = name.split(os.sep)[-1]
@@ -69,26 +64,134 @@ def get_start_end_year(filename):
     ]
 
     if len(dates) == 1:
-        start_year = int(dates[0][:4])
-        end_year = start_year
-    elif len(dates) == 2:
-        start_year, end_year = int(dates[0][:4]), int(dates[1][:4])
-    else:
+        dates = dates * 2
+    if len(dates) != 2:
         raise ValueError('Name {0} dates do not match a recognized '
                          'pattern'.format(name))
 
-    return start_year, end_year
+    return dates
 
 
-def select_files(filenames, start_year, end_year):
+def get_start_end_year(filename):
+    """Get the start and end year from a file name.
+
+    This works for filenames matching
+
+    *[-,_]YYYY*[-,_]YYYY*.*
+      or
+    *[-,_]YYYY*.*
+      or
+    YYYY*[-,_]*.*
+      or
+    YYYY*[-,_]YYYY*[-,_]*.*
+      or
+    YYYY*[-,_]*[-,_]YYYY*.* (Does this make sense? Is this worth catching?)
+    """
+    start, end = _get_filename_dates(filename)
+    return int(start[:4]), int(end[:4])
+
+
+def _parse_filename_date(date, end=False):
+    """Convert a date from a file name to a datetime with day precision.
+
+    If `end` is True, the (exclusive) end of the day, month or year
+    described by `date` is returned instead of its start.
+    """
+    year = int(date[:4])
+    month = int(date[4:6] or 1)
+    day = int(date[6:8] or 1)
+    start = datetime(year, month, day)
+    if not end:
+        return start
+    if len(date) < 6:
+        return datetime(year + 1, 1, 1)
+    if len(date) < 8:
+        return datetime(year + month // 12, month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def get_start_end_date(filename):
+    """Get the start and (exclusive) end date from a file name.
+
+    Dates in the file name are read with a precision of at most a day, e.g.
+    a file named ``tas_185001-185012.nc`` covers the period from 1850-01-01
+    up to 1851-01-01. Dates that are not valid in the standard calendar,
+    e.g. 30 February, are rounded to the year they are in.
+    """
+    start, end = _get_filename_dates(filename)
+    try:
+        return _parse_filename_date(start), _parse_filename_date(end, True)
+    except ValueError:
+        return (_parse_filename_date(start[:4]),
+                _parse_filename_date(end[:4], True))
+
+
+def get_time_period(variable):
+    """Get the start and (exclusive) end date of the requested data.
+
+    These are taken from `start_date` and `end_date` if available and
+    computed from `start_year` and `end_year` otherwise.
+
+    Returns
+    -------
+    tuple(datetime.datetime, datetime.datetime)
+        The start and end date.
+
+    """
+    if 'start_date' in variable:
+        start = datetime.strptime(variable['start_date'], DATE_FORMAT)
+    else:
+        start = datetime(variable['start_year'], 1, 1)
+    if 'end_date' in variable:
+        end = datetime.strptime(variable['end_date'], DATE_FORMAT)
+    else:
+        end = datetime(variable['end_year'] + 1, 1, 1)
+    return start, end
+
+
+def get_end_year(end_date):
+    """Get the last year with data before the (exclusive) end date."""
+    return (end_date - timedelta(seconds=1)).year
+
+
+def _format_date(date):
+    """Format a date for use in a filename."""
+    if date.hour or date.minute or date.second:
+        return date.strftime('%Y%m%dT%H%M%S')
+    return date.strftime('%Y%m%d')
+
+
+def select_files(filenames,
+                 start_year,
+                 end_year,
+                 metadata_cache=None,
+                 start_date=None,
+                 end_date=None):
     """Select files containing data between start_year and end_year.
 
     This works for filenames matching *_YYYY*-YYYY*.* or *_YYYY*.*
+
+    The period can be narrowed down further using `start_date` and
+    (exclusive) `end_date`. If `metadata_cache` is the path to a file
+    metadata cache, the time coordinate of netCDF files is used instead of
+    the filename, so files that only touch the requested period at its
+    edges are not selected. Otherwise, the dates in the filename are used
+    with a precision of at most a day, see :func:`get_start_end_date`.
     """
+    if start_date is None:
+        start_date = datetime(start_year, 1, 1)
+    if end_date is None:
+        end_date = datetime(end_year + 1, 1, 1)
     selection = []
     for filename in filenames:
-        start, end = get_start_end_year(filename)
-        if start <= end_year and end >= start_year:
+        if metadata_cache is not None:
+            coverage = get_time_coverage(filename, metadata_cache)
+            if coverage is not None:
+                if covers_period(coverage, start_date, end_date):
+                    selection.append(filename)
+                continue
+        start, end = get_start_end_date(filename)
+        if start < end_date and end > start_date:
             selection.append(filename)
     return selection
 
@@ -191,26 +294,45 @@ def get_rootpath(rootpath, project):
     raise KeyError('default rootpath must be specified in config-user file')
 
 
-def _find_input_dirs(variable, rootpath, drs):
-    """Return a the full paths to input directories."""
+def _find_matching_dirs(dirname):
+    """Return the existing directories matching the dirname template."""
+    dirname = _resolve_latestversion(dirname)
+    matches = sorted(glob.glob(dirname))
+    matches = [match for match in matches if os.path.isdir(match)]
+    return dirname, matches
+
+
+def _find_input_dirs(variable, rootpath, drs, max_workers=1):
+    """Return a the full paths to input directories.
+
+    If `max_workers` is larger than 1, the file system is searched using
+    that many threads, which can be much faster on network file systems.
+    """
     project = variable['project']
 
     root = get_rootpath(rootpath, project)
     path_template = _select_drs('input_dir', drs, project)
 
+    dirname_templates = [
+        os.path.join(base_path, dirname_template)
+        for dirname_template in _replace_tags(path_template, variable)
+        for base_path in root
+    ]
+    if max_workers > 1 and len(dirname_templates) > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                executor.map(_find_matching_dirs, dirname_templates))
+    else:
+        results = [_find_matching_dirs(d) for d in dirname_templates]
+
     dirnames = []
-    for dirname_template in _replace_tags(path_template, variable):
-        for base_path in root:
-            dirname = os.path.join(base_path, dirname_template)
-            dirname = _resolve_latestversion(dirname)
-            matches = glob.glob(dirname)
-            matches = [match for match in matches if os.path.isdir(match)]
-            if matches:
-                for match in matches:
-                    logger.debug("Found %s", match)
-                    dirnames.append(match)
-            else:
-                logger.debug("Skipping non-existent %s", dirname)
+    for dirname, matches in results:
+        if matches:
+            for match in matches:
+                logger.debug("Found %s", match)
+                dirnames.append(match)
+        else:
+            logger.debug("Skipping non-existent %s", dirname)
 
     return dirnames
 
@@ -222,28 +344,129 @@ def _get_filenames_glob(variable, drs):
     return filenames_glob
 
 
-def _find_input_files(variable, rootpath, drs):
-    input_dirs = _find_input_dirs(variable, rootpath, drs)
+def _find_input_files(variable,
+                      rootpath,
+                      drs,
+                      file_index=None,
+                      max_workers=1):
+    input_dirs = _find_input_dirs(variable, rootpath, drs, max_workers)
     filenames_glob = _get_filenames_glob(variable, drs)
-    files = find_files(input_dirs, filenames_glob)
+    if file_index is None:
+        files = find_files(input_dirs, filenames_glob)
+    else:
+        files = get_file_index(file_index).find_files(input_dirs,
+                                                      filenames_glob)
 
     return files
 
 
-def get_input_filelist(variable, rootpath, drs):
-    """Return the full path to input files."""
-    # change ensemble to fixed r0i0p0 for fx variables
+def _update_fx_ensemble(variable):
+    """Change ensemble to fixed r0i0p0 for CMIP5 fx variables."""
     # this is needed and is not a duplicate effort
     if variable['project'] == 'CMIP5' and variable['frequency'] == 'fx':
         variable['ensemble'] = 'r0i0p0'
-    files = _find_input_files(variable, rootpath, drs)
+
+
+def get_input_filelist(variable,
+                       rootpath,
+                       drs,
+                       file_index=None,
+                       max_workers=1,
+                       metadata_cache=None):
+    """Return the full path to input files.
+
+    If `file_index` is the path to a file index, the files are looked up in
+    the index instead of walking the input directories. The input
+    directories are searched using at most `max_workers` threads. If
+    `metadata_cache` is the path to a file metadata cache, files are
+    selected using their time coordinate instead of their name.
+    """
+    _update_fx_ensemble(variable)
+    files = _find_input_files(variable, rootpath, drs, file_index,
+                              max_workers)
     # do time gating only for non-fx variables
     if variable['frequency'] != 'fx':
+        start_date, end_date = get_time_period(variable)
         files = select_files(files, variable['start_year'],
-                             variable['end_year'])
+                             variable['end_year'], metadata_cache,
+                             start_date, end_date)
     return files
 
 
+def _freeze(value):
+    """Convert lists in a facet value to tuples, so it can be hashed."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class InputFilesCache:
+    """Cache of the input files found by :func:`get_input_filelist`.
+
+    Files are cached by the facets of the variable that are used to find
+    them: the facets appearing in the input directory and file templates of
+    the project, the frequency and the time period, together with the
+    rootpath and the directory structure. This avoids searching the file
+    system again for variables that are requested more than once in a
+    recipe, e.g. the same fx variable for many preprocessor steps.
+    """
+
+    facets = ('project', 'dataset', 'exp', 'ensemble', 'mip', 'short_name',
+              'grid', 'frequency', 'start_year', 'end_year', 'start_date',
+              'end_date')
+    """Facets that are always part of the key."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _get_key(self, variable, rootpath, drs):
+        """Get the key of the files for variable."""
+        project = variable['project']
+        tags = set(self.facets)
+        for input_type in ('input_dir', 'input_file'):
+            template = _select_drs(input_type, drs, project)
+            tags.update(
+                _get_caps_options(tag)[0]
+                for tag in re.findall(r'{([^}]*)}', template))
+        key = tuple((tag, _freeze(variable.get(tag))) for tag in sorted(tags))
+        key += (
+            ('rootpath', tuple(get_rootpath(rootpath, project))),
+            ('drs', drs.get(project, 'default')),
+        )
+        return key
+
+    def get_input_filelist(self,
+                           variable,
+                           rootpath,
+                           drs,
+                           file_index=None,
+                           max_workers=1,
+                           metadata_cache=None):
+        """Return the full path to input files, using the cache if possible.
+
+        See :func:`get_input_filelist` for a description of the arguments.
+        A new list is returned on each call, so it can be modified by the
+        caller.
+        """
+        _update_fx_ensemble(variable)
+        key = self._get_key(variable, rootpath, drs)
+        key += (('file_index', file_index),
+                ('metadata_cache', metadata_cache))
+        with self._lock:
+            if key in self._files:
+                self.hits += 1
+                return list(self._files[key])
+        files = get_input_filelist(variable, rootpath, drs, file_index,
+                                   max_workers, metadata_cache)
+        with self._lock:
+            self.misses += 1
+            self._files[key] = tuple(files)
+        return list(files)
+
+
 def get_output_file(variable, preproc_dir):
     """Return the full path to the output (preprocessed) file."""
     cfg = get_project_config(variable['project'])
@@ -260,7 +483,11 @@ def get_output_file(variable, preproc_dir):
         _replace_tags(cfg['output_file'], variable)[0],
     )
     if variable['frequency'] != 'fx':
-        outfile += '_{start_year}-{end_year}'.format(**variable)
+        if 'start_date' in variable:
+            outfile += '_{}-{}'.format(
+                *(_format_date(d) for d in get_time_period(variable)))
+        else:
+            outfile += '_{start_year}-{end_year}'.format(**variable)
     outfile += '.nc'
     return outfile
 
@@ -0,0 +1,225 @@
+"""Persistent index of the files available in the input data directories."""
+import contextlib
+import fnmatch
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+FILE_INDEX_NAME = 'file_index.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent);
+CREATE TABLE IF NOT EXISTS files (
+    dirname TEXT,
+    filename TEXT,
+    PRIMARY KEY (dirname, filename)
+);
+"""
+
+
+def _below(dirname):
+    """Return the range of paths below dirname.
+
+    All paths starting with `dirname` followed by a path separator sort
+    between the two returned strings. Unlike SQL LIKE, comparing strings is
+    case-sensitive in SQLite.
+    """
+    dirname = dirname.rstrip(os.sep)
+    return (dirname + os.sep, dirname + chr(ord(os.sep) + 1))
+
+
+def get_file_index_path(config_user):
+    """Return the path to the file index or None if it is disabled."""
+    if not config_user.get('use_file_index'):
+        return None
+    return os.path.join(config_user['auxiliary_data_dir'], FILE_INDEX_NAME)
+
+
+class FileIndex:
+    """Index of the files in a directory tree, stored in an SQLite database.
+
+    Each directory is stored together with its modification time, so the
+    index can be refreshed incrementally: only directories that have been
+    modified since they were last indexed are listed again.
+
+    Parameters
+    ----------
+    path: str
+        Path to the SQLite database file. It is created if it does not
+        exist.
+
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection and commit the changes when done."""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def refresh(self, dirname):
+        """Update the index for the directory tree starting at dirname.
+
+        Returns
+        -------
+        int
+            The number of directories that had to be listed.
+
+        """
+        dirname = os.path.abspath(dirname)
+        logger.debug("Refreshing file index %s for %s", self.path, dirname)
+        with self._lock, self._connect() as connection:
+            if not os.path.isdir(dirname):
+                self._remove_tree(connection, dirname)
+                return 0
+            return self._refresh_tree(connection, dirname)
+
+    def _refresh_tree(self, connection, dirname):
+        """Recursively refresh dirname and its subdirectories."""
+        n_listed = 0
+        todo = [dirname]
+        while todo:
+            path = todo.pop()
+            mtime = os.stat(path).st_mtime
+            row = connection.execute(
+                "SELECT mtime FROM directories WHERE path = ?",
+                (path, )).fetchone()
+            if row is not None and row[0] == mtime:
+                subdirs = [
+                    subdir for (subdir, ) in connection.execute(
+                        "SELECT path FROM directories WHERE parent = ?",
+                        (path, ))
+                ]
+            else:
+                subdirs = self._index_directory(connection, path, mtime)
+                n_listed += 1
+            todo.extend(subdirs)
+        return n_listed
+
+    def _index_directory(self, connection, path, mtime):
+        """List the contents of a single directory and store them."""
+        subdirs = []
+        filenames = []
+        for entry in os.scandir(path):
+            # Follow symbolic links, like os.walk(..., followlinks=True)
+            if entry.is_dir():
+                subdirs.append(entry.path)
+            else:
+                filenames.append(entry.name)
+
+        # Remove subdirectories that no longer exist
+        indexed = connection.execute(
+            "SELECT path FROM directories WHERE parent = ?",
+            (path, )).fetchall()
+        for (subdir, ) in indexed:
+            if subdir not in subdirs:
+                self._remove_tree(connection, subdir)
+
+        connection.execute("DELETE FROM files WHERE dirname = ?", (path, ))
+        connection.executemany(
+            "INSERT INTO files (dirname, filename) VALUES (?, ?)",
+            ((path, filename) for filename in filenames))
+        connection.execute(
+            "INSERT OR REPLACE INTO directories (path, parent, mtime) "
+            "VALUES (?, ?, ?)", (path, os.path.dirname(path), mtime))
+        # Newly discovered subdirectories get an invalid mtime, so they
+        # are listed when the caller descends into them.
+        connection.executemany(
+            "INSERT OR IGNORE INTO directories (path, parent, mtime) "
+            "VALUES (?, ?, NULL)", ((subdir, path) for subdir in subdirs))
+        return subdirs
+
+    @staticmethod
+    def _remove_tree(connection, dirname):
+        """Remove dirname and everything below it from the index."""
+        for table, column in (('directories', 'path'), ('files', 'dirname')):
+            connection.execute(
+                "DELETE FROM {0} WHERE {1} = ? OR ({1} >= ? AND {1} < ?)".
+                format(table, column), (dirname, ) + _below(dirname))
+
+    def is_stale(self, dirname):
+        """Check if dirname is missing from the index or was modified."""
+        dirname = os.path.abspath(dirname)
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT mtime FROM directories WHERE path = ?",
+                (dirname, )).fetchone()
+        if not os.path.isdir(dirname):
+            return row is not None
+        return row is None or row[0] != os.stat(dirname).st_mtime
+
+    def find_files(self, dirnames, filenames):
+        """Find files matching filenames in dirnames.
+
+        This is equivalent to :func:`esmvalcore._data_finder.find_files`,
+        but the directories are looked up in the index. A directory is only
+        refreshed if it is not in the index yet or if it was modified, new
+        files in its subdirectories are only found after refreshing the
+        index with :meth:`refresh`.
+        """
+        logger.debug("Looking up files matching %s in %s using index %s",
+                     filenames, dirnames, self.path)
+        result = []
+        for dirname in dirnames:
+            dirname = os.path.abspath(dirname)
+            if self.is_stale(dirname):
+                self.refresh(dirname)
+            with self._connect() as connection:
+                rows = connection.execute(
+                    "SELECT dirname, filename FROM files "
+                    "WHERE dirname = ? OR (dirname >= ? AND dirname < ?) "
+                    "ORDER BY dirname, filename",
+                    (dirname, ) + _below(dirname))
+                for path, filename in rows:
+                    if any(
+                            fnmatch.fnmatch(filename, filename_glob)
+                            for filename_glob in filenames):
+                        result.append(os.path.join(path, filename))
+        return result
+
+
+_FILE_INDICES = {}
+
+
+def get_file_index(path):
+    """Get the FileIndex stored at path, creating it if needed."""
+    if path not in _FILE_INDICES:
+        _FILE_INDICES[path] = FileIndex(path)
+    return _FILE_INDICES[path]
+
+
+def refresh_file_index(config_user):
+    """Refresh the file index for all rootpaths in config_user."""
+    index = get_file_index(
+        os.path.join(config_user['auxiliary_data_dir'], FILE_INDEX_NAME))
+    rootpaths = sorted({
+        path
+        for paths in config_user['rootpath'].values() for path in paths
+    })
+    for rootpath in rootpaths:
+        logger.info("Refreshing file index for %s", rootpath)
+        n_listed = index.refresh(rootpath)
+        logger.info("Listed %s modified directories in %s", n_listed,
+                    rootpath)
+    return index
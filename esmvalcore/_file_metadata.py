@@ -0,0 +1,392 @@
+"""Cache for metadata read from the headers of input files."""
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from netCDF4 import Dataset, num2date
+
+logger = logging.getLogger(__name__)
+
+FILE_METADATA_NAME = 'file_metadata.sqlite'
+
+NETCDF_LOCK = threading.RLock()
+"""Lock to hold while reading netCDF files, netCDF-C is not thread-safe."""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT,
+    kind TEXT,
+    size INTEGER,
+    mtime REAL,
+    value TEXT,
+    PRIMARY KEY (path, kind)
+);
+"""
+
+
+def get_file_metadata_path(config_user):
+    """Return the path to the file metadata cache."""
+    return os.path.join(config_user['auxiliary_data_dir'], FILE_METADATA_NAME)
+
+
+class FileMetadataCache:
+    """Cache of metadata read from files, stored in an SQLite database.
+
+    Entries are keyed by the path of the file and the kind of metadata and
+    are only used if the size and modification time of the file are
+    unchanged since the metadata was read.
+
+    Parameters
+    ----------
+    path: str
+        Path to the SQLite database file. It is created if it does not
+        exist.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._memory = {}
+        self._lock = threading.Lock()
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection and commit the changes when done."""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, filename, kind, read):
+        """Get metadata of a file, reading it with `read` if needed.
+
+        Parameters
+        ----------
+        filename: str
+            Path to the file.
+        kind: str
+            Name of the kind of metadata.
+        read: callable
+            Function that reads the metadata from `filename`. The result
+            must be serializable to JSON.
+
+        Returns
+        -------
+        object
+            The metadata.
+
+        """
+        stat = os.stat(filename)
+        key = (filename, kind)
+        fingerprint = (stat.st_size, stat.st_mtime)
+        with self._lock:
+            if key in self._memory and self._memory[key][0] == fingerprint:
+                return self._memory[key][1]
+
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT size, mtime, value FROM metadata "
+                "WHERE path = ? AND kind = ?", key).fetchone()
+        if row is not None and tuple(row[:2]) == fingerprint:
+            value = json.loads(row[2])
+        else:
+            logger.debug("Reading %s from %s", kind, filename)
+            value = read(filename)
+            with self._connect() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO metadata "
+                    "(path, kind, size, mtime, value) VALUES (?, ?, ?, ?, ?)",
+                    key + fingerprint + (json.dumps(value), ))
+
+        with self._lock:
+            self._memory[key] = (fingerprint, value)
+        return value
+
+
+_FILE_METADATA_CACHES = {}
+
+
+def get_file_metadata_cache(path):
+    """Get the FileMetadataCache stored at path, creating it if needed."""
+    if path not in _FILE_METADATA_CACHES:
+        _FILE_METADATA_CACHES[path] = FileMetadataCache(path)
+    return _FILE_METADATA_CACHES[path]
+
+
+def _find_time_variable(dataset):
+    """Find the time coordinate variable in a netCDF dataset."""
+    for variable in dataset.variables.values():
+        if getattr(variable, 'standard_name', None) == 'time':
+            return variable
+    for variable in dataset.variables.values():
+        if getattr(variable, 'axis', None) == 'T':
+            return variable
+    return dataset.variables.get('time')
+
+
+def read_time_coverage(filename):
+    """Read the time covered by a netCDF file from its time coordinate.
+
+    Only the first and last values of the time coordinate and its bounds
+    are read.
+
+    Returns
+    -------
+    dict or None
+        Dictionary with keys `units`, `calendar`, `start`, `end` and
+        `bounds`, or None if the file has no time coordinate.
+
+    """
+    with NETCDF_LOCK, Dataset(filename, 'r') as dataset:
+        time = _find_time_variable(dataset)
+        if time is None or time.ndim != 1 or time.size == 0:
+            return None
+        bounds = getattr(time, 'bounds', None)
+        if bounds in dataset.variables:
+            bnds = dataset.variables[bounds]
+            values = [bnds[0, 0], bnds[0, 1], bnds[-1, 0], bnds[-1, 1]]
+        else:
+            bounds = None
+            values = [time[0], time[-1]]
+        return {
+            'units': time.units,
+            'calendar': getattr(time, 'calendar', 'standard'),
+            'start': float(min(values)),
+            'end': float(max(values)),
+            'bounds': bounds is not None,
+        }
+
+
+def get_time_coverage(filename, cache_path):
+    """Get the time covered by a file, using the cache at `cache_path`.
+
+    Returns None if the time coverage cannot be read from the file.
+    """
+    if not (os.path.isfile(filename)
+            and os.path.splitext(filename)[1].lower() == '.nc'):
+        return None
+    cache = get_file_metadata_cache(cache_path)
+    try:
+        return cache.get(filename, 'time_coverage', read_time_coverage)
+    except (OSError, AttributeError, ValueError) as exc:
+        logger.debug("Unable to read time coverage of %s: %s", filename, exc)
+        return None
+
+
+def _encode_attribute(value):
+    """Encode a netCDF attribute value, so it can be stored as JSON."""
+    if isinstance(value, np.ndarray):
+        return {'array': value.tolist(), 'dtype': value.dtype.str}
+    if isinstance(value, np.generic):
+        return {'scalar': value.item(), 'dtype': value.dtype.str}
+    if isinstance(value, bytes):
+        return {'bytes': value.decode('latin-1')}
+    return value
+
+
+def _decode_attribute(value):
+    """Decode an attribute value encoded by :func:`_encode_attribute`."""
+    if not isinstance(value, dict):
+        return value
+    if 'bytes' in value:
+        return value['bytes'].encode('latin-1')
+    dtype = np.dtype(value['dtype'])
+    if 'array' in value:
+        return np.array(value['array'], dtype=dtype)
+    return dtype.type(value['scalar'])
+
+
+def read_attributes(filename):
+    """Read the global attributes of a netCDF file."""
+    with NETCDF_LOCK, Dataset(filename, 'r') as dataset:
+        return {
+            attr: dataset.getncattr(attr)
+            for attr in dataset.ncattrs()
+        }
+
+
+def _read_encoded_attributes(filename):
+    """Read the global attributes of a netCDF file, encoded for JSON."""
+    return {
+        attr: _encode_attribute(value)
+        for attr, value in read_attributes(filename).items()
+    }
+
+
+def get_attributes(filename, cache_path=None):
+    """Get the global attributes of a netCDF file.
+
+    If `cache_path` is the path to a file metadata cache, the attributes
+    are stored in and read from that cache. The values are the same as
+    when they are read from the file, e.g. numpy arrays stay numpy arrays.
+    """
+    if cache_path is None:
+        return read_attributes(filename)
+    cache = get_file_metadata_cache(cache_path)
+    attributes = cache.get(filename, 'attributes', _read_encoded_attributes)
+    return {
+        attr: _decode_attribute(value)
+        for attr, value in attributes.items()
+    }
+
+
+def read_data_size(filename):
+    """Read the size in bytes of the variables in a netCDF file in memory.
+
+    Packed variables, i.e. with a `scale_factor` or `add_offset`, are
+    counted as 64 bit floats, because that is how they are unpacked.
+    """
+    size = 0
+    with NETCDF_LOCK, Dataset(filename, 'r') as dataset:
+        for variable in dataset.variables.values():
+            if {'scale_factor', 'add_offset'} & set(variable.ncattrs()):
+                itemsize = 8
+            else:
+                itemsize = getattr(variable.dtype, 'itemsize', 8)
+            size += variable.size * itemsize
+    return size
+
+
+def get_data_size(filename, cache_path=None):
+    """Get the size in bytes of the data in a file when loaded in memory.
+
+    If `cache_path` is the path to a file metadata cache, the size is
+    stored in and read from that cache. For files that cannot be read as
+    netCDF, the size of the file is returned.
+    """
+    if os.path.splitext(filename)[1].lower() == '.nc':
+        try:
+            if cache_path is None:
+                return read_data_size(filename)
+            cache = get_file_metadata_cache(cache_path)
+            return cache.get(filename, 'data_size', read_data_size)
+        except (OSError, AttributeError, ValueError) as exc:
+            logger.debug("Unable to read data size of %s: %s", filename, exc)
+    try:
+        return os.path.getsize(filename)
+    except OSError:
+        return 0
+
+
+def _find_horizontal_variable(dataset, standard_name):
+    """Find the latitude or longitude coordinate in a netCDF dataset."""
+    for variable in dataset.variables.values():
+        if getattr(variable, 'standard_name', None) == standard_name:
+            return variable
+    return dataset.variables.get(standard_name[:3])
+
+
+def read_horizontal_size(filename):
+    """Read the number of points of the horizontal grid of a netCDF file.
+
+    Returns None if the file has no latitude or longitude coordinate.
+    """
+    with NETCDF_LOCK, Dataset(filename, 'r') as dataset:
+        dims = set()
+        for standard_name in ('latitude', 'longitude'):
+            variable = _find_horizontal_variable(dataset, standard_name)
+            if variable is None:
+                return None
+            dims.update(variable.dimensions)
+        size = 1
+        for dim in dims:
+            size *= len(dataset.dimensions[dim])
+        return size
+
+
+def get_horizontal_size(filename, cache_path=None):
+    """Get the number of points of the horizontal grid of a file.
+
+    If `cache_path` is the path to a file metadata cache, the size is
+    stored in and read from that cache. Returns None if the size cannot be
+    read.
+    """
+    if os.path.splitext(filename)[1].lower() != '.nc':
+        return None
+    try:
+        if cache_path is None:
+            return read_horizontal_size(filename)
+        cache = get_file_metadata_cache(cache_path)
+        return cache.get(filename, 'horizontal_size', read_horizontal_size)
+    except (OSError, AttributeError, ValueError) as exc:
+        logger.debug("Unable to read horizontal grid size of %s: %s",
+                     filename, exc)
+        return None
+
+
+def _date_to_tuple(date):
+    """Convert a date to a tuple that can be compared across calendars."""
+    return (date.year, date.month, date.day, date.hour, date.minute,
+            date.second)
+
+
+def get_start_end_date(coverage):
+    """Get the first and last date covered by a file.
+
+    If the time coordinate has bounds, the end date is the (exclusive)
+    upper bound of the last time step.
+    """
+    units, calendar = coverage['units'], coverage['calendar']
+    start = num2date(coverage['start'], units, calendar)
+    end = num2date(coverage['end'], units, calendar)
+    return start, end
+
+
+def covers_period(coverage, start, end):
+    """Check if a file with time coverage has data in [start, end).
+
+    Files whose time bounds only touch the period at its edges are not
+    considered to cover it.
+
+    Parameters
+    ----------
+    coverage: dict
+        Time coverage as returned by :func:`get_time_coverage`.
+    start: datetime.datetime
+        Start of the period.
+    end: datetime.datetime
+        End of the period (exclusive).
+
+    Returns
+    -------
+    bool
+        True if the file covers the period or if the time coverage cannot
+        be converted to dates, e.g. because the time units are broken.
+
+    """
+    try:
+        file_start, file_end = (
+            _date_to_tuple(d) for d in get_start_end_date(coverage))
+    except (ValueError, TypeError) as exc:
+        logger.debug("Unable to convert time coverage %s to dates: %s",
+                     coverage, exc)
+        return True
+    start, end = _date_to_tuple(start), _date_to_tuple(end)
+    if coverage['bounds']:
+        return file_start < end and file_end > start
+    return file_start < end and file_end >= start
+
+
+def get_covered_years(coverage):
+    """Get the years for which a file contains data.
+
+    Raises a :obj:`ValueError` or :obj:`TypeError` if the time coverage
+    cannot be converted to dates.
+    """
+    start, end = get_start_end_date(coverage)
+    end_year = end.year
+    if coverage['bounds'] and _date_to_tuple(end)[1:] == (1, 1, 0, 0, 0):
+        # The last time step ends at the start of end_year.
+        end_year -= 1
+    return range(start.year, end_year + 1)
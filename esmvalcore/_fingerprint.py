@@ -0,0 +1,270 @@
+"""Fingerprints of preprocessing tasks, used to reuse earlier output."""
+import datetime
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+
+from ._provenance import TrackedFile
+from ._version import __version__
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_NAME = 'fingerprint.txt'
+
+
+def _get_file_stat(filename):
+    """Get the size and modification time of a file."""
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+def _normalize(value, preproc_dir, relative=True, file_stat=True):
+    """Convert value to an object that can be serialized to JSON.
+
+    Paths inside `preproc_dir` are made relative to it if `relative` is
+    True and replaced by a placeholder otherwise, so they are the same for
+    every run. If `file_stat` is True, the size and modification time of
+    other existing files are included, so a change to such a file changes
+    the fingerprint.
+    """
+    if isinstance(value, dict):
+        return {
+            str(key): _normalize(item, preproc_dir, relative, file_stat)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [
+            _normalize(item, preproc_dir, relative, file_stat)
+            for item in value
+        ]
+    if isinstance(value, (set, frozenset)):
+        return sorted(
+            str(_normalize(item, preproc_dir, relative, file_stat))
+            for item in value)
+    if isinstance(value, TrackedFile):
+        return _normalize(value.filename, preproc_dir, relative, file_stat)
+    if isinstance(value, str):
+        if value.startswith(preproc_dir + os.sep):
+            if relative:
+                return os.path.relpath(value, preproc_dir)
+            return '{preproc_dir}'
+        if file_stat and os.path.isabs(value) and os.path.isfile(value):
+            return [value, _get_file_stat(value)]
+        return value
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if callable(value):
+        return '{}.{}'.format(
+            getattr(value, '__module__', ''),
+            getattr(value, '__qualname__', type(value).__name__))
+    return repr(value)
+
+
+def _describe_product(product, preproc_dir):
+    """Describe everything the content of a preprocessor output depends on."""
+    ancestors = []
+    for ancestor in product.ancestors:
+        if hasattr(ancestor, 'settings'):
+            # Output of an ancestor preprocessing task
+            ancestors.append(_describe_product(ancestor, preproc_dir))
+        else:
+            ancestors.append([
+                ancestor.filename,
+                _get_file_stat(ancestor.filename),
+            ])
+    return {
+        'filename': _normalize(product.filename, preproc_dir),
+        'attributes': _normalize(product.attributes, preproc_dir),
+        'settings': _normalize(product.settings, preproc_dir),
+        'ancestors': sorted(ancestors, key=str),
+    }
+
+
+def _describe_content(product, preproc_dir):
+    """Describe what the data in a preprocessor output depends on.
+
+    In contrast to :func:`_describe_product`, this does not depend on where
+    the product is stored, so identical data from different recipes has an
+    identical description.
+    """
+    settings = dict(product.settings)
+    settings['save'] = {
+        key: value
+        for key, value in settings.get('save', {}).items()
+        if key != 'filename'
+    }
+    ancestors = []
+    for ancestor in product.ancestors:
+        if hasattr(ancestor, 'settings'):
+            ancestors.append(_describe_content(ancestor, preproc_dir))
+        else:
+            ancestors.append([
+                ancestor.filename,
+                _get_file_stat(ancestor.filename),
+            ])
+    return {
+        'settings': _normalize(settings, preproc_dir, relative=False),
+        'ancestors': sorted(ancestors, key=str),
+    }
+
+
+def get_product_key(product, preproc_dir):
+    """Compute a key identifying the data of a preprocessor output.
+
+    The key is a hash of the ancestor files (path, size and modification
+    time), the preprocessor settings and the version of ESMValCore. It
+    only identifies the data if the product does not depend on other
+    products, i.e. if it has no multi-model steps.
+    """
+    description = {
+        'version': __version__,
+        'product': _describe_content(product, preproc_dir.rstrip(os.sep)),
+    }
+    content = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_output_products(task):
+    """Get the products of a preprocessing task and its statistic products."""
+    products = set(task.products)
+    for product in task.products:
+        settings = product.settings.get('multi_model_statistics', {})
+        products.update(settings.get('output_products', {}).values())
+    return products
+
+
+def get_task_fingerprint(task, preproc_dir):
+    """Compute the fingerprint of a preprocessing task.
+
+    The fingerprint is a hash of the ancestor files (path, size and
+    modification time), the attributes and settings of all products and
+    the version of ESMValCore.
+    """
+    preproc_dir = preproc_dir.rstrip(os.sep)
+    description = {
+        'version': __version__,
+        'products': sorted((_describe_product(p, preproc_dir)
+                            for p in get_output_products(task)),
+                           key=lambda d: d['filename']),
+    }
+    content = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_settings_fingerprint(task, output_dir):
+    """Compute a fingerprint of the settings of a task.
+
+    In contrast to :func:`get_task_fingerprint`, this only depends on the
+    recipe and settings, not on the input data or other files used by the
+    task, and also works for diagnostic tasks. It identifies the same task
+    in different runs of a recipe, e.g. to look up how long it took to run
+    before.
+    """
+    output_dir = output_dir.rstrip(os.sep)
+    description = {}
+    if hasattr(task, 'script'):
+        description['script'] = task.script
+        description['settings'] = _normalize(task.settings,
+                                              output_dir,
+                                              file_stat=False)
+    else:
+        description['products'] = sorted(
+            ({
+                'attributes':
+                _normalize(p.attributes, output_dir, file_stat=False),
+                'settings':
+                _normalize(p.settings, output_dir, file_stat=False),
+            } for p in get_output_products(task)),
+            key=str,
+        )
+    content = json.dumps(description, sort_keys=True)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def get_output_dirs(task):
+    """Get the directories where a preprocessing task writes its output."""
+    return sorted(
+        {os.path.dirname(p.filename)
+         for p in get_output_products(task)})
+
+
+def write_fingerprint(task):
+    """Write the fingerprint of a task to its output directories."""
+    for output_dir in get_output_dirs(task):
+        os.makedirs(output_dir, exist_ok=True)
+        filename = os.path.join(output_dir, FINGERPRINT_NAME)
+        with open(filename, 'w') as file:
+            file.write(task.fingerprint + '\n')
+
+
+def _read_fingerprint(output_dir):
+    """Read the fingerprint stored in a directory."""
+    filename = os.path.join(output_dir, FINGERPRINT_NAME)
+    if not os.path.exists(filename):
+        return None
+    with open(filename) as file:
+        return file.read().strip()
+
+
+def find_previous_preproc_dir(output_dir):
+    """Find the preproc_dir of the latest earlier run of the same recipe.
+
+    Output directories are named after the recipe and the time the run was
+    started, e.g. ``recipe_example_20200101_120000``.
+    """
+    output_dir = output_dir.rstrip(os.sep)
+    parent, name = os.path.split(output_dir)
+    recipe_name = name[:-len('_YYYYMMDD_HHMMSS')]
+    pattern = os.path.join(
+        glob.escape(parent),
+        glob.escape(recipe_name) + '_' + '[0-9]' * 8 + '_' + '[0-9]' * 6)
+    for dirname in sorted(glob.glob(pattern), reverse=True):
+        preproc_dir = os.path.join(dirname, 'preproc')
+        if dirname != output_dir and os.path.isdir(preproc_dir):
+            return preproc_dir
+    return None
+
+
+def get_reusable_files(task, preproc_dir, previous_preproc_dir):
+    """Find output files of an earlier run that can be reused for task.
+
+    Returns
+    -------
+    dict or None
+        Dictionary mapping the output files of the task to the files of the
+        earlier run, or None if the output of the earlier run cannot be
+        reused.
+
+    """
+    for output_dir in get_output_dirs(task):
+        previous_dir = os.path.join(previous_preproc_dir,
+                                    os.path.relpath(output_dir, preproc_dir))
+        if _read_fingerprint(previous_dir) != task.fingerprint:
+            return None
+
+    files = {}
+    for product in get_output_products(task):
+        previous_file = os.path.join(
+            previous_preproc_dir, os.path.relpath(product.filename,
+                                                  preproc_dir))
+        if not os.path.isfile(previous_file):
+            return None
+        files[product.filename] = previous_file
+    return files
+
+
+def link_file(source, target):
+    """Make target a hardlink to source, or a copy if that is not possible."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
@@ -32,6 +32,7 @@ import argparse
 import datetime
 import errno
 import glob
+import itertools
 import logging
 import os
 import shutil
@@ -40,7 +41,7 @@ from multiprocessing import cpu_count
 
 from . import __version__
 from ._config import configure_logging, read_config_user_file, DIAGNOSTICS_PATH
-from ._recipe import TASKSEP, read_recipe_file
+from ._file_index import refresh_file_index
 from ._task import resource_usage_logger
 
 # set up logging
@@ -64,7 +65,8 @@ def get_args():
     parser = argparse.ArgumentParser(
         description=HEADER,
         formatter_class=argparse.RawDescriptionHelpFormatter)
-    parser.add_argument('recipe', help='Path or name of the yaml recipe file')
+    parser.add_argument(
+        'recipe', nargs='?', help='Path or name of the yaml recipe file')
     parser.add_argument(
         '-v',
         '--version',
@@ -98,12 +100,53 @@ def get_args():
         '--diagnostics',
         nargs='*',
         help="Only run the named diagnostics from the recipe.")
+    parser.add_argument(
+        '--refresh-file-index',
+        action='store_true',
+        help="Build or refresh the index of input files in the rootpaths "
+        "from the config file and exit. The index is used when "
+        "use_file_index is enabled in the config file.")
+    parser.add_argument(
+        '--list-fixes',
+        nargs='?',
+        const='',
+        metavar='PROJECT',
+        help="List the available dataset fixes, optionally only those for "
+        "PROJECT, and exit.")
     args = parser.parse_args()
+    if (args.recipe is None and not args.refresh_file_index
+            and args.list_fixes is None):
+        parser.error("the following arguments are required: recipe")
     return args
 
 
+def refresh_index(args):
+    """Build or refresh the input file index and exit."""
+    config_file = os.path.abspath(
+        os.path.expandvars(os.path.expanduser(args.config_file)))
+    cfg = read_config_user_file(config_file, 'file_index')
+    logging.basicConfig(
+        format='%(asctime)s UTC [%(process)d] %(levelname)-7s %(message)s',
+        level=cfg.get('log_level', 'info').upper())
+    index = refresh_file_index(cfg)
+    logger.info("File index is available in %s", index.path)
+
+
+def list_fixes(args):
+    """Print the available dataset fixes and exit."""
+    from .cmor.fix import Fix
+    fixes = Fix.list_fixes(args.list_fixes or None)
+    for (project, dataset), group in itertools.groupby(
+            fixes, key=lambda fix: fix[:2]):
+        print("{}/{}: {}".format(project, dataset,
+                                 ', '.join(fix[2] for fix in group)))
+
+
 def main(args):
     """Define the `esmvaltool` program."""
+    # Imported here, so the scientific libraries used by the preprocessor
+    # are not imported when only printing help or version information
+    from ._recipe import TASKSEP
     recipe = args.recipe
     if not os.path.exists(recipe):
         installed_recipe = os.path.join(
@@ -152,6 +195,14 @@ def main(args):
                     limit.replace('_', '-')))
             cfg[limit] = value
 
+    if cfg.get('incremental') and cfg['remove_preproc_dir']:
+        logger.warning(
+            "Not removing the preproc directory at the end of the run, "
+            "because it is needed to reuse preprocessed data in the next "
+            "run when incremental is enabled. Set remove_preproc_dir to "
+            "false in the config-user.yml file to silence this warning.")
+        cfg['remove_preproc_dir'] = False
+
     resource_log = os.path.join(cfg['run_dir'], 'resource_usage.txt')
     with resource_usage_logger(pid=os.getpid(), filename=resource_log):
         process_recipe(recipe_file=recipe, config_user=cfg)
@@ -185,7 +236,8 @@ def process_recipe(recipe_file, config_user):
     logger.info(
         "If your system hangs during execution, it may not have enough "
         "memory for keeping this number of tasks in memory. In that case, "
-        "try reducing 'max_parallel_tasks' in your user configuration file.")
+        "try reducing 'max_parallel_tasks' or setting 'max_memory' in your "
+        "user configuration file.")
 
     if config_user['compress_netcdf']:
         logger.warning(
@@ -200,6 +252,7 @@ def process_recipe(recipe_file, config_user):
     shutil.copy2(recipe_file, config_user['run_dir'])
 
     # parse recipe
+    from ._recipe import read_recipe_file
     recipe = read_recipe_file(recipe_file, config_user)
     logger.debug("Recipe summary:\n%s", recipe)
 
@@ -225,6 +278,12 @@ def process_recipe(recipe_file, config_user):
 def run():
     """Run the `esmvaltool` program, logging any exceptions."""
     args = get_args()
+    if args.refresh_file_index:
+        refresh_index(args)
+        return
+    if args.list_fixes is not None:
+        list_fixes(args)
+        return
     try:
         conf = main(args)
     except:  # noqa
@@ -0,0 +1,134 @@
+"""Thread-safe access to netCDF files.
+
+The netCDF-C library is not thread-safe, but input files are loaded, lazy
+data is computed and results are saved in several threads at the same
+time. The wrappers in this module hold `NETCDF_LOCK` during each call to
+the netCDF4 library only, so computations never run while holding the
+lock and can overlap with reading and writing files in other threads.
+
+Iris reads and writes netCDF files with the netCDF4 library, so
+:func:`patch_iris` makes Iris use these wrappers too. Lazy values written
+through a wrapper are computed before taking the lock.
+"""
+import functools
+import importlib
+import types
+
+import dask.array as da
+import netCDF4
+
+from ._file_metadata import NETCDF_LOCK
+
+_NETCDF4_TYPES = (
+    netCDF4.Dataset,
+    netCDF4.Group,
+    netCDF4.Variable,
+    netCDF4.Dimension,
+)
+
+# Modules of Iris that access netCDF files
+_IRIS_MODULES = (
+    'iris.fileformats.cf',
+    'iris.fileformats.netcdf',
+    'iris.fileformats.netcdf.loader',
+    'iris.fileformats.netcdf.saver',
+)
+
+
+def _wrap(value):
+    """Wrap netCDF4 objects, also in containers, in `_ThreadSafe`."""
+    if isinstance(value, _NETCDF4_TYPES):
+        return _ThreadSafe(value)
+    if isinstance(value, dict):
+        return type(value)((k, _wrap(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)) and any(
+            isinstance(v, _NETCDF4_TYPES) for v in value):
+        return type(value)(_wrap(v) for v in value)
+    return value
+
+
+def _locked(function):
+    """Hold `NETCDF_LOCK` while calling a netCDF4 function."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with NETCDF_LOCK:
+            return _wrap(function(*args, **kwargs))
+
+    return wrapper
+
+
+class _ThreadSafe:
+    """Hold `NETCDF_LOCK` while accessing a netCDF4 object."""
+
+    __slots__ = ('_wrapped', )
+
+    def __init__(self, wrapped):
+        object.__setattr__(self, '_wrapped', wrapped)
+
+    def __getattr__(self, name):
+        with NETCDF_LOCK:
+            value = getattr(self._wrapped, name)
+        if callable(value):
+            return _locked(value)
+        return _wrap(value)
+
+    def __setattr__(self, name, value):
+        with NETCDF_LOCK:
+            setattr(self._wrapped, name, value)
+
+    def __delattr__(self, name):
+        with NETCDF_LOCK:
+            delattr(self._wrapped, name)
+
+    def __getitem__(self, key):
+        with NETCDF_LOCK:
+            return _wrap(self._wrapped[key])
+
+    def __setitem__(self, key, value):
+        if isinstance(value, da.Array):
+            value = value.compute()
+        with NETCDF_LOCK:
+            self._wrapped[key] = value
+
+    def __len__(self):
+        with NETCDF_LOCK:
+            return len(self._wrapped)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        with NETCDF_LOCK:
+            return repr(self._wrapped)
+
+
+def Dataset(*args, **kwargs):  # pylint: disable=invalid-name
+    """Open a netCDF file, see :class:`netCDF4.Dataset`."""
+    with NETCDF_LOCK:
+        return _ThreadSafe(netCDF4.Dataset(*args, **kwargs))
+
+
+class _ThreadSafeModule(types.ModuleType):
+    """The netCDF4 module, with a thread-safe `Dataset`."""
+
+    Dataset = staticmethod(Dataset)
+
+    def __getattr__(self, name):
+        return getattr(netCDF4, name)
+
+
+_MODULE = _ThreadSafeModule(netCDF4.__name__)
+
+
+def patch_iris():
+    """Make Iris access netCDF files through the thread-safe wrappers."""
+    for name in _IRIS_MODULES:
+        try:
+            module = importlib.import_module(name)
+        except ImportError:
+            continue
+        if getattr(module, 'netCDF4', None) is netCDF4:
+            module.netCDF4 = _MODULE
@@ -0,0 +1,147 @@
+"""Content-addressed cache of preprocessed data, shared between runs."""
+import contextlib
+import logging
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+
+from ._fingerprint import link_file
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_CACHE_INDEX = 'index.sqlite'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    key TEXT PRIMARY KEY,
+    size INTEGER,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS products_last_used ON products (last_used);
+"""
+
+
+def get_product_cache(config_user):
+    """Return the product cache configured in config_user or None."""
+    path = config_user.get('preprocessing_cache_dir')
+    if not path:
+        return None
+    max_size = config_user.get('preprocessing_cache_max_size')
+    return ProductCache(path, max_size)
+
+
+class ProductCache:
+    """Cache of preprocessor output files, addressed by content key.
+
+    The files are stored in a directory, together with an SQLite index of
+    their sizes and the time they were last used. If the total size exceeds
+    `max_size`, the least recently used files are removed. Files are added
+    by atomically renaming them into place, so several runs can use the
+    same cache at the same time.
+
+    Parameters
+    ----------
+    path: str
+        Directory where the cached files are stored. It is created if it
+        does not exist.
+    max_size: float, optional
+        Maximum total size of the cached files in gigabytes. If None, the
+        size of the cache is not limited.
+
+    """
+
+    def __init__(self, path, max_size=None):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_size = None if max_size is None else max_size * 2**30
+        os.makedirs(self.path, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection and commit the changes when done."""
+        connection = sqlite3.connect(
+            os.path.join(self.path, PRODUCT_CACHE_INDEX), timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get_path(self, key):
+        """Get the path where the file with key is stored."""
+        return os.path.join(self.path, key[:2], key + '.nc')
+
+    def link(self, key, target):
+        """Make target a link to the cached file with key, if available.
+
+        Returns
+        -------
+        bool
+            True if the file was available in the cache.
+
+        """
+        path = self.get_path(key)
+        with self._connect() as connection:
+            row = connection.execute("SELECT size FROM products WHERE key = ?",
+                                     (key, )).fetchone()
+        if row is None:
+            return False
+        try:
+            link_file(path, target)
+        except FileNotFoundError:
+            # The file was evicted by another run
+            with self._connect() as connection:
+                connection.execute("DELETE FROM products WHERE key = ?",
+                                   (key, ))
+            return False
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE products SET last_used = ? WHERE key = ?",
+                (time.time(), key))
+        logger.debug("Linked %s from preprocessing cache to %s", path, target)
+        return True
+
+    def publish(self, key, filename):
+        """Add a copy of filename to the cache under key."""
+        path = self.get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        try:
+            os.link(filename, tmp_path)
+        except OSError:
+            shutil.copy2(filename, tmp_path)
+        os.replace(tmp_path, path)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO products (key, size, last_used) "
+                "VALUES (?, ?, ?)", (key, os.path.getsize(path), time.time()))
+        logger.debug("Published %s to preprocessing cache as %s", filename,
+                     path)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used files until the cache fits."""
+        if self.max_size is None:
+            return
+        with self._connect() as connection:
+            # Lock the index while selecting and removing files
+            connection.execute("BEGIN IMMEDIATE")
+            (total, ) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM products").fetchone()
+            rows = connection.execute(
+                "SELECT key, size FROM products ORDER BY last_used").fetchall()
+            evicted = []
+            for key, size in rows:
+                if total <= self.max_size:
+                    break
+                evicted.append(key)
+                total -= size
+            for key in evicted:
+                logger.debug("Removing %s from preprocessing cache", key)
+                connection.execute("DELETE FROM products WHERE key = ?",
+                                   (key, ))
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self.get_path(key))
@@ -9,6 +9,7 @@ from PIL.PngImagePlugin import PngInfo
 from prov.dot import prov_to_dot
 from prov.model import ProvDocument
 
+from ._file_metadata import NETCDF_LOCK
 from ._version import __version__
 
 logger = logging.getLogger(__name__)
@@ -115,18 +116,93 @@ class TrackedFile(object):
         self._filename = filename
         self.attributes = copy.deepcopy(attributes)
 
-        self.provenance = None
-        self.entity = None
-        self.activity = None
+        self._provenance = None
+        self._entity = None
+        self._activity = None
         self._ancestors = [] if ancestors is None else ancestors
 
+        # XML file the provenance can be read from if it is not in memory
+        self._provenance_file = None
+        self._activity_id = None
+
     def __str__(self):
         """Return summary string."""
         return "{}: {}".format(self.__class__.__name__, self.filename)
 
+    @property
+    def provenance(self):
+        """Provenance document, read from file if needed."""
+        if self._provenance is None and self._provenance_file is not None:
+            self._load_provenance()
+        return self._provenance
+
+    @provenance.setter
+    def provenance(self, value):
+        self._provenance = value
+
+    @property
+    def entity(self):
+        """Provenance entity representing the file."""
+        if self._entity is None and self._provenance_file is not None:
+            self._load_provenance()
+        return self._entity
+
+    @entity.setter
+    def entity(self, value):
+        self._entity = value
+
+    @property
+    def activity(self):
+        """Provenance activity that created the file."""
+        if self._activity is None and self._provenance_file is not None:
+            self._load_provenance()
+        return self._activity
+
+    @activity.setter
+    def activity(self, value):
+        self._activity = value
+
+    def _load_provenance(self):
+        """Read the provenance from the XML file."""
+        logger.debug("Reading provenance of %s from %s", self.filename,
+                     self._provenance_file)
+        self._provenance = ProvDocument.deserialize(self._provenance_file,
+                                                    format='xml')
+        self._entity = self._provenance.get_record('file:' +
+                                                   self.filename)[0]
+        self._activity = self._provenance.get_record(self._activity_id)[0]
+
+    def _get_provenance_file(self):
+        """Get the name of the XML file to store the provenance in."""
+        return os.path.splitext(self.filename)[0] + '_provenance.xml'
+
+    def _write_provenance_file(self):
+        """Write the provenance to an XML file."""
+        filename = self._get_provenance_file()
+        self.provenance.serialize(filename, format='xml')
+        self._provenance_file = filename
+        self._activity_id = str(self.activity.identifier)
+
+    def compact(self):
+        """Create a lightweight copy, e.g. to send it to another process.
+
+        The copy does not have ancestors and reads its provenance from the
+        XML file written by :meth:`save_provenance` only when it is needed.
+        The file is written if this was not done yet.
+        """
+        if self._provenance_file is None:
+            if self._provenance is None:
+                raise ValueError(
+                    "Provenance of {} not initialized".format(self))
+            self._write_provenance_file()
+        new = TrackedFile(self.filename, self.attributes)
+        new._provenance_file = self._provenance_file
+        new._activity_id = self._activity_id
+        return new
+
     def copy_provenance(self, target=None):
         """Create a copy with identical provenance information."""
-        if self.provenance is None:
+        if self._provenance is None and self._provenance_file is None:
             raise ValueError("Provenance of {} not initialized".format(self))
         if target is None:
             new = TrackedFile(self.filename, self.attributes)
@@ -136,6 +212,12 @@ class TrackedFile(object):
                     "Attempt to copy provenance to incompatible file.")
             new = target
             new.attributes = copy.deepcopy(self.attributes)
+        if self._provenance is None:
+            # Let the copy read the provenance from file too
+            new.provenance = new.entity = new.activity = None
+            new._provenance_file = self._provenance_file
+            new._activity_id = self._activity_id
+            return new
         new.provenance = copy.deepcopy(self.provenance)
         new.entity = new.provenance.get_record(self.entity.identifier)[0]
         new.activity = new.provenance.get_record(self.activity.identifier)[0]
@@ -146,6 +228,11 @@ class TrackedFile(object):
         """Filename."""
         return self._filename
 
+    @property
+    def ancestors(self):
+        """Files this file was derived from."""
+        return self._ancestors
+
     def initialize_provenance(self, activity):
         """Initialize the provenance document.
 
@@ -214,7 +301,7 @@ class TrackedFile(object):
 
     @staticmethod
     def _include_provenance_nc(filename, attributes):
-        with Dataset(filename, 'a') as dataset:
+        with NETCDF_LOCK, Dataset(filename, 'a') as dataset:
             for key, value in attributes.items():
                 setattr(dataset, key, value)
 
@@ -250,8 +337,8 @@ class TrackedFile(object):
     def save_provenance(self):
         """Export provenance information."""
         self._include_provenance()
+        self._write_provenance_file()
         filename = os.path.splitext(self.filename)[0] + '_provenance'
-        self.provenance.serialize(filename + '.xml', format='xml')
         # Only plot provenance if there are not too many records.
         if len(self.provenance.records) > 100:
             logger.debug("Not plotting large provenance tree of %s",
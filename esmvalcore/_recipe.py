@@ -3,25 +3,37 @@ import fnmatch
 import logging
 import os
 import re
+import threading
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
+from datetime import date, datetime, timedelta
 
 import yaml
-from netCDF4 import Dataset
 
 from . import __version__
 from . import _recipe_checks as check
 from ._config import TAGS, get_activity, get_institutes, replace_tags
-from ._data_finder import (get_input_filelist, get_output_file,
-                           get_statistic_output_file)
+from ._data_finder import (DATE_FORMAT, InputFilesCache, get_end_year,
+                           get_input_filelist, get_output_file,
+                           get_statistic_output_file, get_time_period)
+from ._file_index import get_file_index_path
+from ._fingerprint import (find_previous_preproc_dir, get_product_key,
+                           get_settings_fingerprint,
+                           get_reusable_files, get_task_fingerprint)
+from ._file_metadata import get_attributes, get_file_metadata_path
+from ._product_cache import get_product_cache
 from ._provenance import TrackedFile, get_recipe_provenance
 from ._recipe_checks import RecipeError
-from ._task import (DiagnosticTask, get_flattened_tasks, get_independent_tasks,
-                    run_tasks)
+from ._task import (DiagnosticTask, get_executor, get_flattened_tasks,
+                    get_independent_tasks, run_tasks,
+                    set_critical_path_priority)
+from ._task_history import (TaskHistory, estimate_runtimes,
+                            get_task_history_path)
 from .cmor.table import CMOR_TABLES
 from .preprocessor import (DEFAULT_ORDER, FINAL_STEPS, INITIAL_STEPS,
                            MULTI_MODEL_FUNCTIONS, PreprocessingTask,
-                           PreprocessorFile)
+                           PreprocessorFile, get_step_blocks)
 from .preprocessor._derive import get_required
 from .preprocessor._download import synda_search
 from .preprocessor._io import DATASET_KEYS, concatenate_callback
@@ -32,6 +44,9 @@ logger = logging.getLogger(__name__)
 
 TASKSEP = os.sep
 
+# Held while loading the reference dataset of extract_levels
+_REFERENCE_LEVELS_LOCK = threading.Lock()
+
 
 def ordered_safe_load(stream):
     """Load a YAML file using OrderedDict instead of dict."""
@@ -136,6 +151,48 @@ def _add_cmor_info(variable, override=False):
     check.variable(variable, required_keys=cmor_keys)
 
 
+def _parse_date(value):
+    """Parse a date from the recipe."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M',
+                '%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M'):
+        try:
+            return datetime.strptime(str(value), fmt)
+        except ValueError:
+            pass
+    raise RecipeError(
+        "Unable to parse date '{}', use the format YYYY-MM-DD or "
+        "YYYY-MM-DDThh:mm:ss".format(value))
+
+
+def _update_time_period(variable, max_years=None):
+    """Set start and end year from start and end date, if available."""
+    keys = ('start_date', 'end_date')
+    if not any(key in variable for key in keys):
+        return
+    if not all(key in variable for key in keys):
+        raise RecipeError(
+            "Both start_date and end_date need to be specified for variable "
+            "{} of dataset {}".format(variable.get('short_name'),
+                                      variable.get('dataset')))
+    start, end = (_parse_date(variable[key]) for key in keys)
+    if max_years is not None:
+        end = min(end, datetime(start.year + max_years, 1, 1))
+    if end <= start:
+        raise RecipeError(
+            "The end_date {} should be later than the start_date {} for "
+            "variable {} of dataset {}".format(end, start,
+                                               variable.get('short_name'),
+                                               variable.get('dataset')))
+    variable['start_date'] = start.strftime(DATE_FORMAT)
+    variable['end_date'] = end.strftime(DATE_FORMAT)
+    variable['start_year'] = start.year
+    variable['end_year'] = get_end_year(end)
+
+
 def _special_name_to_dataset(variable, special_name):
     """Convert special names to dataset names."""
     if special_name in ('reference_dataset', 'alternative_dataset'):
@@ -154,7 +211,11 @@ def _special_name_to_dataset(variable, special_name):
     return special_name
 
 
-def _update_target_levels(variable, variables, settings, config_user):
+def _update_target_levels(variable,
+                          variables,
+                          settings,
+                          config_user,
+                          input_files_cache=None):
     """Replace the target levels dataset name with a filename if needed."""
     levels = settings.get('extract_levels', {}).get('levels')
     if not levels:
@@ -179,15 +240,23 @@ def _update_target_levels(variable, variables, settings, config_user):
             del settings['extract_levels']
         else:
             variable_data = _get_dataset_info(dataset, variables)
-            filename = \
-                _dataset_to_file(variable_data, config_user)
-            settings['extract_levels']['levels'] = get_reference_levels(
-                filename, variable_data['project'], dataset,
-                variable_data['short_name'],
-                os.path.splitext(variable_data['filename'])[0] + '_fixed')
-
-
-def _update_target_grid(variable, variables, settings, config_user):
+            filename = _dataset_to_file(variable_data, config_user,
+                                        input_files_cache)
+            # Products are initialized in threads and the fixed files are
+            # shared by all variables using the same reference dataset.
+            with _REFERENCE_LEVELS_LOCK:
+                settings['extract_levels']['levels'] = get_reference_levels(
+                    filename, variable_data['project'], dataset,
+                    variable_data['short_name'],
+                    os.path.splitext(variable_data['filename'])[0] +
+                    '_fixed')
+
+
+def _update_target_grid(variable,
+                        variables,
+                        settings,
+                        config_user,
+                        input_files_cache=None):
     """Replace the target grid dataset name with a filename if needed."""
     grid = settings.get('regrid', {}).get('target_grid')
     if not grid:
@@ -199,7 +268,8 @@ def _update_target_grid(variable, variables, settings, config_user):
         del settings['regrid']
     elif any(grid == v['dataset'] for v in variables):
         settings['regrid']['target_grid'] = _dataset_to_file(
-            _get_dataset_info(grid, variables), config_user)
+            _get_dataset_info(grid, variables), config_user,
+            input_files_cache)
     else:
         # Check that MxN grid spec is correct
         parse_cell_spec(settings['regrid']['target_grid'])
@@ -230,20 +300,22 @@ def _augment(base, update):
             base[key] = update[key]
 
 
-def _dataset_to_file(variable, config_user):
+def _dataset_to_file(variable, config_user, input_files_cache=None):
     """Find the first file belonging to dataset from variable info."""
-    files = _get_input_files(variable, config_user)
+    files = _get_input_files(variable, config_user, input_files_cache)
     if not files and variable.get('derive'):
         required_vars = get_required(variable['short_name'],
                                      variable['project'])
         for required_var in required_vars:
             _augment(required_var, variable)
             _add_cmor_info(required_var, override=True)
-            files = _get_input_files(required_var, config_user)
+            files = _get_input_files(required_var, config_user,
+                                     input_files_cache)
             if files:
                 variable = required_var
                 break
-    check.data_availability(files, variable)
+    check.data_availability(files, variable,
+                            _get_time_coverage_cache(config_user))
     return files[0]
 
 
@@ -314,13 +386,22 @@ def _get_default_settings(variable, config_user, derive=False):
 
     # Configure time extraction
     if 'start_year' in variable and 'end_year' in variable:
+        start, end = get_time_period(variable)
+        if 'start_date' in variable:
+            # Only load the requested time steps from disk
+            settings['load']['start_date'] = start
+            settings['load']['end_date'] = end
+            if end.time():
+                # extract_time has a resolution of one day
+                end = datetime(end.year, end.month,
+                               end.day) + timedelta(days=1)
         settings['extract_time'] = {
-            'start_year': variable['start_year'],
-            'end_year': variable['end_year'] + 1,
-            'start_month': 1,
-            'end_month': 1,
-            'start_day': 1,
-            'end_day': 1,
+            'start_year': start.year,
+            'end_year': end.year,
+            'start_month': start.month,
+            'end_month': end.month,
+            'start_day': start.day,
+            'end_day': end.day,
         }
 
     if derive:
@@ -384,7 +465,10 @@ def _add_fxvar_keys(fx_var_dict, variable):
     return fx_variable
 
 
-def _get_correct_fx_file(variable, fx_varname, config_user):
+def _get_correct_fx_file(variable,
+                         fx_varname,
+                         config_user,
+                         input_files_cache=None):
     """Wrapper to standard file getter to recover the correct fx file."""
     var = dict(variable)
     if var['project'] in ['CMIP5', 'OBS', 'OBS6', 'obs4mips']:
@@ -404,7 +488,7 @@ def _get_correct_fx_file(variable, fx_varname, config_user):
         raise RecipeError(
             f"Project {var['project']} not supported with fx variables")
 
-    fx_files = _get_input_files(fx_var, config_user)
+    fx_files = _get_input_files(fx_var, config_user, input_files_cache)
     # allow for empty lists corrected for by NE masks
     if fx_files:
         fx_files = fx_files[0]
@@ -416,7 +500,10 @@ def _get_correct_fx_file(variable, fx_varname, config_user):
     return fx_files
 
 
-def _update_fx_settings(settings, variable, config_user):
+def _update_fx_settings(settings,
+                        variable,
+                        config_user,
+                        input_files_cache=None):
     """Find and set the FX mask settings."""
     # update for landsea
     if 'mask_landsea' in settings:
@@ -428,7 +515,8 @@ def _update_fx_settings(settings, variable, config_user):
         if variable['project'] != 'obs4mips':
             fx_vars.append('sftof')
         for fx_var in fx_vars:
-            fx_files = _get_correct_fx_file(variable, fx_var, config_user)
+            fx_files = _get_correct_fx_file(variable, fx_var, config_user,
+                                            input_files_cache)
             if fx_files:
                 settings['mask_landsea']['fx_files'].append(fx_files)
 
@@ -436,7 +524,9 @@ def _update_fx_settings(settings, variable, config_user):
         logger.debug('Getting fx mask settings now...')
         settings['mask_landseaice']['fx_files'] = []
         fx_files_dict = {
-            'sftgif': _get_correct_fx_file(variable, 'sftgif', config_user)}
+            'sftgif': _get_correct_fx_file(variable, 'sftgif', config_user,
+                                           input_files_cache)
+        }
         if fx_files_dict['sftgif']:
             settings['mask_landseaice']['fx_files'].append(
                 fx_files_dict['sftgif'])
@@ -446,30 +536,48 @@ def _update_fx_settings(settings, variable, config_user):
             var = dict(variable)
             var['fx_files'] = settings.get(step, {}).get('fx_files')
             fx_files_dict = {
-                fxvar: _get_correct_fx_file(variable, fxvar, config_user)
+                fxvar: _get_correct_fx_file(variable, fxvar, config_user,
+                                            input_files_cache)
                 for fxvar in var['fx_files']}
             settings[step]['fx_files'] = fx_files_dict
 
 
-def _read_attributes(filename):
+def _read_attributes(filename, config_user):
     """Read the attributes from a netcdf file."""
-    attributes = {}
     if not (os.path.exists(filename)
             and os.path.splitext(filename)[1].lower() == '.nc'):
-        return attributes
+        return {}
 
-    with Dataset(filename, 'r') as dataset:
-        for attr in dataset.ncattrs():
-            attributes[attr] = dataset.getncattr(attr)
-    return attributes
+    cache_path = None
+    if config_user.get('cache_file_attributes'):
+        cache_path = get_file_metadata_path(config_user)
+    return get_attributes(filename, cache_path)
+
+
+def _get_time_coverage_cache(config_user):
+    """Return the metadata cache to use for reading time coverage."""
+    if config_user.get('read_time_coverage'):
+        return get_file_metadata_path(config_user)
+    return None
 
 
-def _get_input_files(variable, config_user):
-    """Get the input files for a single dataset (locally and via download)."""
-    input_files = get_input_filelist(
+def _get_input_files(variable, config_user, input_files_cache=None):
+    """Get the input files for a single dataset (locally and via download).
+
+    If `input_files_cache` is an :class:`InputFilesCache`, it is used to
+    avoid searching for the same files more than once.
+    """
+    if input_files_cache is None:
+        find_input_files = get_input_filelist
+    else:
+        find_input_files = input_files_cache.get_input_filelist
+    input_files = find_input_files(
         variable=variable,
         rootpath=config_user['rootpath'],
-        drs=config_user['drs'])
+        drs=config_user['drs'],
+        file_index=get_file_index_path(config_user),
+        max_workers=config_user.get('max_parallel_file_discovery', 1),
+        metadata_cache=_get_time_coverage_cache(config_user))
 
     # Set up downloading using synda if requested.
     # Do not download if files are already available locally.
@@ -479,20 +587,21 @@ def _get_input_files(variable, config_user):
     return input_files
 
 
-def _get_ancestors(variable, config_user):
+def _get_ancestors(variable, config_user, input_files_cache=None):
     """Get the input files for a single dataset and setup provenance."""
-    input_files = _get_input_files(variable, config_user)
+    input_files = _get_input_files(variable, config_user, input_files_cache)
 
     logger.info("Using input files for variable %s of dataset %s:\n%s",
                 variable['short_name'], variable['dataset'],
                 '\n'.join(input_files))
     if (not config_user.get('skip-nonexistent')
             or variable['dataset'] == variable.get('reference_dataset')):
-        check.data_availability(input_files, variable)
+        check.data_availability(input_files, variable,
+                                _get_time_coverage_cache(config_user))
 
     # Set up provenance tracking
     for i, filename in enumerate(input_files):
-        attributes = _read_attributes(filename)
+        attributes = _read_attributes(filename, config_user)
         input_files[i] = TrackedFile(filename, attributes)
 
     return input_files
@@ -630,9 +739,146 @@ def _match_products(products, variables):
     return grouped_products
 
 
-def _get_preprocessor_products(variables, profile, order, ancestor_products,
-                               config_user):
-    """Get preprocessor product definitions for a set of datasets."""
+class _DeferredLogs(logging.Filter):
+    """Filter that holds back the log records emitted by worker threads.
+
+    The records are collected per thread, so they can be handled later, in
+    the same order as a serial run would have emitted them. Records from
+    other threads, and records that are handled again from another thread,
+    are passed on immediately.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._records = {}
+
+    def filter(self, record):
+        records = self._records.get(record.thread)
+        if records is None or record.thread != threading.get_ident():
+            return True
+        # The same record is passed to the filter of each handler
+        if not records or records[-1] is not record:
+            records.append(record)
+        return False
+
+    def call(self, records, function, *args):
+        """Call function, storing the log records it emits in records."""
+        thread = threading.get_ident()
+        self._records[thread] = records
+        try:
+            return function(*args)
+        finally:
+            del self._records[thread]
+
+
+def _get_log_handlers():
+    """Get all handlers that are attached to a logger."""
+    loggers = [logging.getLogger()] + [
+        logger for logger in logging.Logger.manager.loggerDict.values()
+        if isinstance(logger, logging.Logger)
+    ]
+    return {handler for logger in loggers for handler in logger.handlers}
+
+
+def _map_in_threads(function, items, max_workers=1):
+    """Apply function to items using a pool of at most max_workers threads.
+
+    The results are returned and the log messages are emitted in the order
+    of the items, so the outcome is the same as for a serial run. If
+    function raises an exception for an item, the exception is raised
+    after the log messages of all preceding items have been emitted.
+    """
+    if max_workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    deferred = _DeferredLogs()
+    handlers = _get_log_handlers()
+    for handler in handlers:
+        handler.addFilter(deferred)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            jobs = []
+            for item in items:
+                records = []
+                future = executor.submit(deferred.call, records, function,
+                                         item)
+                jobs.append((records, future))
+            results = []
+            try:
+                for records, future in jobs:
+                    future.exception()  # wait for the item to be done
+                    for record in records:
+                        logging.getLogger(record.name).handle(record)
+                    results.append(future.result())
+            except BaseException:
+                for _, future in jobs:
+                    future.cancel()
+                raise
+    finally:
+        for handler in handlers:
+            handler.removeFilter(deferred)
+    return results
+
+
+def _get_preprocessor_product(variable,
+                              variables,
+                              profile,
+                              grouped_ancestors,
+                              config_user,
+                              input_files_cache=None):
+    """Get the preprocessor product definition for a single dataset."""
+    settings = _get_default_settings(
+        variable,
+        config_user,
+        derive='derive' in profile,
+    )
+    _apply_preprocessor_profile(settings, profile)
+    _update_multi_dataset_settings(variable, settings)
+    _update_target_levels(
+        variable=variable,
+        variables=variables,
+        settings=settings,
+        config_user=config_user,
+        input_files_cache=input_files_cache,
+    )
+    _update_extract_shape(settings, config_user)
+    _update_fx_settings(
+        settings=settings, variable=variable,
+        config_user=config_user,
+        input_files_cache=input_files_cache)
+    _update_target_grid(
+        variable=variable,
+        variables=variables,
+        settings=settings,
+        config_user=config_user,
+        input_files_cache=input_files_cache,
+    )
+    _update_regrid_time(variable, settings)
+    ancestors = grouped_ancestors.get(variable['filename'])
+    if not ancestors:
+        ancestors = _get_ancestors(variable, config_user, input_files_cache)
+        if config_user.get('skip-nonexistent') and not ancestors:
+            logger.info("Skipping: no data found for %s", variable)
+            return None
+    product = PreprocessorFile(
+        attributes=variable,
+        settings=settings,
+        ancestors=ancestors,
+    )
+    return product
+
+
+def _get_preprocessor_products(variables,
+                               profile,
+                               order,
+                               ancestor_products,
+                               config_user,
+                               input_files_cache=None):
+    """Get preprocessor product definitions for a set of datasets.
+
+    The products are created using at most `max_parallel_initialization`
+    threads, as specified in the user configuration.
+    """
     products = set()
 
     for variable in variables:
@@ -644,43 +890,16 @@ def _get_preprocessor_products(variables, profile, order, ancestor_products,
     else:
         grouped_ancestors = {}
 
-    for variable in variables:
-        settings = _get_default_settings(
-            variable,
-            config_user,
-            derive='derive' in profile,
-        )
-        _apply_preprocessor_profile(settings, profile)
-        _update_multi_dataset_settings(variable, settings)
-        _update_target_levels(
-            variable=variable,
-            variables=variables,
-            settings=settings,
-            config_user=config_user,
-        )
-        _update_extract_shape(settings, config_user)
-        _update_fx_settings(
-            settings=settings, variable=variable,
-            config_user=config_user)
-        _update_target_grid(
-            variable=variable,
-            variables=variables,
-            settings=settings,
-            config_user=config_user,
-        )
-        _update_regrid_time(variable, settings)
-        ancestors = grouped_ancestors.get(variable['filename'])
-        if not ancestors:
-            ancestors = _get_ancestors(variable, config_user)
-            if config_user.get('skip-nonexistent') and not ancestors:
-                logger.info("Skipping: no data found for %s", variable)
-                continue
-        product = PreprocessorFile(
-            attributes=variable,
-            settings=settings,
-            ancestors=ancestors,
-        )
-        products.add(product)
+    def get_product(variable):
+        return _get_preprocessor_product(variable, variables, profile,
+                                         grouped_ancestors, config_user,
+                                         input_files_cache)
+
+    for product in _map_in_threads(
+            get_product, variables,
+            config_user.get('max_parallel_initialization', 1)):
+        if product is not None:
+            products.add(product)
 
     _update_statistic_settings(products, order, config_user['preproc_dir'])
 
@@ -690,11 +909,100 @@ def _get_preprocessor_products(variables, profile, order, ancestor_products,
     return products
 
 
+def _has_multi_model_steps(product):
+    """Check if a product depends on other products."""
+    return any(step in product.settings for step in MULTI_MODEL_FUNCTIONS)
+
+
+def _split_preprocessing_task(task, recipe_entity):
+    """Apply the single-model steps of each product in a task of its own.
+
+    The steps up to the first multi-model step are applied to each product
+    by a new task, which saves the result to an intermediate file. The
+    original task loads the products from those files and only applies the
+    remaining steps. If the task has no multi-model steps, the new tasks
+    compute the products completely and they are only linked.
+
+    Returns
+    -------
+    list of PreprocessingTask
+        The new tasks, they have been added to the ancestors of `task`.
+    """
+    if task.reused_files:
+        return []
+    products = sorted(
+        (p for p in task.products if not (p.cached or p.copy_of)),
+        key=lambda p: p.filename)
+    steps = {step for product in task.products for step in product.settings}
+    blocks = get_step_blocks(steps, task.order)
+    if (len(products) < 2 or not blocks
+            or blocks[0][0] in MULTI_MODEL_FUNCTIONS):
+        return []
+
+    single_model = len(blocks) == 1
+    end = 'save' if single_model else blocks[1][0]
+    unit_steps = task.order[:task.order.index(end)]
+
+    units = []
+    for product in products:
+        dirname = os.path.splitext(product.filename)[0] + '_single_model'
+        filename = os.path.join(dirname, os.path.basename(product.filename))
+        settings = {
+            step: deepcopy(product.settings[step])
+            for step in unit_steps if step in product.settings
+        }
+        # The filename to save to is set by PreprocessorFile
+        settings['save'] = (deepcopy(product.settings['save'])
+                            if single_model else {})
+        if 'cleanup' in product.settings:
+            settings['cleanup'] = deepcopy(product.settings['cleanup'])
+        attributes = dict(product.attributes)
+        attributes['filename'] = filename
+        unit_product = PreprocessorFile(attributes, settings,
+                                        list(product.ancestors))
+
+        if single_model:
+            # The product is complete, so it can be linked
+            unit_product.cache = product.cache
+            unit_product.cache_key = product.cache_key
+            product.copy_of = filename
+        else:
+            product.files = [filename]
+            product.computed_steps = set(unit_steps)
+        if not task.debug:
+            # Keep the intermediary cubes, which are saved in this directory
+            cleanup = product.settings.setdefault('cleanup', {})
+            cleanup['remove'] = list(cleanup.get('remove', [])) + [dirname]
+
+        unit = PreprocessingTask(
+            [unit_product],
+            ancestors=[
+                t for t in task.ancestors
+                if any(a in t.products for a in product.ancestors)
+            ],
+            name=task.name + TASKSEP + os.path.basename(dirname),
+            order=task.order,
+            debug=task.debug,
+            debug_steps=task.debug_steps,
+            debug_region=task.debug_region,
+            realization_audit=task.realization_audit,
+            streaming_time_window=task.streaming_time_window,
+            read_ahead=task.read_ahead,
+            load_workers=task.load_workers,
+        )
+        unit.priority = task.priority
+        unit.initialize_provenance(recipe_entity)
+        task.ancestors.append(unit)
+        units.append(unit)
+    return units
+
+
 def _get_single_preprocessor_task(variables,
                                   profile,
                                   config_user,
                                   name,
-                                  ancestor_tasks=None):
+                                  ancestor_tasks=None,
+                                  input_files_cache=None):
     """Create preprocessor tasks for a set of datasets w/ special case fx."""
     if ancestor_tasks is None:
         ancestor_tasks = []
@@ -711,6 +1019,7 @@ def _get_single_preprocessor_task(variables,
         order=order,
         ancestor_products=ancestor_products,
         config_user=config_user,
+        input_files_cache=input_files_cache,
     )
 
     if not products:
@@ -723,7 +1032,13 @@ def _get_single_preprocessor_task(variables,
         name=name,
         order=order,
         debug=config_user['save_intermediary_cubes'],
+        debug_steps=config_user.get('intermediary_cubes_steps'),
+        debug_region=config_user.get('intermediary_cubes_region'),
         write_ncl_interface=config_user['write_ncl_interface'],
+        realization_audit=config_user.get('realization_audit'),
+        streaming_time_window=config_user.get('streaming_time_window'),
+        read_ahead=config_user.get('preprocessing_read_ahead') or 0,
+        load_workers=config_user.get('max_parallel_file_loading', 1),
     )
 
     logger.info("PreprocessingTask %s created. It will create the files:\n%s",
@@ -770,7 +1085,9 @@ def _split_derive_profile(profile):
     return before, after
 
 
-def _get_derive_input_variables(variables, config_user):
+def _get_derive_input_variables(variables,
+                                config_user,
+                                input_files_cache=None):
     """Determine the input sets of `variables` needed for deriving."""
     derive_input = {}
 
@@ -786,7 +1103,8 @@ def _get_derive_input_variables(variables, config_user):
         group_prefix = variable['variable_group'] + '_derive_input_'
         if not variable.get('force_derivation') and _get_input_files(
                 variable,
-                config_user):
+                config_user,
+                input_files_cache):
             # No need to derive, just process normally up to derive step
             var = deepcopy(variable)
             append(group_prefix, var)
@@ -797,7 +1115,8 @@ def _get_derive_input_variables(variables, config_user):
             for var in required_vars:
                 _augment(var, variable)
                 _add_cmor_info(var, override=True)
-                files = _get_input_files(var, config_user)
+                files = _get_input_files(var, config_user,
+                                         input_files_cache)
                 if var.get('optional') and not files:
                     logger.info(
                         "Skipping: no data found for %s which is marked as "
@@ -810,7 +1129,11 @@ def _get_derive_input_variables(variables, config_user):
     return derive_input
 
 
-def _get_preprocessor_task(variables, profiles, config_user, task_name):
+def _get_preprocessor_task(variables,
+                           profiles,
+                           config_user,
+                           task_name,
+                           input_files_cache=None):
     """Create preprocessor task(s) for a set of datasets."""
     # First set up the preprocessor profile
     variable = variables[0]
@@ -831,7 +1154,8 @@ def _get_preprocessor_task(variables, profiles, config_user, task_name):
     if variable.get('derive'):
         # Create tasks to prepare the input data for the derive step
         derive_profile, profile = _split_derive_profile(profile)
-        derive_input = _get_derive_input_variables(variables, config_user)
+        derive_input = _get_derive_input_variables(variables, config_user,
+                                                   input_files_cache)
 
         for derive_variables in derive_input.values():
             for derive_variable in derive_variables:
@@ -843,6 +1167,7 @@ def _get_preprocessor_task(variables, profiles, config_user, task_name):
                 derive_profile,
                 config_user,
                 name=derive_name,
+                input_files_cache=input_files_cache,
             )
             derive_tasks.append(task)
 
@@ -853,6 +1178,7 @@ def _get_preprocessor_task(variables, profiles, config_user, task_name):
         config_user,
         ancestor_tasks=derive_tasks,
         name=task_name,
+        input_files_cache=input_files_cache,
     )
 
     return task
@@ -873,6 +1199,7 @@ class Recipe:
         self._cfg = deepcopy(config_user)
         self._cfg['write_ncl_interface'] = self._need_ncl(
             raw_recipe['diagnostics'])
+        self._input_files_cache = InputFilesCache()
         self._filename = os.path.basename(recipe_file)
         self._preprocessors = raw_recipe.get('preprocessors', {})
         if 'default' not in self._preprocessors:
@@ -984,6 +1311,7 @@ class Recipe:
             if ('cmor_table' not in variable
                     and variable.get('project') in CMOR_TABLES):
                 variable['cmor_table'] = variable['project']
+            _update_time_period(variable, self._cfg.get('max_years'))
             if 'end_year' in variable and 'max_years' in self._cfg:
                 variable['end_year'] = min(
                     variable['end_year'],
@@ -1228,6 +1556,7 @@ class Recipe:
                     profiles=self._preprocessors,
                     config_user=self._cfg,
                     task_name=task_name,
+                    input_files_cache=self._input_files_cache,
                 )
                 for task0 in task.flatten():
                     task0.priority = priority
@@ -1272,16 +1601,179 @@ class Recipe:
         for task in tasks:
             task.initialize_provenance(self.entity)
 
+        if self._cfg.get('incremental'):
+            self._find_reusable_output(tasks)
+        self._link_cached_products(tasks)
+        self._deduplicate_products(tasks)
+        if self._cfg['max_parallel_tasks'] != 1:
+            self._split_preprocessing_tasks(tasks)
+
+        cache = self._input_files_cache
+        logger.info(
+            "Looked up input files %s times, of which %s times in the "
+            "recipe-wide cache", cache.hits + cache.misses, cache.hits)
+
         # TODO: check that no loops are created (will throw RecursionError)
 
         # Return smallest possible set of tasks
         return get_independent_tasks(tasks)
 
+    def _find_reusable_output(self, tasks):
+        """Find preprocessor output of an earlier run that can be reused."""
+        preproc_dir = self._cfg['preproc_dir']
+        previous_preproc_dir = find_previous_preproc_dir(
+            self._cfg['output_dir'])
+        if previous_preproc_dir is None:
+            logger.info("No earlier run found to reuse preprocessed data from")
+        else:
+            logger.info("Reusing unchanged preprocessed data from %s",
+                        previous_preproc_dir)
+        for task in tasks:
+            if not isinstance(task, PreprocessingTask):
+                continue
+            task.fingerprint = get_task_fingerprint(task, preproc_dir)
+            if previous_preproc_dir is not None:
+                task.reused_files = get_reusable_files(
+                    task, preproc_dir, previous_preproc_dir)
+                if task.reused_files is None:
+                    logger.info("Inputs of task %s changed, it will be run",
+                                task.name)
+
+    def _link_cached_products(self, tasks):
+        """Link preprocessor output available in the preprocessing cache."""
+        cache = get_product_cache(self._cfg)
+        if cache is None or self._cfg.get('save_intermediary_cubes'):
+            return
+        n_products = n_cached = 0
+        for task in tasks:
+            if not isinstance(task, PreprocessingTask) or task.reused_files:
+                continue
+            for product in task.products:
+                # Products that depend on other products cannot be cached
+                if _has_multi_model_steps(product):
+                    continue
+                product.cache = cache
+                product.cache_key = get_product_key(product,
+                                                    self._cfg['preproc_dir'])
+                product.cached = cache.link(product.cache_key,
+                                            product.filename)
+                n_products += 1
+                n_cached += product.cached
+        logger.info("Found %s of %s preprocessed files in the preprocessing "
+                    "cache %s", n_cached, n_products, cache.path)
+
+    def _deduplicate_products(self, tasks):
+        """Compute products that are identical in several tasks only once.
+
+        A product that is identical to a product of a task created earlier
+        is linked to that product's output file instead of being computed.
+        """
+        preprocessing_tasks = sorted(
+            (t for t in tasks
+             if isinstance(t, PreprocessingTask) and not t.reused_files),
+            key=lambda t: (t.priority, t.name))
+        duplicates = {}
+        for task in preprocessing_tasks:
+            for product in sorted(task.products, key=lambda p: p.filename):
+                if product.cached or _has_multi_model_steps(product):
+                    continue
+                key = product.cache_key or get_product_key(
+                    product, self._cfg['preproc_dir'])
+                duplicates.setdefault(key, []).append((task, product))
+
+        for products in duplicates.values():
+            source_task, source = products[0]
+            for task, product in products[1:]:
+                # Only depend on tasks created earlier to avoid cycles
+                if task.priority == source_task.priority:
+                    continue
+                logger.info(
+                    "Preprocessed file %s is identical to %s, it will be "
+                    "linked instead of computed again", product.filename,
+                    source.filename)
+                product.copy_of = source.filename
+                if source_task not in task.ancestors:
+                    task.ancestors.append(source_task)
+
+    def _split_preprocessing_tasks(self, tasks):
+        """Apply the single-model steps to the products in parallel."""
+        n_units = 0
+        for task in tasks:
+            if isinstance(task, PreprocessingTask):
+                n_units += len(_split_preprocessing_task(task, self.entity))
+        if n_units:
+            logger.info(
+                "Created %s tasks to apply the single-model preprocessing "
+                "steps to each dataset in parallel", n_units)
+
     def __str__(self):
         """Get human readable summary."""
         return '\n\n'.join(str(task) for task in self.tasks)
 
+    def _estimate_memory(self):
+        """Estimate the memory needed by each preprocessing task."""
+        cache_path = get_file_metadata_path(self._cfg)
+        for task in get_flattened_tasks(self.tasks):
+            if isinstance(task, PreprocessingTask):
+                task.memory = task.estimate_memory(cache_path)
+                logger.debug("Estimated memory use of task %s: %.1f GB",
+                             task.name, task.memory / 2**30)
+
+    def _read_task_history(self, history):
+        """Prioritize tasks using their runtime and memory use in earlier runs.
+
+        The runtime of tasks that were not run before is estimated from the
+        size of their input data.
+        """
+        cache_path = get_file_metadata_path(self._cfg)
+        runtimes = {}
+        sizes = {}
+        for task in get_flattened_tasks(self.tasks):
+            task.settings_fingerprint = get_settings_fingerprint(
+                task, self._cfg['output_dir'])
+            if isinstance(task, PreprocessingTask):
+                if task.reused_files:
+                    continue
+                sizes[task] = task.get_input_data_size(cache_path)
+            record = history.get(task.name, task.settings_fingerprint)
+            if record is not None:
+                runtimes[task], memory = record
+                if memory:
+                    task.memory = memory
+                logger.debug(
+                    "Task %s took %.1f seconds and %.1f GB in its last run",
+                    task.name, runtimes[task], (memory or 0) / 2**30)
+        set_critical_path_priority(self.tasks,
+                                   estimate_runtimes(runtimes, sizes))
+
+    def _write_task_history(self, history):
+        """Store the runtime and memory use of the tasks that were run."""
+        history.add((task.name, task.settings_fingerprint, task.runtime,
+                     task.peak_memory)
+                    for task in get_flattened_tasks(self.tasks)
+                    if task.runtime is not None
+                    and not getattr(task, 'reused_files', None))
+
     def run(self):
         """Run all tasks in the recipe."""
-        run_tasks(self.tasks,
-                  max_parallel_tasks=self._cfg['max_parallel_tasks'])
+        max_memory = self._cfg.get('max_memory')
+        if max_memory is not None and self._cfg['max_parallel_tasks'] != 1:
+            self._estimate_memory()
+        history = None
+        if self._cfg.get('use_task_history'):
+            history = TaskHistory(get_task_history_path(self._cfg))
+            self._read_task_history(history)
+        if history is not None or max_memory is not None:
+            for task in get_flattened_tasks(self.tasks):
+                task.track_memory = True
+        executor = get_executor(self._cfg)
+        try:
+            run_tasks(self.tasks,
+                      max_parallel_tasks=self._cfg['max_parallel_tasks'],
+                      max_memory=max_memory,
+                      executor=executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if history is not None:
+                self._write_task_history(history)
@@ -6,6 +6,7 @@ import subprocess
 import yamale
 
 from ._data_finder import get_start_end_year
+from ._file_metadata import get_covered_years, get_time_coverage
 from ._task import get_flattened_tasks, which
 from .preprocessor import PreprocessingTask
 
@@ -90,8 +91,12 @@ def variable(var, required_keys):
                 missing, var.get('short_name'), var.get('diagnostic')))
 
 
-def data_availability(input_files, var):
-    """Check if the required input data is available."""
+def data_availability(input_files, var, metadata_cache=None):
+    """Check if the required input data is available.
+
+    If `metadata_cache` is the path to a file metadata cache, the years
+    available in netCDF files are read from their time coordinate.
+    """
     if not input_files:
         raise RecipeError("No input files found for variable {}".format(var))
 
@@ -103,6 +108,16 @@ def data_availability(input_files, var):
     available_years = set()
 
     for filename in input_files:
+        coverage = None
+        if metadata_cache is not None:
+            coverage = get_time_coverage(filename, metadata_cache)
+        if coverage is not None:
+            try:
+                available_years.update(get_covered_years(coverage))
+                continue
+            except (ValueError, TypeError) as exc:
+                logger.debug("Unable to get years covered by %s: %s",
+                             filename, exc)
         start, end = get_start_end_year(filename)
         available_years.update(range(start, end + 1))
 
@@ -2,13 +2,17 @@
 import contextlib
 import datetime
 import errno
+import heapq
+import itertools
 import logging
 import numbers
 import os
 import pprint
+import queue
 import subprocess
 import threading
 import time
+from concurrent.futures import Executor, Future
 from copy import deepcopy
 from multiprocessing import Pool
 
@@ -125,6 +129,45 @@ def resource_usage_logger(pid, filename, interval=1, children=True):
         thread.join()
 
 
+def _get_rss(process):
+    """Get the resident memory of a process and its children in bytes."""
+    memory = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            memory += proc.memory_info().rss
+        except (OSError, psutil.AccessDenied, psutil.NoSuchProcess):
+            pass
+    return memory
+
+
+@contextlib.contextmanager
+def peak_memory_tracker(interval=0.1):
+    """Track the peak resident memory of this process and its children.
+
+    Yields a dict, its key 'peak' holds the peak memory use in bytes once
+    the block is done. The memory that was in use when the block started,
+    e.g. by imported modules or earlier tasks, is not counted.
+    """
+    process = psutil.Process()
+    start = _get_rss(process)
+    result = {'peak': 0}
+    halt = threading.Event()
+
+    def _sample():
+        while True:
+            result['peak'] = max(result['peak'], _get_rss(process) - start)
+            if halt.wait(interval):
+                return
+
+    thread = threading.Thread(target=_sample, daemon=True)
+    thread.start()
+    try:
+        yield result
+    finally:
+        halt.set()
+        thread.join()
+
+
 def _py2ncl(value, var_name=''):
     """Format a structure of Python list/dict/etc items as NCL."""
     txt = var_name + ' = ' if var_name else ''
@@ -209,6 +252,10 @@ class BaseTask:
         self.name = name
         self.activity = None
         self.priority = 0
+        self.memory = None
+        self.runtime = None
+        self.track_memory = False
+        self.peak_memory = None
 
     def initialize_provenance(self, recipe_entity):
         """Initialize task provenance activity."""
@@ -235,8 +282,14 @@ class BaseTask:
             logger.info("Starting task %s in process [%s]", self.name,
                         os.getpid())
             start = datetime.datetime.now()
-            self.output_files = self._run(input_files)
+            if self.track_memory:
+                with peak_memory_tracker() as memory:
+                    self.output_files = self._run(input_files)
+                self.peak_memory = memory['peak']
+            else:
+                self.output_files = self._run(input_files)
             runtime = datetime.datetime.now() - start
+            self.runtime = runtime.total_seconds()
             logger.info("Successfully completed task %s (priority %s) in %s",
                         self.name, self.priority, runtime)
 
@@ -599,12 +652,177 @@ def get_independent_tasks(tasks):
     return independent_tasks
 
 
-def run_tasks(tasks, max_parallel_tasks=None):
-    """Run tasks."""
-    if max_parallel_tasks == 1:
+def set_critical_path_priority(tasks, runtimes):
+    """Prioritize the tasks that are on the longest path to the end.
+
+    The priority of each task is set to its rank when the tasks are sorted
+    by the expected time needed to run the task and all tasks depending on
+    it, longest first, so long chains of tasks are started early and the
+    last tasks to finish run in parallel with as many others as possible.
+    Ties are broken by the original priority.
+
+    Parameters
+    ----------
+    tasks: iterable of BaseTask
+        Tasks to prioritize, their ancestors are prioritized too.
+    runtimes: dict
+        Expected runtime of each task in seconds. Tasks that are not in
+        the dict are assumed to take no time.
+    """
+    all_tasks = get_flattened_tasks(tasks)
+    dependents = {task: [] for task in all_tasks}
+    for task in all_tasks:
+        for ancestor in set(task.ancestors):
+            dependents[ancestor].append(task)
+
+    path_length = {}
+
+    def get_path_length(task):
+        if task not in path_length:
+            path_length[task] = runtimes.get(task, 0) + max(
+                (get_path_length(t) for t in dependents[task]), default=0)
+        return path_length[task]
+
+    ranked = sorted(all_tasks,
+                    key=lambda t: (-get_path_length(t), t.priority))
+    for priority, task in enumerate(ranked):
+        task.priority = priority
+
+
+class PoolExecutor(Executor):
+    """Executor that runs tasks in a :class:`multiprocessing.Pool`.
+
+    This is the default executor for running tasks in parallel.
+
+    Parameters
+    ----------
+    max_workers: int
+        Number of worker processes.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._pool = Pool(processes=max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` in a worker process."""
+        future = Future()
+        self._pool.apply_async(fn,
+                               args,
+                               kwargs,
+                               callback=future.set_result,
+                               error_callback=future.set_exception)
+        return future
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes."""
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+
+class DaskExecutor(Executor):
+    """Executor that runs tasks on a Dask distributed cluster.
+
+    The input and output directories must be available to all workers at
+    the same paths.
+
+    Parameters
+    ----------
+    address: str, optional
+        Address of the scheduler of the cluster. If None, a
+        :class:`dask.distributed.LocalCluster` is started with `n_workers`
+        worker processes, that each run one task at a time.
+    n_workers: int, optional
+        Number of workers of the local cluster. If None, the number of CPUs
+        is used.
+    """
+
+    def __init__(self, address=None, n_workers=None):
+        # Imported here, because distributed takes long to import and is an
+        # optional dependency
+        try:
+            from dask.distributed import Client, LocalCluster
+        except ImportError as exc:
+            raise ImportError(
+                "Running tasks with task_executor 'dask' requires the "
+                "'distributed' package, install it with 'pip install "
+                "esmvalcore[dask]' or 'conda install distributed'") from exc
+        if address is None:
+            self._cluster = LocalCluster(
+                n_workers=n_workers or os.cpu_count(),
+                threads_per_worker=1,
+                processes=True,
+                memory_limit=0,
+            )
+            address = self._cluster
+        else:
+            self._cluster = None
+        self._client = Client(address, set_as_default=False)
+        logger.info("Running tasks on Dask cluster %s, dashboard: %s",
+                    self._client.scheduler.address,
+                    self._client.dashboard_link)
+
+    @property
+    def max_workers(self):
+        """Number of tasks the workers of the cluster can run at once."""
+        return sum(self._client.nthreads().values())
+
+    def submit(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on a worker."""
+        return self._client.submit(fn, *args, pure=False, **kwargs)
+
+    def shutdown(self, wait=True):
+        """Disconnect from the cluster and stop it if it was started."""
+        self._client.close()
+        if self._cluster is not None:
+            self._cluster.close()
+
+
+def get_executor(config_user):
+    """Create the executor for running tasks configured in config_user.
+
+    Returns None if the default :class:`PoolExecutor` should be used.
+    """
+    name = config_user.get('task_executor', 'multiprocessing')
+    if name == 'multiprocessing':
+        return None
+    if name == 'dask':
+        return DaskExecutor(config_user.get('dask_scheduler'),
+                            n_workers=config_user.get('max_parallel_tasks'))
+    raise ValueError(
+        "Unknown task_executor '{}', choose from 'multiprocessing' and "
+        "'dask'".format(name))
+
+
+def run_tasks(tasks, max_parallel_tasks=None, max_memory=None,
+              executor=None):
+    """Run tasks.
+
+    Parameters
+    ----------
+    tasks: iterable of BaseTask
+        Tasks to run, their ancestors are run too.
+    max_parallel_tasks: int, optional
+        Maximum number of tasks to run at the same time. If None, the number
+        of workers of the executor, given by its `max_workers` attribute,
+        or the number of CPUs is used.
+    max_memory: float, optional
+        Only start a task if the estimated memory use of the running tasks,
+        i.e. the sum of their `memory` attributes, stays below this number
+        of gigabytes. A task that does not fit is started when no other
+        tasks are running.
+    executor: concurrent.futures.Executor, optional
+        Executor used to run the tasks in parallel, e.g. a
+        :class:`DaskExecutor`. The caller is responsible for shutting it
+        down. If None, a :class:`PoolExecutor` is used.
+    """
+    if max_parallel_tasks == 1 and executor is None:
         _run_tasks_sequential(tasks)
     else:
-        _run_tasks_parallel(tasks, max_parallel_tasks)
+        if max_memory is not None:
+            max_memory *= 2**30
+        _run_tasks_parallel(tasks, max_parallel_tasks, max_memory, executor)
 
 
 def _run_tasks_sequential(tasks):
@@ -617,71 +835,133 @@ def _run_tasks_sequential(tasks):
         task.run()
 
 
-def _run_tasks_parallel(tasks, max_parallel_tasks=None):
-    """Run tasks in parallel."""
-    scheduled = get_flattened_tasks(tasks)
-    running = {}
+def _run_tasks_parallel(tasks,
+                        max_parallel_tasks=None,
+                        max_memory=None,
+                        executor=None):
+    """Run tasks in parallel.
+
+    Tasks are submitted to the executor as soon as all their ancestors are
+    done, in order of priority. The executor notifies the scheduler when a
+    task is done, so no time is spent waiting in between. If `max_memory`
+    (in bytes) is given, tasks that would exceed it wait. The memory of the
+    waiting task with the highest priority is reserved, so smaller tasks
+    with a lower priority are only started if they do not delay it.
+    """
+    all_tasks = get_flattened_tasks(tasks)
+    n_tasks = len(all_tasks)
+
+    # Number of ancestors of each task that are not done yet
+    waiting_for = {task: len(set(task.ancestors)) for task in all_tasks}
+    dependents = {task: [] for task in all_tasks}
+    for task in all_tasks:
+        for ancestor in set(task.ancestors):
+            dependents[ancestor].append(task)
 
-    n_scheduled, n_running = len(scheduled), len(running)
-    n_tasks = n_scheduled
+    # Heap of tasks that can be started, ordered by priority
+    ready = []
+    order = itertools.count()
+
+    def add_ready(task):
+        heapq.heappush(ready, (task.priority, next(order), task))
+
+    for task in all_tasks:
+        if not waiting_for[task]:
+            add_ready(task)
 
     if max_parallel_tasks is None:
-        max_parallel_tasks = os.cpu_count()
+        max_parallel_tasks = (getattr(executor, 'max_workers', None)
+                              or os.cpu_count())
     if max_parallel_tasks > n_tasks:
         max_parallel_tasks = n_tasks
     logger.info("Running %s tasks using %s processes", n_tasks,
                 max_parallel_tasks)
 
-    def done(task):
-        """Assume a task is done if it not scheduled or running."""
-        return not (task in scheduled or task in running)
-
-    pool = Pool(processes=max_parallel_tasks)
-    while scheduled or running:
-        # Submit new tasks to pool
-        for task in sorted(scheduled, key=lambda t: t.priority):
-            if len(running) >= max_parallel_tasks:
-                break
-            if all(done(t) for t in task.ancestors):
-                future = pool.apply_async(_run_task, [task])
-                running[task] = future
-                scheduled.remove(task)
-
-        # Handle completed tasks
-        ready = {t for t in running if running[t].ready()}
-        for task in ready:
-            _copy_results(task, running[task])
-            running.pop(task)
-
-        # Wait if there are still tasks running
-        if running:
-            time.sleep(0.1)
-
-        # Log progress message
-        if len(scheduled) != n_scheduled or len(running) != n_running:
-            n_scheduled, n_running = len(scheduled), len(running)
-            n_done = n_tasks - n_scheduled - n_running
+    own_executor = executor is None
+    if own_executor:
+        executor = PoolExecutor(max_parallel_tasks)
+    finished = queue.Queue()
+    running = {}
+    n_done = 0
+    progress = None
+    memory_in_use = 0
+
+    def fits(task, reserved=0):
+        if max_memory is None or not running:
+            return True
+        return memory_in_use + reserved + (task.memory or 0) <= max_memory
+
+    def submit(task):
+        nonlocal memory_in_use
+        memory_in_use += task.memory or 0
+
+        running[task] = executor.submit(_run_task, task)
+        running[task].add_done_callback(lambda _: finished.put(task))
+
+    def log_progress():
+        nonlocal progress
+        if progress != (len(running), n_done):
+            progress = (len(running), n_done)
             logger.info(
                 "Progress: %s tasks running, %s tasks waiting for ancestors, "
-                "%s/%s done", n_running, n_scheduled, n_done, n_tasks)
-
-    pool.close()
-    pool.join()
-
-
-def _copy_results(task, future):
+                "%s/%s done", len(running), n_tasks - len(running) - n_done,
+                n_done, n_tasks)
+
+    while ready or running:
+        # Submit new tasks to the executor
+        waiting = []
+        reserved = 0
+        while ready and len(running) < max_parallel_tasks:
+            entry = heapq.heappop(ready)
+            if fits(entry[-1], reserved):
+                submit(entry[-1])
+            else:
+                if not waiting:
+                    # Keep the memory free for the highest priority task
+                    reserved = entry[-1].memory or 0
+                waiting.append(entry)
+        for entry in waiting:
+            heapq.heappush(ready, entry)
+        if waiting:
+            logger.debug(
+                "Not starting %s tasks, they do not fit in the %s GB of "
+                "memory left", len(waiting),
+                round((max_memory - memory_in_use) / 2**30, 1))
+        log_progress()
+
+        # Wait for a task to complete and release the tasks depending on it
+        task = finished.get()
+        _copy_results(task, running.pop(task).result())
+        memory_in_use -= task.memory or 0
+        n_done += 1
+        for dependent in dependents[task]:
+            waiting_for[dependent] -= 1
+            if not waiting_for[dependent]:
+                add_ready(dependent)
+    log_progress()
+
+    if own_executor:
+        executor.shutdown()
+
+
+def _copy_results(task, result):
     """Update task with the results from the remote process."""
-    task.output_files, updated_products = future.get()
+    (task.output_files, updated_products, task.runtime,
+     task.peak_memory) = result
+    originals = {product.filename: product for product in task.products}
     for updated in updated_products:
-        for original in task.products:
-            if original.filename == updated.filename:
-                updated.copy_provenance(target=original)
-                break
+        if updated.filename in originals:
+            updated.copy_provenance(target=originals[updated.filename])
         else:
             task.products.add(updated)
 
 
 def _run_task(task):
-    """Run task and return the result."""
+    """Run task and return the result.
+
+    Only lightweight copies of the products are returned, their provenance
+    is written to file and read by the main process when it is needed.
+    """
     output_files = task.run()
-    return output_files, task.products
+    products = [product.compact() for product in task.products]
+    return output_files, products, task.runtime, task.peak_memory
@@ -0,0 +1,125 @@
+"""History of the runtime and memory use of tasks, used for scheduling."""
+import contextlib
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+TASK_HISTORY_NAME = 'task_history.sqlite'
+
+# Rate in bytes of input data per second at which tasks are assumed to run
+# if none of the tasks were run before.
+DEFAULT_THROUGHPUT = 2**26
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    name TEXT,
+    key TEXT,
+    runtime REAL,
+    memory INTEGER,
+    last_run REAL,
+    PRIMARY KEY (name, key)
+);
+"""
+
+
+def get_task_history_path(config_user):
+    """Return the path to the task history."""
+    return os.path.join(config_user['auxiliary_data_dir'], TASK_HISTORY_NAME)
+
+
+def estimate_runtimes(runtimes, sizes):
+    """Estimate the runtime of tasks that were not run before.
+
+    The runtime of a new task is estimated from the size of its input data,
+    using the average rate at which the tasks that were run before
+    processed their input data.
+
+    Parameters
+    ----------
+    runtimes: dict
+        Runtime in seconds of the tasks that were run before.
+    sizes: dict
+        Size in bytes of the input data of tasks.
+
+    Returns
+    -------
+    dict
+        The runtime of all tasks in `runtimes` or `sizes`.
+    """
+    known = [task for task in runtimes if sizes.get(task)]
+    if known:
+        rate = (sum(runtimes[task] for task in known) /
+                sum(sizes[task] for task in known))
+    else:
+        rate = 1 / DEFAULT_THROUGHPUT
+    estimates = {task: size * rate for task, size in sizes.items()}
+    estimates.update(runtimes)
+    return estimates
+
+
+class TaskHistory:
+    """Runtime and peak memory use of tasks in earlier runs.
+
+    Entries are keyed by the name of the task and a fingerprint of its
+    settings, only the most recent run of each task is kept.
+
+    Parameters
+    ----------
+    path: str
+        Path to the SQLite database file. It is created if it does not
+        exist.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        dirname = os.path.dirname(path)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection and commit the changes when done."""
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def get(self, name, key):
+        """Get the runtime and memory use of a task in its last run.
+
+        Returns
+        -------
+        tuple or None
+            The runtime in seconds and the peak memory use in bytes, or
+            None if the task was not run before.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT runtime, memory FROM tasks "
+                "WHERE name = ? AND key = ?", (name, key)).fetchone()
+        return None if row is None else tuple(row)
+
+    def add(self, records):
+        """Store the runtime and memory use of tasks.
+
+        Parameters
+        ----------
+        records: iterable of tuple
+            Tuples of task name, settings fingerprint, runtime in seconds
+            and peak memory use in bytes.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO tasks "
+                "(name, key, runtime, memory, last_run) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [record + (now, ) for record in map(tuple, records)])
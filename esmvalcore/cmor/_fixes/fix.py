@@ -1,7 +1,29 @@
 """Contains the base class for dataset fixes"""
+import functools
 import importlib
 import os
 import inspect
+import pkgutil
+
+
+@functools.lru_cache()
+def _get_fix_classes(project, dataset):
+    """Get the classes in the fixes module of a dataset by lowercase name."""
+    try:
+        fixes_module = importlib.import_module(
+            'esmvalcore.cmor._fixes.{0}.{1}'.format(project, dataset))
+    except ImportError:
+        return {}
+    classes = inspect.getmembers(fixes_module, inspect.isclass)
+    return dict((name.lower(), value) for name, value in classes)
+
+
+@functools.lru_cache()
+def _get_fixes(project, dataset, variable):
+    """Instantiate the fixes for a dataset and variable once."""
+    classes = _get_fix_classes(project, dataset)
+    return tuple(classes[fix_name]() for fix_name in ('allvars', variable)
+                 if fix_name in classes)
 
 
 class Fix(object):
@@ -130,6 +152,9 @@ class Fix(object):
         dataset: str
         variable: str
 
+        The fixes are looked up and instantiated only once for each
+        project, dataset and variable, so repeated calls are cheap.
+
         Returns
         -------
         list(Fix)
@@ -138,22 +163,47 @@ class Fix(object):
         project = project.replace('-', '_').lower()
         dataset = dataset.replace('-', '_').lower()
         variable = variable.replace('-', '_').lower()
+        return list(_get_fixes(project, dataset, variable))
+
+    @staticmethod
+    def list_fixes(project=None):
+        """
+        List the available fixes.
+
+        Parameters
+        ----------
+        project: str, optional
+            Only list the fixes for this project.
+
+        Returns
+        -------
+        list(tuple(str, str, str))
+            Sorted list of the project, dataset and name of each fix. The
+            project and dataset are the names of the package and module
+            containing the fix.
+        """
+        package = importlib.import_module('esmvalcore.cmor._fixes')
+        projects = [
+            info.name for info in pkgutil.iter_modules(package.__path__)
+            if info.ispkg
+        ]
+        if project is not None:
+            project = project.replace('-', '_').lower()
+            projects = [name for name in projects if name == project]
 
         fixes = []
-        try:
-            fixes_module = importlib.import_module(
-                'esmvalcore.cmor._fixes.{0}.{1}'.format(project, dataset))
-
-            classes = inspect.getmembers(fixes_module, inspect.isclass)
-            classes = dict((name.lower(), value) for name, value in classes)
-            for fix_name in ('allvars', variable):
-                try:
-                    fixes.append(classes[fix_name]())
-                except KeyError:
-                    pass
-        except ImportError:
-            pass
-        return fixes
+        for project_name in projects:
+            project_package = importlib.import_module(
+                'esmvalcore.cmor._fixes.{0}'.format(project_name))
+            for info in pkgutil.iter_modules(project_package.__path__):
+                classes = _get_fix_classes(project_name, info.name)
+                for name, fix_class in classes.items():
+                    # Skip the base class and classes imported under an alias
+                    if (issubclass(fix_class, Fix) and fix_class is not Fix
+                            and name == fix_class.__name__.lower()):
+                        fixes.append(
+                            (project_name, info.name, fix_class.__name__))
+        return sorted(fixes)
 
     @staticmethod
     def get_fixed_filepath(output_dir, filepath):
@@ -5,28 +5,129 @@ Read variable information from CMOR 2 and CMOR 3 tables and make it easily
 available for the other components of ESMValTool
 """
 from functools import total_ordering
+import contextlib
 import copy
 import errno
 import glob
+import hashlib
 import json
 import logging
 import os
+import pickle
+import threading
+import uuid
+
+from .._version import __version__
 
 logger = logging.getLogger(__name__)
 
 CMOR_TABLES = {}
 """dict of str, obj: CMOR info objects."""
 
+CACHE_DIR = None
+"""str: Directory where parsed CMOR tables are cached, None to disable.
+
+This is set by :func:`read_cmor_tables`.
+"""
+
+_LOAD_LOCK = threading.RLock()
+
+
+def _get_cache_file(name, files):
+    """Get the name of the cache file for tables parsed from files.
+
+    The name depends on the version of ESMValCore and on the path, size and
+    modification time of the files, so a cache file is never used for
+    tables that changed since it was written.
+    """
+    if CACHE_DIR is None:
+        return None
+    description = [__version__, pickle.HIGHEST_PROTOCOL, name]
+    for filename in sorted(files) + [__file__]:
+        stat = os.stat(filename)
+        description.append((filename, stat.st_size, stat.st_mtime_ns))
+    key = hashlib.sha256(repr(description).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, key + '.pickle')
+
+
+def _is_trusted(filename):
+    """Check that a cache file was written by the current user."""
+    if not hasattr(os, 'getuid'):
+        return True
+    return os.stat(filename).st_uid == os.getuid()
+
+
+def _read_cached(name, files, read):
+    """Read parsed tables from the cache, or parse them using read.
 
-def read_cmor_tables(cfg_developer):
+    Cache files that are owned by another user are not unpickled.
+    """
+    cache_file = _get_cache_file(name, files)
+    if cache_file is not None and os.path.exists(cache_file):
+        if not _is_trusted(cache_file):
+            logger.warning(
+                "Not reading CMOR table cache %s, because it is owned by "
+                "another user", cache_file)
+            cache_file = None
+    if cache_file is not None and os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'rb') as file:
+                return pickle.load(file)
+        except Exception as exc:
+            logger.debug("Unable to read CMOR table cache %s: %s",
+                         cache_file, exc)
+
+    result = read()
+
+    if cache_file is not None:
+        tmp_file = '{}.{}.tmp'.format(cache_file, uuid.uuid4().hex)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(tmp_file, 'wb') as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, cache_file)
+        except OSError as exc:
+            logger.debug("Unable to write CMOR table cache %s: %s",
+                         cache_file, exc)
+            with contextlib.suppress(OSError):
+                os.remove(tmp_file)
+    return result
+
+
+def _index_variables(tables):
+    """Map each short_name to the tables that define it, sorted by name."""
+    index = {}
+    for table in sorted(tables.values()):
+        for short_name in table:
+            index.setdefault(short_name, []).append(table)
+    return index
+
+
+def _log_load_error(filename):
+    """Report an exception raised when loading a table file."""
+    msg = f"Exception raised when loading {filename}"
+    # Logger may not be ready at this stage
+    if logger.handlers:
+        logger.error(msg)
+    else:
+        print(msg)
+
+
+def read_cmor_tables(cfg_developer, cache_dir=None):
     """Read cmor tables required in the configuration.
 
     Parameters
     ----------
     cfg_developer : dict of str
         Parsed config-developer file
+    cache_dir : str, optional
+        Directory where the parsed tables are cached, see :data:`CACHE_DIR`.
+        If None, the tables are not cached.
 
     """
+    global CACHE_DIR  # pylint: disable=global-statement
+    CACHE_DIR = cache_dir
+
     custom = CustomInfo()
     CMOR_TABLES['custom'] = custom
 
@@ -68,6 +169,9 @@ class CMIP6Info(object):
         If False, will look for a variable in other tables if it can not be
         found in the requested one
 
+    The tables and the controlled vocabulary are read the first time they
+    are needed and the parsed result is stored in :data:`CACHE_DIR`.
+
     """
 
     _CMIP_5to6_varname = {
@@ -83,30 +187,84 @@ class CMIP6Info(object):
         cmor_tables_path = self._get_cmor_path(cmor_tables_path)
 
         self._cmor_folder = os.path.join(cmor_tables_path, 'Tables')
-        if glob.glob(os.path.join(self._cmor_folder, '*_CV.json')):
-            self._load_controlled_vocabulary()
         self.default = default
         self.strict = strict
         self.default_table_prefix = default_table_prefix
 
-        self.tables = {}
-        self.var_to_freq = {}
-        self.strict = strict
-
-        self._load_coordinates()
+        # Read on first use
+        self._tables = None
+        self._coords = None
+        self._var_to_freq = None
+        self._activities = None
+        self._institutes = None
+        self._variable_index = None
+        self._variable_infos = {}
+
+    @property
+    def tables(self):
+        """dict of str, TableInfo: Tables by name."""
+        self._load_tables()
+        return self._tables
+
+    @property
+    def coords(self):
+        """dict of str, CoordinateInfo: Coordinates by name."""
+        self._load_tables()
+        return self._coords
+
+    @property
+    def var_to_freq(self):
+        """dict of str, dict: Frequency of the variables in each table."""
+        self._load_tables()
+        return self._var_to_freq
+
+    @property
+    def activities(self):
+        """dict of str, list: Activities of each experiment."""
+        self._load_controlled_vocabulary()
+        return self._activities
+
+    @property
+    def institutes(self):
+        """dict of str, list: Institutes of each source."""
+        self._load_controlled_vocabulary()
+        return self._institutes
+
+    def _get_table_files(self):
+        files = []
         for json_file in glob.glob(os.path.join(self._cmor_folder, '*.json')):
             if 'CV_test' in json_file or 'grids' in json_file:
                 continue
+            if json_file.endswith('_CV.json'):
+                # The controlled vocabulary is read separately
+                continue
+            files.append(json_file)
+        return files
+
+    def _load_tables(self):
+        with _LOAD_LOCK:
+            if self._tables is not None:
+                return
+            files = self._get_table_files()
+            tables, coords, var_to_freq = _read_cached(
+                'CMIP6Info.tables', files, lambda: self._read_tables(files))
+            self._coords = coords
+            self._var_to_freq = var_to_freq
+            self._variable_index = _index_variables(tables)
+            self._tables = tables
+
+    def _read_tables(self, files):
+        self._tables = {}
+        self._var_to_freq = {}
+        self._load_coordinates()
+        for json_file in files:
             try:
                 self._load_table(json_file)
             except Exception:
-                msg = f"Exception raised when loading {json_file}"
-                # Logger may not be ready at this stage
-                if logger.handlers:
-                    logger.error(msg)
-                else:
-                    print(msg)
+                _log_load_error(json_file)
+                self._tables = None
                 raise
+        return self._tables, self._coords, self._var_to_freq
 
     @staticmethod
     def _get_cmor_path(cmor_tables_path):
@@ -128,25 +286,25 @@ class CMIP6Info(object):
             table = TableInfo()
             header = raw_data['Header']
             table.name = header['table_id'].split(' ')[-1]
-            self.tables[table.name] = table
+            self._tables[table.name] = table
 
             generic_levels = header['generic_levels'].split()
             table.frequency = header.get('frequency', '')
-            self.var_to_freq[table.name] = {}
+            self._var_to_freq[table.name] = {}
 
             for var_name, var_data in raw_data['variable_entry'].items():
                 var = VariableInfo('CMIP6', var_name)
                 var.read_json(var_data, table.frequency)
                 self._assign_dimensions(var, generic_levels)
                 table[var_name] = var
-                self.var_to_freq[table.name][var_name] = var.frequency
+                self._var_to_freq[table.name][var_name] = var.frequency
 
             if not table.frequency:
                 from collections import Counter
                 var_freqs = (var.frequency for var in table.values())
                 table_freq, _ = Counter(var_freqs).most_common(1)[0]
                 table.frequency = table_freq
-            self.tables[table.name] = table
+            self._tables[table.name] = table
 
     def _assign_dimensions(self, var, generic_levels):
         for dimension in var.dimensions:
@@ -156,7 +314,7 @@ class CMIP6Info(object):
                 coord.axis = 'Z'
             else:
                 try:
-                    coord = self.coords[dimension]
+                    coord = self._coords[dimension]
                 except KeyError:
                     logger.exception(
                         'Can not find dimension %s for variable %s',
@@ -171,7 +329,7 @@ class CMIP6Info(object):
             var.coordinates[axis] = coord
 
     def _load_coordinates(self):
-        self.coords = {}
+        self._coords = {}
         for json_file in glob.glob(
                 os.path.join(self._cmor_folder, '*coordinate*.json')):
             with open(json_file) as inf:
@@ -179,20 +337,30 @@ class CMIP6Info(object):
                 for coord_name in table_data['axis_entry'].keys():
                     coord = CoordinateInfo(coord_name)
                     coord.read_json(table_data['axis_entry'][coord_name])
-                    self.coords[coord_name] = coord
+                    self._coords[coord_name] = coord
 
     def _load_controlled_vocabulary(self):
-        self.activities = {}
-        self.institutes = {}
-        for json_file in glob.glob(
-                os.path.join(self._cmor_folder, '*_CV.json')):
+        with _LOAD_LOCK:
+            if self._activities is not None:
+                return
+            files = glob.glob(os.path.join(self._cmor_folder, '*_CV.json'))
+            activities, institutes = _read_cached(
+                'CMIP6Info.controlled_vocabulary', files,
+                lambda: self._read_controlled_vocabulary(files))
+            self._institutes = institutes
+            self._activities = activities
+
+    def _read_controlled_vocabulary(self, files):
+        self._activities = {}
+        self._institutes = {}
+        for json_file in files:
             with open(json_file) as inf:
                 table_data = json.loads(inf.read())
                 try:
                     exps = table_data['CV']['experiment_id']
                     for exp_id in exps:
                         activity = exps[exp_id]['activity_id'][0].split(' ')
-                        self.activities[exp_id] = activity
+                        self._activities[exp_id] = activity
                 except (KeyError, AttributeError):
                     pass
 
@@ -200,9 +368,10 @@ class CMIP6Info(object):
                     sources = table_data['CV']['source_id']
                     for source_id in sources:
                         institution = sources[source_id]['institution_id']
-                        self.institutes[source_id] = institution
+                        self._institutes[source_id] = institution
                 except (KeyError, AttributeError):
                     pass
+        return self._activities, self._institutes
 
     def get_table(self, table):
         """
@@ -245,6 +414,13 @@ class CMIP6Info(object):
             found, returns None if not
 
         """
+        key = (table_name, short_name, derived, self.strict)
+        if key not in self._variable_infos:
+            self._variable_infos[key] = self._find_variable(
+                table_name, short_name, derived)
+        return self._variable_infos[key]
+
+    def _find_variable(self, table_name, short_name, derived):
         table = self.get_table(table_name)
         if table:
             try:
@@ -258,10 +434,10 @@ class CMIP6Info(object):
 
         var_info = None
         if not self.strict:
-            for table_vars in sorted(self.tables.values()):
-                if short_name in table_vars:
-                    var_info = table_vars[short_name]
-                    break
+            self._load_tables()
+            tables = self._variable_index.get(short_name)
+            if tables:
+                var_info = tables[0][short_name]
         if not var_info and (not self.strict or derived):
             var_info = self.default.get_variable(table_name, short_name)
 
@@ -526,6 +702,9 @@ class CMIP5Info(object):
         If False, will look for a variable in other tables if it can not be
         found in the requested one
 
+    The tables are read the first time they are needed and the parsed
+    result is stored in :data:`CACHE_DIR`.
+
     """
 
     def __init__(self, cmor_tables_path, default=None, strict=True):
@@ -536,27 +715,58 @@ class CMIP5Info(object):
             raise OSError(errno.ENOTDIR, "CMOR tables path is not a directory",
                           self._cmor_folder)
 
-        self.strict = strict
-        self.tables = {}
-        self.coords = {}
         self.default = default
         self.strict = strict
         self._current_table = None
         self._last_line_read = None
 
-        for table_file in glob.glob(os.path.join(self._cmor_folder, '*')):
-            if '_grids' in table_file:
-                continue
+        # Read on first use
+        self._tables = None
+        self._coords = None
+        self._variable_index = None
+        self._variable_infos = {}
+
+    @property
+    def tables(self):
+        """dict of str, TableInfo: Tables by name."""
+        self._load_tables()
+        return self._tables
+
+    @property
+    def coords(self):
+        """dict of str, CoordinateInfo: Coordinates by name."""
+        self._load_tables()
+        return self._coords
+
+    def _get_table_files(self):
+        return [
+            f for f in glob.glob(os.path.join(self._cmor_folder, '*'))
+            if '_grids' not in f
+        ]
+
+    def _load_tables(self):
+        with _LOAD_LOCK:
+            if self._tables is not None:
+                return
+            files = self._get_table_files()
+            tables, coords = _read_cached(
+                type(self).__name__ + '.tables', files,
+                lambda: self._read_tables(files))
+            self._coords = coords
+            self._variable_index = _index_variables(tables)
+            self._tables = tables
+
+    def _read_tables(self, files):
+        self._tables = {}
+        self._coords = {}
+        for table_file in files:
             try:
                 self._load_table(table_file)
             except Exception:
-                msg = f"Exception raised when loading {table_file}"
-                # Logger may not be ready at this stage
-                if logger.handlers:
-                    logger.error(msg)
-                else:
-                    print(msg)
+                _log_load_error(table_file)
+                self._tables = None
                 raise
+        return self._tables, self._coords
 
     @staticmethod
     def _get_cmor_path(cmor_tables_path):
@@ -567,9 +777,9 @@ class CMIP5Info(object):
         return cmor_tables_path
 
     def _load_table(self, table_file, table_name=''):
-        if table_name and table_name in self.tables:
+        if table_name and table_name in self._tables:
             # special case used for updating a table with custom variable file
-            table = self.tables[table_name]
+            table = self._tables[table_name]
         else:
             # default case: table name is first line of table file
             table = None
@@ -584,7 +794,7 @@ class CMIP5Info(object):
                 if key == 'table_id':
                     table = TableInfo()
                     table.name = value[len('Table '):]
-                    self.tables[table.name] = table
+                    self._tables[table.name] = table
                 elif key == 'frequency':
                     table.frequency = value
                 elif key == 'modeling_realm':
@@ -594,9 +804,9 @@ class CMIP5Info(object):
                         coord = CoordinateInfo(dim)
                         coord.generic_level = True
                         coord.axis = 'Z'
-                        self.coords[dim] = coord
+                        self._coords[dim] = coord
                 elif key == 'axis_entry':
-                    self.coords[value] = self._read_coordinate(value)
+                    self._coords[value] = self._read_coordinate(value)
                     continue
                 elif key == 'variable_entry':
                     table[value] = self._read_variable(value, table.frequency)
@@ -647,7 +857,7 @@ class CMIP5Info(object):
             elif hasattr(var, key):
                 setattr(var, key, value)
         for dim in var.dimensions:
-            var.coordinates[dim] = self.coords[dim]
+            var.coordinates[dim] = self._coords[dim]
         return var
 
     def get_table(self, table):
@@ -688,20 +898,26 @@ class CMIP5Info(object):
             found, returns None if not
 
         """
+        key = (table, short_name, derived, self.strict)
+        if key not in self._variable_infos:
+            self._variable_infos[key] = self._find_variable(
+                table, short_name, derived)
+        return self._variable_infos[key]
+
+    def _find_variable(self, table, short_name, derived):
         var_info = self.tables.get(table, {}).get(short_name, None)
         if var_info:
             return var_info
         if not self.strict:
-            for table_vars in sorted(self.tables.values()):
-                if short_name in table_vars:
-                    var_info = table_vars[short_name]
-                    break
+            tables = self._variable_index.get(short_name)
+            if tables:
+                var_info = tables[0][short_name]
         if not var_info and (derived or not self.strict):
             var_info = self.default.get_variable(table, short_name)
 
         if var_info:
             mip_info = self.get_table(table)
-            var_info.copy()
+            var_info = var_info.copy()
             if mip_info:
                 var_info.frequency = mip_info.frequency
         return var_info
@@ -722,30 +938,37 @@ class CustomInfo(CMIP5Info):
     def __init__(self, cmor_tables_path=None):
         cwd = os.path.dirname(os.path.realpath(__file__))
         self._cmor_folder = os.path.join(cwd, 'tables', 'custom')
-        self.tables = {}
         self.var_to_freq = {}
-        table = TableInfo()
-        table.name = 'custom'
-        self.tables[table.name] = table
         self._coordinates_file = os.path.join(
             self._cmor_folder,
             'CMOR_coordinates.dat',
         )
-        self.coords = {}
-        self._read_table_file(self._coordinates_file, self.tables['custom'])
-        for dat_file in glob.glob(os.path.join(self._cmor_folder, '*.dat')):
+        self._current_table = None
+        self._last_line_read = None
+
+        # Read on first use
+        self._tables = None
+        self._coords = None
+
+    def _get_table_files(self):
+        return glob.glob(os.path.join(self._cmor_folder, '*.dat'))
+
+    def _read_tables(self, files):
+        table = TableInfo()
+        table.name = 'custom'
+        self._tables = {table.name: table}
+        self._coords = {}
+        self._read_table_file(self._coordinates_file, table)
+        for dat_file in files:
             if dat_file == self._coordinates_file:
                 continue
             try:
-                self._read_table_file(dat_file, self.tables['custom'])
+                self._read_table_file(dat_file, table)
             except Exception:
-                msg = f"Exception raised when loading {dat_file}"
-                # Logger may not be ready at this stage
-                if logger.handlers:
-                    logger.error(msg)
-                else:
-                    print(msg)
+                _log_load_error(dat_file)
+                self._tables = None
                 raise
+        return self._tables, self._coords
 
     def get_table(self, table):
         """
@@ -797,9 +1020,9 @@ class CustomInfo(CMIP5Info):
                         coord = CoordinateInfo(dim)
                         coord.generic_level = True
                         coord.axis = 'Z'
-                        self.coords[dim] = coord
+                        self._coords[dim] = coord
                 elif key == 'axis_entry':
-                    self.coords[value] = self._read_coordinate(value)
+                    self._coords[value] = self._read_coordinate(value)
                     continue
                 elif key == 'variable_entry':
                     table[value] = self._read_variable(value, None)
@@ -2,9 +2,13 @@
 import copy
 import inspect
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 from iris.cube import Cube
 
+from .._file_metadata import get_data_size, get_horizontal_size
+from .._fingerprint import get_output_products, link_file, write_fingerprint
 from .._provenance import TrackedFile
 from .._task import BaseTask
 from ._area import (area_statistics, extract_named_regions, extract_region,
@@ -12,15 +16,15 @@ from ._area import (area_statistics, extract_named_regions, extract_region,
 from ._derive import derive
 from ._detrend import detrend
 from ._download import download
-from ._io import (_get_debug_filename, cleanup, concatenate, load, save,
-                  write_metadata)
+from ._io import (IntermediaryCubeWriter, _append, cleanup, concatenate,
+                  load, save, write_metadata)
 from ._mask import (mask_above_threshold, mask_below_threshold,
                     mask_fillvalues, mask_inside_range, mask_landsea,
                     mask_landseaice, mask_outside_range)
 from ._multimodel import multi_model_statistics
 from ._reformat import (cmor_check_data, cmor_check_metadata, fix_data,
                         fix_file, fix_metadata)
-from ._regrid import extract_levels, regrid
+from ._regrid import extract_levels, parse_cell_spec, regrid
 from ._time import (extract_month, extract_season, extract_time, regrid_time,
                     daily_statistics, monthly_statistics, seasonal_statistics,
                     annual_statistics, decadal_statistics,
@@ -110,6 +114,47 @@ MULTI_MODEL_FUNCTIONS = {
     'mask_fillvalues',
 }
 
+# Steps that can be run on the complete data before it is split into time
+# windows for streaming, because they do not load the data
+STREAMING_SETUP_FUNCTIONS = {
+    'fix_metadata',
+    'concatenate',
+    'cmor_check_metadata',
+    'extract_time',
+    'extract_season',
+    'extract_month',
+}
+
+# Steps that compute each time point independently from the others, these
+# can be run on one time window of the data at a time
+TIME_LOCAL_FUNCTIONS = {
+    'fix_data',
+    'extract_levels',
+    'mask_landsea',
+    'mask_landseaice',
+    'regrid',
+    'mask_above_threshold',
+    'mask_below_threshold',
+    'mask_inside_range',
+    'mask_outside_range',
+    'extract_region',
+    'extract_shape',
+    'extract_volume',
+    'extract_trajectory',
+    'extract_transect',
+    'extract_named_regions',
+    'depth_integration',
+    'area_statistics',
+    'volume_statistics',
+    'zonal_means',
+    'cmor_check_data',
+    'convert_units',
+}
+
+# Ratio between the memory needed to preprocess data and the size of the
+# data, the data is usually copied once while loading and concatenating
+MEMORY_FACTOR = 2
+
 
 def _get_itype(step):
     """Get the input type of a preprocessor function."""
@@ -226,6 +271,92 @@ def preprocess(items, step, **settings):
     return items
 
 
+def _get_cubes(items):
+    """Get the cubes from preprocessor items."""
+    cubes = []
+    for item in items:
+        if isinstance(item, Cube):
+            cubes.append(item)
+        elif isinstance(item, PreprocessorFile) and not item.is_closed:
+            cubes.extend(item.cubes)
+    return cubes
+
+
+def _check_realization_audit(mode):
+    """Check that `mode` is a valid value of the realization_audit option."""
+    if mode not in (None, 'warn', 'error'):
+        raise ValueError(
+            "Unknown realization_audit mode {!r}, choose 'warn' or "
+            "'error'".format(mode))
+
+
+def _audit_realization(step, lazy_cubes, result, mode):
+    """Report a step that loaded the data of lazy cubes into memory.
+
+    Parameters
+    ----------
+    step: str
+        Name of the preprocessor step.
+    lazy_cubes: list of iris.cube.Cube
+        The input cubes of the step that had lazy data before it was run.
+    result: list
+        The preprocessor items returned by the step.
+    mode: str
+        Either 'warn' to log a warning or 'error' to raise an exception.
+
+    Raises
+    ------
+    ValueError
+        If `mode` is 'error' and the step realized the data, or if `mode`
+        is not valid.
+    """
+    _check_realization_audit(mode)
+    if not lazy_cubes:
+        return
+    cubes = lazy_cubes + _get_cubes(result)
+    if all(cube.has_lazy_data() for cube in cubes):
+        return
+    msg = ("Preprocessor step {} loaded the data into memory, it does not "
+           "support lazy data".format(step))
+    if mode == 'error':
+        raise ValueError(msg)
+    logger.warning(msg)
+
+
+def _split_streaming_steps(steps):
+    """Split steps into setup steps and steps run per time window.
+
+    Returns None if the steps cannot be run one time window at a time.
+    """
+    setup = 0
+    while setup < len(steps) and steps[setup] in STREAMING_SETUP_FUNCTIONS:
+        setup += 1
+    window_steps = steps[setup:]
+    if not window_steps or not TIME_LOCAL_FUNCTIONS.issuperset(window_steps):
+        return None
+    return steps[:setup], window_steps
+
+
+def _load_product(product, steps, debug=None, realization_audit=None):
+    """Load a product and apply the leading steps that do not load the data.
+
+    Returns
+    -------
+    list of str
+        The steps that were applied.
+    """
+    done = []
+    if not product.is_closed:
+        return done
+    product.load()
+    for step in steps:
+        if step not in STREAMING_SETUP_FUNCTIONS:
+            break
+        product.apply(step, debug, realization_audit)
+        done.append(step)
+    return done
+
+
 def get_step_blocks(steps, order):
     """Group steps into execution blocks."""
     blocks = []
@@ -258,27 +389,50 @@ class PreprocessorFile(TrackedFile):
         self._cubes = None
         self._prepared = False
 
+        self.cache = None
+        self.cache_key = None
+        self.cached = False
+        self.copy_of = None
+        # Steps that were applied by another task, which stored the result
+        # in the file that this product is loaded from
+        self.computed_steps = set()
+        # Number of files that are fixed and loaded at the same time
+        self.load_workers = 1
+        # Steps that were applied to each file while loading
+        self._loaded_steps = set()
+
     def check(self):
         """Check preprocessor settings."""
         check_preprocessor_settings(self.settings)
 
-    def apply(self, step, debug=False):
-        """Apply preprocessor step to product."""
+    def apply(self, step, debug=None, realization_audit=None):
+        """Apply preprocessor step to product.
+
+        If `debug` is an :class:`IntermediaryCubeWriter`, the result of the
+        step is saved with it.
+        """
         if step not in self.settings:
             raise ValueError(
                 "PreprocessorFile {} has no settings for step {}".format(
                     self, step))
+        self.load()
+        if step in self._loaded_steps:
+            return
+        if realization_audit:
+            lazy_cubes = [c for c in self.cubes if c.has_lazy_data()]
         self.cubes = preprocess(self.cubes, step, **self.settings[step])
+        if realization_audit:
+            _audit_realization(step, lazy_cubes, self.cubes,
+                               realization_audit)
         if debug:
             logger.debug("Result %s", self.cubes)
-            filename = _get_debug_filename(self.filename, step)
-            save(self.cubes, filename)
+            debug.write(self.cubes, self.filename, step)
 
     def prepare(self):
         """Apply preliminary file operations on product."""
         if not self._prepared:
             for step in DEFAULT_ORDER[:DEFAULT_ORDER.index('load')]:
-                if step in self.settings:
+                if step in self.settings and step not in self.computed_steps:
                     self.files = preprocess(self.files, step,
                                             **self.settings[step])
             self._prepared = True
@@ -287,22 +441,133 @@ class PreprocessorFile(TrackedFile):
     def cubes(self):
         """Cubes."""
         if self.is_closed:
-            self.prepare()
-            self._cubes = preprocess(self.files, 'load',
-                                     **self.settings.get('load', {}))
+            if (self.load_workers > 1 and len(self.files) > 1
+                    and not self._prepared):
+                self._cubes = self._load_parallel()
+            else:
+                self.prepare()
+                self._cubes = preprocess(self.files, 'load',
+                                         **self.settings.get('load', {}))
+                self._loaded_steps = set()
         return self._cubes
 
     @cubes.setter
     def cubes(self, value):
         self._cubes = value
 
+    def load(self):
+        """Load the cubes, if they are not loaded yet."""
+        return self.cubes
+
+    def _fix_metadata_on_load(self):
+        """Check if the metadata of each file is fixed while loading."""
+        return ('fix_metadata' in self.settings
+                and 'fix_metadata' not in self.computed_steps)
+
+    def _load_file(self, file):
+        """Fix and load a single file and fix the metadata of its cubes."""
+        files = [file]
+        for step in DEFAULT_ORDER[:DEFAULT_ORDER.index('load')]:
+            if step in self.settings and step not in self.computed_steps:
+                files = preprocess(files, step, **self.settings[step])
+        cubes = preprocess(files, 'load', **self.settings.get('load', {}))
+        if self._fix_metadata_on_load():
+            cubes = preprocess(cubes, 'fix_metadata',
+                               **self.settings['fix_metadata'])
+        return files, cubes
+
+    def _load_parallel(self):
+        """Fix and load the files using `load_workers` threads.
+
+        The metadata of the cubes from each file is fixed right after
+        loading the file. The cubes are returned in the order of the files,
+        as if the files were loaded one after the other.
+        """
+        logger.debug("Loading %s files of %s using %s threads",
+                     len(self.files), self.filename, self.load_workers)
+        with ThreadPoolExecutor(max_workers=self.load_workers) as executor:
+            results = list(executor.map(self._load_file, self.files))
+        self.files = [file for files, _ in results for file in files]
+        self._prepared = True
+        if self._fix_metadata_on_load():
+            self._loaded_steps.add('fix_metadata')
+        return [cube for _, cubes in results for cube in cubes]
+
     def save(self):
         """Save cubes to disk."""
         if self._cubes is not None:
             self.files = preprocess(self._cubes, 'save',
                                     **self.settings['save'])
-            self.files = preprocess(self.files, 'cleanup',
-                                    **self.settings.get('cleanup', {}))
+            self._finish_saving()
+
+    def _finish_saving(self):
+        """Publish the saved file to the cache and clean up."""
+        if self.cache is not None and self.cache_key is not None:
+            self.cache.publish(self.cache_key, self.filename)
+        self.files = preprocess(self.files, 'cleanup',
+                                **self.settings.get('cleanup', {}))
+
+    def _can_stream(self, window):
+        """Check if the cubes can be processed in time windows."""
+        if len(self.cubes) != 1 or self.filename in self.files:
+            return False
+        cube = self.cubes[0]
+        if not cube.coords('time', dim_coords=True):
+            return False
+        t_dim, = cube.coord_dims('time')
+        if cube.shape[t_dim] <= window:
+            return False
+        # The variables in the file are found by name when appending
+        coords = [c for c in cube.coords() if t_dim in cube.coord_dims(c)]
+        return all(item.var_name for item in [cube] + coords)
+
+    def stream(self, steps, window, realization_audit=None):
+        """Apply steps and save the result one time window at a time.
+
+        The steps must compute each time point independently from the
+        others, see `TIME_LOCAL_FUNCTIONS`. The first time window is saved
+        as usual and the others are appended to the file, so only a single
+        time window of the data needs to be in memory at a time. If the
+        data has no time dimension or fits into a single window, the steps
+        are applied to all data at once.
+
+        Parameters
+        ----------
+        steps: list of str
+            Names of the preprocessor steps to apply.
+        window: int
+            Maximum number of time points to process at a time.
+        realization_audit: str, optional
+            Report steps that realize lazy data, see :meth:`apply`.
+        """
+        if not self._can_stream(window):
+            for step in steps:
+                self.apply(step, realization_audit=realization_audit)
+            return
+
+        cube = self.cubes[0]
+        t_dim, = cube.coord_dims('time')
+        n_times = cube.shape[t_dim]
+        logger.debug("Preprocessing %s in windows of %s time points",
+                     self.filename, window)
+        if os.path.exists(self.filename):
+            # Do not append to the output of an earlier run
+            os.remove(self.filename)
+        for start in range(0, n_times, window):
+            index = [slice(None)] * cube.ndim
+            index[t_dim] = slice(start, start + window)
+            self.cubes = [cube[tuple(index)]]
+            for step in steps:
+                self.apply(step, realization_audit=realization_audit)
+            if start == 0:
+                self.files = preprocess(self.cubes,
+                                        'save',
+                                        unlimited_dimensions=['time'],
+                                        **self.settings['save'])
+            else:
+                _append(self.cubes, self.filename)
+        self._cubes = None
+        self._finish_saving()
 
     def close(self):
         """Close the file."""
@@ -328,13 +593,69 @@ class PreprocessorFile(TrackedFile):
 # add the same Product twice
 
 
-def _apply_multimodel(products, step, debug):
+def _get_input_data_size(product, cache_path=None):
+    """Get the size in bytes of the input data of a product."""
+    size = 0
+    for ancestor in product.ancestors:
+        if isinstance(ancestor, PreprocessorFile):
+            # Output of another task, which may not exist yet
+            size += _get_input_data_size(ancestor, cache_path)
+        else:
+            size += get_data_size(ancestor.filename, cache_path)
+    return size
+
+
+def _get_first_input_file(product):
+    """Get the first input file of a product, or None if there is none."""
+    for ancestor in product.ancestors:
+        if isinstance(ancestor, PreprocessorFile):
+            filename = _get_first_input_file(ancestor)
+            if filename is not None:
+                return filename
+        else:
+            return ancestor.filename
+    return None
+
+
+def _get_regrid_factor(product, cache_path=None):
+    """Get the factor by which the regrid step increases the data size.
+
+    This is the ratio of the number of points of the target grid to the
+    number of points of the horizontal grid of the input data. Steps that
+    reduce the size of the data are ignored, so the result is at least 1.
+    """
+    target_grid = product.settings.get('regrid', {}).get('target_grid')
+    if not isinstance(target_grid, str):
+        return 1
+    filename = _get_first_input_file(product)
+    if filename is None:
+        return 1
+    try:
+        dlon, dlat = parse_cell_spec(target_grid)
+    except ValueError:
+        # The target grid is the grid of another dataset
+        target_size = get_horizontal_size(target_grid, cache_path)
+    else:
+        target_size = 360. / dlon * 180. / dlat
+    source_size = get_horizontal_size(filename, cache_path)
+    if not (source_size and target_size):
+        return 1
+    return max(1, target_size / source_size)
+
+
+def _apply_multimodel(products, step, debug, realization_audit=None):
     """Apply multi model step to products."""
     settings, exclude = _get_multi_model_settings(products, step)
 
     logger.debug("Applying %s to\n%s", step, '\n'.join(
         str(p) for p in products - exclude))
+    if realization_audit:
+        lazy_cubes = [
+            c for c in _get_cubes(products - exclude) if c.has_lazy_data()
+        ]
     result = preprocess(products - exclude, step, **settings)
+    if realization_audit:
+        _audit_realization(step, lazy_cubes, result, realization_audit)
     products = set(result) | exclude
 
     if debug:
@@ -357,14 +678,95 @@ class PreprocessingTask(BaseTask):
             name='',
             order=DEFAULT_ORDER,
             debug=None,
+            debug_steps=None,
+            debug_region=None,
             write_ncl_interface=False,
+            realization_audit=None,
+            streaming_time_window=None,
+            read_ahead=0,
+            load_workers=1,
     ):
         """Initialize"""
         _check_multi_model_settings(products)
+        _check_realization_audit(realization_audit)
         super().__init__(ancestors=ancestors, name=name, products=products)
         self.order = list(order)
         self.debug = debug
+        self.debug_steps = debug_steps
+        self.debug_region = debug_region
+        self._debug_writer = None
         self.write_ncl_interface = write_ncl_interface
+        self.realization_audit = realization_audit
+        self.streaming_time_window = streaming_time_window
+        self.read_ahead = read_ahead
+        self.load_workers = load_workers
+        self.fingerprint = None
+        self.reused_files = None
+
+    def estimate_memory(self, cache_path=None):
+        """Estimate the memory needed to run the task in bytes.
+
+        The estimate is based on the size of the input data when loaded in
+        memory, multiplied by the factor by which the data grows if it is
+        regridded to a finer grid. Other steps that increase the size of
+        the data, e.g. extract_levels to more levels, are not taken into
+        account, so the estimate is a lower bound for such tasks. If the
+        task has multi-model steps, all products are kept in memory at the
+        same time, otherwise the products are preprocessed one after the
+        other, or two at a time if they are saved in the background.
+
+        Parameters
+        ----------
+        cache_path: str, optional
+            Path to the file metadata cache used for reading the size of the
+            input data.
+
+        Returns
+        -------
+        int
+            Estimated memory use.
+        """
+        if self.reused_files:
+            return 0
+        sizes = [
+            _get_input_data_size(product, cache_path) *
+            _get_regrid_factor(product, cache_path)
+            for product in self.products
+            if not (product.cached or product.copy_of)
+        ]
+        if not sizes:
+            return 0
+        steps = {
+            step
+            for product in self.products for step in product.settings
+        }
+        if len(get_step_blocks(steps, self.order)) > 1:
+            size = sum(sizes)
+        elif self.read_ahead:
+            # A product can be saved while the next one is computed
+            size = sum(sorted(sizes)[-2:])
+        else:
+            size = max(sizes)
+        return MEMORY_FACTOR * size
+
+    def get_input_data_size(self, cache_path=None):
+        """Get the total size of the input data in memory in bytes.
+
+        Products that do not need to be computed, because they are reused
+        from an earlier run or available elsewhere, are not included.
+
+        Parameters
+        ----------
+        cache_path: str, optional
+            Path to the file metadata cache used for reading the size of the
+            input data.
+        """
+        if self.reused_files:
+            return 0
+        return sum(
+            _get_input_data_size(product, cache_path)
+            for product in self.products
+            if not (product.cached or product.copy_of))
 
     def _initialize_product_provenance(self):
         """Initialize product provenance."""
@@ -384,31 +786,128 @@ class PreprocessingTask(BaseTask):
         """Run the preprocessor."""
         self._initialize_product_provenance()
 
+        if self.reused_files:
+            self._reuse_output()
+        else:
+            # Products from the preprocessing cache are already available
+            # and copies of products computed by other tasks are linked
+            done = {p for p in self.products if p.cached or p.copy_of}
+            for product in done:
+                if product.copy_of:
+                    link_file(product.copy_of, product.filename)
+                    if 'cleanup' in product.settings:
+                        cleanup([], **product.settings['cleanup'])
+            self.products -= done
+            for product in self.products:
+                product.load_workers = self.load_workers
+            self._run_blocks()
+            self.products |= done
+
+        for product in self.products:
+            product.close()
+        if self.fingerprint is not None:
+            write_fingerprint(self)
+        metadata_files = write_metadata(self.products,
+                                        self.write_ncl_interface)
+        return metadata_files
+
+    def _run_blocks(self):
+        """Apply the preprocessor steps to the products."""
         steps = {
             step
             for product in self.products for step in product.settings
         }
         blocks = get_step_blocks(steps, self.order)
-        for block in blocks:
-            logger.debug("Running block %s", block)
-            if block[0] in MULTI_MODEL_FUNCTIONS:
-                for step in block:
-                    self.products = _apply_multimodel(self.products, step,
-                                                      self.debug)
-            else:
-                for product in self.products:
-                    logger.debug("Applying single-model steps to %s", product)
-                    for step in block:
-                        if step in product.settings:
-                            product.apply(step, self.debug)
-                    if block == blocks[-1]:
+        with IntermediaryCubeWriter(self.debug_steps,
+                                    self.debug_region) as writer:
+            if self.debug:
+                self._debug_writer = writer
+            try:
+                for block in blocks:
+                    logger.debug("Running block %s", block)
+                    if block[0] in MULTI_MODEL_FUNCTIONS:
+                        for step in block:
+                            self.products = _apply_multimodel(
+                                self.products, step, self.debug,
+                                self.realization_audit)
+                    else:
+                        self._run_single_model_block(block,
+                                                     block == blocks[-1])
+            finally:
+                self._debug_writer = None
+
+    def _get_block_steps(self, product, block, final):
+        """Get the steps of a block to apply to all data and per window."""
+        steps = [
+            step for step in block
+            if step in product.settings and step not in product.computed_steps
+        ]
+        # Data that is saved after this block can be processed in time
+        # windows to limit the memory use
+        window_steps = []
+        if final and self.streaming_time_window and not self.debug:
+            split = _split_streaming_steps(steps)
+            if split is not None:
+                steps, window_steps = split
+        return steps, window_steps
+
+    def _run_single_model_block(self, block, final):
+        """Apply single-model steps to the products one after the other.
+
+        If `read_ahead` is set, the next products are loaded in a
+        background thread while the current product is computed, and the
+        products are saved in another background thread. The threads only
+        take turns for the calls to the netCDF library, see
+        :mod:`esmvalcore._netcdf`.
+        """
+        products = sorted(self.products, key=lambda p: p.filename)
+        loading = {}
+        saving = None
+        with ThreadPoolExecutor(max_workers=1) as loader, \
+                ThreadPoolExecutor(max_workers=1) as writer:
+            for i, product in enumerate(products):
+                for next_product in products[i + 1:i + 1 + self.read_ahead]:
+                    if next_product not in loading:
+                        steps, _ = self._get_block_steps(
+                            next_product, block, final)
+                        loading[next_product] = loader.submit(
+                            _load_product, next_product, steps,
+                            self._debug_writer, self.realization_audit)
+
+                logger.debug("Applying single-model steps to %s", product)
+                steps, window_steps = self._get_block_steps(
+                    product, block, final)
+                if product in loading:
+                    done = loading.pop(product).result()
+                    steps = [step for step in steps if step not in done]
+                for step in steps:
+                    product.apply(step, self._debug_writer,
+                                  self.realization_audit)
+                if window_steps:
+                    product.stream(window_steps, self.streaming_time_window,
+                                   self.realization_audit)
+
+                if final:
+                    if not self.read_ahead:
                         product.close()
-
+                        continue
+                    # Save at most one product at a time in the background
+                    if saving is not None:
+                        saving.result()
+                    saving = writer.submit(product.close)
+            if saving is not None:
+                saving.result()
+
+    def _reuse_output(self):
+        """Link the output files of an earlier run instead of computing."""
+        logger.info("Reusing unchanged output of an earlier run for task %s",
+                    self.name)
+        self.products = get_output_products(self)
         for product in self.products:
-            product.close()
-        metadata_files = write_metadata(self.products,
-                                        self.write_ncl_interface)
-        return metadata_files
+            logger.debug("Linking %s to %s",
+                         self.reused_files[product.filename],
+                         product.filename)
+            link_file(self.reused_files[product.filename], product.filename)
 
     def __str__(self):
         """Get human readable description."""
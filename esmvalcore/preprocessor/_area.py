@@ -6,11 +6,8 @@ selecting geographical regions; constructing area averages; etc.
 """
 import logging
 
-import fiona
 import iris
 import numpy as np
-import shapely
-import shapely.ops
 from dask import array as da
 
 from ._shared import (get_iris_analysis_operation, guess_bounds,
@@ -306,6 +303,9 @@ def _crop_cube(cube, start_longitude, start_latitude, end_longitude,
 
 def _select_representative_point(shape, lon, lat):
     """Select a representative point for `shape` from `lon` and `lat`."""
+    import shapely.geometry
+    import shapely.ops
+
     representative_point = shape.representative_point()
     points = shapely.geometry.MultiPoint(np.stack((lon.flat, lat.flat),
                                                   axis=1))
@@ -351,6 +351,11 @@ def extract_shape(cube, shapefile, method='contains', crop=True):
             "Invalid value for `method`. Choose from 'contains', ",
             "'representative'.")
 
+    # Imported here, because these libraries take long to import
+    import fiona
+    import shapely.geometry
+    import shapely.vectorized
+
     with fiona.open(shapefile) as geometries:
         if crop:
             cube = _crop_cube(cube, *geometries.bounds)
@@ -2,6 +2,7 @@
 
 import importlib
 import logging
+from collections.abc import Mapping
 from copy import deepcopy
 from pathlib import Path
 
@@ -10,23 +11,49 @@ import iris
 logger = logging.getLogger(__name__)
 
 
+class _DerivedVariables(Mapping):
+    """Derived variable classes by `short_name`.
+
+    The module defining a derived variable is only imported when its class
+    is first requested, so importing this package does not import the
+    dependencies of all derivation scripts.
+    """
+
+    def __init__(self, short_names):
+        self._short_names = tuple(sorted(short_names))
+        self._classes = {}
+
+    def __getitem__(self, short_name):
+        if short_name not in self._short_names:
+            raise KeyError(short_name)
+        if short_name not in self._classes:
+            module = importlib.import_module(
+                f'esmvalcore.preprocessor._derive.{short_name}')
+            self._classes[short_name] = getattr(module, 'DerivedVariable')
+        return self._classes[short_name]
+
+    def __contains__(self, short_name):
+        return short_name in self._short_names
+
+    def __iter__(self):
+        return iter(self._short_names)
+
+    def __len__(self):
+        return len(self._short_names)
+
+
 def _get_all_derived_variables():
     """Get all possible derived variables.
 
     Returns
     -------
-    dict
+    collections.abc.Mapping
         All derived variables with `short_name` (keys) and the associated
-        python classes (values).
+        python classes (values). The classes are imported on first access.
 
     """
-    derivers = {}
-    for path in Path(__file__).parent.glob('[a-z]*.py'):
-        short_name = path.stem
-        module = importlib.import_module(
-            f'esmvalcore.preprocessor._derive.{short_name}')
-        derivers[short_name] = getattr(module, 'DerivedVariable')
-    return derivers
+    return _DerivedVariables(
+        path.stem for path in Path(__file__).parent.glob('[a-z]*.py'))
 
 
 ALL_DERIVED_VARIABLES = _get_all_derived_variables()
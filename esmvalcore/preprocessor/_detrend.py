@@ -2,7 +2,6 @@
 import logging
 
 import dask.array as da
-import scipy.signal
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +25,9 @@ def detrend(cube, dimension='time', method='linear'):
     iris.cube.Cube
         Detrended cube
     """
+    # Imported here, because scipy takes long to import
+    import scipy.signal
+
     coord = cube.coord(dimension)
     axis = cube.coord_dims(coord)[0]
     detrended = da.apply_along_axis(
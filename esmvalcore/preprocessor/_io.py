@@ -2,7 +2,9 @@
 import copy
 import logging
 import os
+import queue
 import shutil
+import threading
 from collections import OrderedDict
 from itertools import groupby
 from warnings import catch_warnings, filterwarnings
@@ -12,10 +14,14 @@ import iris.exceptions
 import numpy as np
 import yaml
 
+from .. import _netcdf
 from .._task import write_ncl_settings
+from ._area import extract_region
 
 logger = logging.getLogger(__name__)
 
+_netcdf.patch_iris()
+
 GLOBAL_FILL_VALUE = 1e+20
 
 DATASET_KEYS = {
@@ -51,8 +57,82 @@ def concatenate_callback(raw_cube, field, _):
                 coord.units = units
 
 
-def load(file, callback=None):
-    """Load iris cubes from files."""
+def _date2num(units, date):
+    """Convert a date to a time value, also for 360 day calendars."""
+    if units.calendar == '360_day' and date.day > 30:
+        date = date.replace(day=30)
+    return units.date2num(date)
+
+
+def _get_time_slice(cube, start_date, end_date):
+    """Get the slice of the time dimension in [start_date, end_date).
+
+    Returns None if the cube has no usable time dimension.
+    """
+    coords = cube.coords('time', dim_coords=True)
+    if not coords or not coords[0].units.is_time_reference():
+        return None
+    time = coords[0]
+    points = time.points
+    selected = np.ones(points.shape, dtype=bool)
+    if start_date is not None:
+        selected &= points >= _date2num(time.units, start_date)
+    if end_date is not None:
+        selected &= points < _date2num(time.units, end_date)
+    indices = np.flatnonzero(selected)
+    if not indices.size:
+        return slice(0, 0)
+    return slice(indices[0], indices[-1] + 1)
+
+
+def _extract_time_slices(cubes, start_date, end_date):
+    """Select time steps in [start_date, end_date) without loading data.
+
+    Cubes without a time dimension are returned unchanged. If none of the
+    cubes that have a time dimension contain data in the period, an empty
+    list is returned.
+    """
+    result = iris.cube.CubeList()
+    has_time = False
+    in_period = False
+    for cube in cubes:
+        time_slice = _get_time_slice(cube, start_date, end_date)
+        if time_slice is None:
+            result.append(cube)
+            continue
+        has_time = True
+        if time_slice.stop > time_slice.start:
+            in_period = True
+            dim = cube.coord_dims(cube.coord('time', dim_coords=True))[0]
+            index = [slice(None)] * cube.ndim
+            index[dim] = time_slice
+            result.append(cube[tuple(index)])
+    if has_time and not in_period:
+        return iris.cube.CubeList()
+    return result
+
+
+def load(file, callback=None, start_date=None, end_date=None):
+    """Load iris cubes from files.
+
+    Parameters
+    ----------
+    file: str
+        File to load.
+    callback: callable, optional
+        Callback function passed to :func:`iris.load_raw`.
+    start_date: datetime.datetime, optional
+        Only load time steps from this date onwards.
+    end_date: datetime.datetime, optional
+        Only load time steps before this date.
+
+    Returns
+    -------
+    iris.cube.CubeList
+        Loaded cubes. If the file contains no data between `start_date`
+        and `end_date`, the list is empty.
+
+    """
     logger.debug("Loading:\n%s", file)
     with catch_warnings():
         filterwarnings(
@@ -64,6 +144,12 @@ def load(file, callback=None):
         raw_cubes = iris.load_raw(file, callback=callback)
     if not raw_cubes:
         raise Exception('Can not load cubes from {0}'.format(file))
+    if start_date is not None or end_date is not None:
+        # Slicing the lazy data ensures other time steps are never read
+        raw_cubes = _extract_time_slices(raw_cubes, start_date, end_date)
+        if not raw_cubes:
+            logger.debug("No data between %s and %s in %s", start_date,
+                         end_date, file)
     for cube in raw_cubes:
         cube.attributes['source_file'] = file
     return raw_cubes
@@ -173,17 +259,178 @@ def save(cubes, filename, optimize_access='', compress=False, **kwargs):
     return filename
 
 
-def _get_debug_filename(filename, step):
+def _append(cubes, filename):
+    """Append cubes along the time dimension to a file.
+
+    The file must have been written by :func:`save` from cubes with the same
+    variable names, with the time dimension saved as unlimited dimension.
+    All coordinates that span the time dimension are appended as well.
+
+    Parameters
+    ----------
+    cubes: iterable of iris.cube.Cube
+        Data cubes to be appended.
+
+    filename: str
+        Name of target file.
+
+    Returns
+    -------
+    str
+        filename
+    """
+    logger.debug("Appending cubes %s to %s", cubes, filename)
+    with _netcdf.Dataset(filename, 'a') as dataset:
+        for cube in cubes:
+            t_dim, = cube.coord_dims('time')
+            start = len(dataset.variables[cube.coord('time').var_name])
+            window = slice(start, start + cube.shape[t_dim])
+
+            index = tuple(window if dim == t_dim else slice(None)
+                          for dim in range(cube.ndim))
+            dataset.variables[cube.var_name][index] = cube.data
+
+            for coord in cube.coords():
+                dims = cube.coord_dims(coord)
+                if t_dim not in dims:
+                    continue
+                index = tuple(window if dim == t_dim else slice(None)
+                              for dim in dims)
+                variable = dataset.variables[coord.var_name]
+                variable[index] = coord.points
+                if coord.has_bounds():
+                    dataset.variables[variable.bounds][index] = coord.bounds
+    return filename
+
+
+def _get_debug_filename(filename, step, num):
     """Get a filename for debugging the preprocessor."""
     dirname = os.path.splitext(filename)[0]
-    if os.path.exists(dirname) and os.listdir(dirname):
-        num = int(sorted(os.listdir(dirname)).pop()[:2]) + 1
-    else:
-        num = 0
     filename = os.path.join(dirname, '{:02}_{}.nc'.format(num, step))
     return filename
 
 
+class IntermediaryCubeWriter:
+    """Save the result of preprocessor steps in a background thread.
+
+    The results are saved in a directory named after the preprocessor
+    output file, numbered in the order in which the steps were applied.
+
+    Lazy data is not computed when a result is queued, but when it is saved
+    in the background thread, so the source files of a lazy result are read
+    at that time. Data that is already in memory is copied, so the queued
+    results are limited by their size in memory.
+
+    Parameters
+    ----------
+    steps: list of str, optional
+        Only save the result of these steps. By default, the result of
+        every step is saved.
+    region: dict, optional
+        Only save this region, given as keyword arguments to
+        :func:`esmvalcore.preprocessor.extract_region`. Cubes without
+        latitude and longitude coordinates are saved completely.
+    max_queued_bytes: int, optional
+        Maximum size in bytes of the data of the results waiting to be
+        saved. Writing a result blocks until enough results are saved. A
+        result is always queued if no other results are waiting, even if
+        it is larger.
+    """
+
+    def __init__(self, steps=None, region=None, max_queued_bytes=2**30):
+        self.steps = None if steps is None else set(steps)
+        self.region = region
+        self.max_queued_bytes = max_queued_bytes
+        self._queue = queue.Queue()
+        self._queued_bytes = 0
+        self._saved = threading.Condition()
+        self._thread = None
+        self._error = None
+        self._numbers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Do not hide an exception raised while running the steps
+        self.close(raise_error=exc_type is None)
+
+    def _snapshot(self, cube):
+        """Copy a cube, so later steps cannot change what is saved."""
+        if (self.region and cube.coords('latitude')
+                and cube.coords('longitude')):
+            cube = extract_region(cube.copy(cube.core_data()), **self.region)
+        return cube.copy()
+
+    def _has_space(self, size):
+        """Check if a result of `size` bytes can be queued."""
+        if not self._queued_bytes:
+            return True
+        return self._queued_bytes + size <= self.max_queued_bytes
+
+    def write(self, cubes, filename, step):
+        """Queue the result of a step for saving.
+
+        Parameters
+        ----------
+        cubes: iterable of iris.cube.Cube
+            Result of the step.
+        filename: str
+            Name of the preprocessor output file.
+        step: str
+            Name of the preprocessor step.
+        """
+        num = self._numbers.get(filename, 0)
+        self._numbers[filename] = num + 1
+        if self.steps is not None and step not in self.steps:
+            return
+        self._raise_error()
+        cubes = [self._snapshot(cube) for cube in cubes]
+        debug_filename = _get_debug_filename(filename, step, num)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._save_queued,
+                                            daemon=True)
+            self._thread.start()
+        # Lazy data only uses memory while it is saved
+        size = sum(c.data.nbytes for c in cubes if not c.has_lazy_data())
+        with self._saved:
+            self._saved.wait_for(lambda: self._has_space(size))
+            self._queued_bytes += size
+        self._queue.put((cubes, debug_filename, size))
+
+    def _save_queued(self):
+        """Save queued results until the writer is closed."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            cubes, filename, size = item
+            if self._error is None:
+                try:
+                    save(cubes, filename)
+                except Exception as exc:  # pylint: disable=broad-except
+                    self._error = exc
+            # Free the memory before making room for the next results
+            del cubes, item
+            with self._saved:
+                self._queued_bytes -= size
+                self._saved.notify_all()
+
+    def _raise_error(self):
+        """Raise the first error that occurred while saving."""
+        if self._error is not None:
+            raise self._error
+
+    def close(self, raise_error=True):
+        """Wait until all queued results are saved."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if raise_error:
+            self._raise_error()
+
+
 def cleanup(files, remove=None):
     """Clean up after running the preprocessor."""
     if remove is None:
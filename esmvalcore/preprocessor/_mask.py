@@ -10,10 +10,9 @@ missing values masking.
 import logging
 import os
 
-import cartopy.io.shapereader as shpreader
+import dask.array as da
 import iris
 import numpy as np
-import shapely.vectorized as shp_vect
 from iris.analysis import Aggregator
 from iris.util import rolling_window
 
@@ -72,20 +71,34 @@ def _get_fx_mask(fx_data, fx_option, mask_type):
 
 def _apply_fx_mask(fx_mask, var_data):
     """Apply the fx data extracted mask on the actual processed data."""
-    # Broadcast mask
-    var_mask = np.zeros_like(var_data, bool)
-    var_mask = np.broadcast_to(fx_mask, var_mask.shape).copy()
+    # Work on the lazy data if it is lazy, so it is not loaded into memory
+    if isinstance(var_data, da.Array):
+        array_module = da
+    else:
+        array_module = np
 
-    # Aplly mask accross
-    if np.ma.is_masked(var_data):
-        var_mask |= var_data.mask
+    # Broadcast mask and apply it accross
+    var_mask = array_module.broadcast_to(fx_mask, var_data.shape)
+    var_mask = var_mask | array_module.ma.getmaskarray(var_data)
 
     # Build the new masked data
-    var_data = np.ma.array(var_data, mask=var_mask, fill_value=1e+20)
+    var_data = array_module.ma.masked_array(var_data,
+                                            mask=var_mask,
+                                            fill_value=1e+20)
 
     return var_data
 
 
+def _apply_mask(mask, cube):
+    """Mask the data of a cube where `mask` is True, without loading it.
+
+    The mask is broadcast along the leading dimensions of the cube.
+    """
+    data = da.asanyarray(cube.core_data())
+    mask = da.broadcast_to(mask, data.shape)
+    cube.data = da.ma.masked_where(mask, data)
+
+
 def mask_landsea(cube, fx_files, mask_out, always_use_ne_mask=False):
     """
     Mask out either land mass or sea (oceans, seas and lakes).
@@ -142,13 +155,13 @@ def mask_landsea(cube, fx_files, mask_out, always_use_ne_mask=False):
                 and _check_dims(cube, fx_cubes['sftlf'])):
             landsea_mask = _get_fx_mask(fx_cubes['sftlf'].data, mask_out,
                                         'sftlf')
-            cube.data = _apply_fx_mask(landsea_mask, cube.data)
+            cube.data = _apply_fx_mask(landsea_mask, cube.core_data())
             logger.debug("Applying land-sea mask: sftlf")
         elif ('sftof' in fx_cubes.keys()
               and _check_dims(cube, fx_cubes['sftof'])):
             landsea_mask = _get_fx_mask(fx_cubes['sftof'].data, mask_out,
                                         'sftof')
-            cube.data = _apply_fx_mask(landsea_mask, cube.data)
+            cube.data = _apply_fx_mask(landsea_mask, cube.core_data())
             logger.debug("Applying land-sea mask: sftof")
         else:
             if cube.coord('longitude').points.ndim < 2:
@@ -212,7 +225,7 @@ def mask_landseaice(cube, fx_files, mask_out):
 
             if _check_dims(cube, fx_cube):
                 landice_mask = _get_fx_mask(fx_cube.data, mask_out, 'sftgif')
-                cube.data = _apply_fx_mask(landice_mask, cube.data)
+                cube.data = _apply_fx_mask(landice_mask, cube.core_data())
                 logger.debug("Applying landsea-ice mask: sftgif")
             else:
                 msg = "Landsea-ice mask and data have different dimensions."
@@ -226,6 +239,9 @@ def mask_landseaice(cube, fx_files, mask_out):
 
 def _get_geometry_from_shp(shapefilename):
     """Get the mask geometry out from a shapefile."""
+    # Imported here, because cartopy takes long to import
+    import cartopy.io.shapereader as shpreader
+
     reader = shpreader.Reader(shapefilename)
     # Index 0 grabs the lowest resolution mask (no zoom)
     main_geom = [contour for contour in reader.geometries()][0]
@@ -242,12 +258,11 @@ def _mask_with_shp(cube, shapefilename):
     the data cube lies within the desired geometry (eg land, sea) stored
     in the shapefile (this is done via shapefle vectorization and is fast).
     """
+    import shapely.vectorized as shp_vect
+
     # Create the region
     region = _get_geometry_from_shp(shapefilename)
 
-    # Create a mask for the data
-    mask = np.zeros(cube.shape, dtype=bool)
-
     # Create a set of x,y points from the cube
     # 1D regular grids
     if cube.coord('longitude').points.ndim < 2:
@@ -270,18 +285,13 @@ def _mask_with_shp(cube, shapefilename):
     y_p_90 = np.where(y_p_0 == 90., y_p_0 - 1., y_p_0)
 
     # Build mask with vectorization
-    if cube.ndim == 2:
+    if cube.ndim in (2, 3, 4):
         mask = shp_vect.contains(region, x_p_180, y_p_90)
-    elif cube.ndim == 3:
-        mask[:] = shp_vect.contains(region, x_p_180, y_p_90)
-    elif cube.ndim == 4:
-        mask[:, :] = shp_vect.contains(region, x_p_180, y_p_90)
+    else:
+        mask = False
 
     # Then apply the mask
-    if isinstance(cube.data, np.ma.MaskedArray):
-        cube.data.mask |= mask
-    else:
-        cube.data = np.ma.masked_array(cube.data, mask)
+    _apply_mask(mask, cube)
 
     return cube
 
@@ -343,6 +353,21 @@ def count_spells(data, threshold, axis, spell_length):
     return spell_point_counts
 
 
+def _lazy_count_spells(data, threshold, axis, spell_length):
+    """Count data occurences in a dask array, see :func:`count_spells`."""
+    if axis < 0:
+        axis += data.ndim
+    # All time points of a sequence need to be in the same chunk.
+    data = data.rechunk({axis: -1})
+    return da.map_blocks(count_spells,
+                         data,
+                         threshold,
+                         axis,
+                         spell_length,
+                         drop_axis=axis,
+                         dtype=int)
+
+
 def mask_above_threshold(cube, threshold):
     """
     Mask above a specific threshold value.
@@ -364,7 +389,8 @@ def mask_above_threshold(cube, threshold):
         thresholded cube.
 
     """
-    cube.data = np.ma.masked_where(cube.data > threshold, cube.data)
+    data = cube.core_data()
+    cube.data = da.ma.masked_where(data > threshold, data)
     return cube
 
 
@@ -388,7 +414,8 @@ def mask_below_threshold(cube, threshold):
         thresholded cube.
 
     """
-    cube.data = np.ma.masked_where(cube.data < threshold, cube.data)
+    data = cube.core_data()
+    cube.data = da.ma.masked_where(data < threshold, data)
     return cube
 
 
@@ -414,7 +441,7 @@ def mask_inside_range(cube, minimum, maximum):
         thresholded cube.
 
     """
-    cube.data = np.ma.masked_inside(cube.data, minimum, maximum)
+    cube.data = da.ma.masked_inside(cube.core_data(), minimum, maximum)
     return cube
 
 
@@ -440,7 +467,7 @@ def mask_outside_range(cube, minimum, maximum):
         thresholded cube.
 
     """
-    cube.data = np.ma.masked_outside(cube.data, minimum, maximum)
+    cube.data = da.ma.masked_outside(cube.core_data(), minimum, maximum)
     return cube
 
 
@@ -490,7 +517,10 @@ def mask_fillvalues(products,
     used = set()
     for product in products:
         for cube in product.cubes:
-            cube.data = np.ma.fix_invalid(cube.data, copy=False)
+            if cube.has_lazy_data():
+                cube.data = da.ma.masked_invalid(cube.lazy_data())
+            else:
+                cube.data = np.ma.fix_invalid(cube.data, copy=False)
             mask = _get_fillvalues_mask(cube, threshold_fraction, min_value,
                                         time_window)
             if combined_mask is None:
@@ -516,7 +546,7 @@ def mask_fillvalues(products,
         used = {p.copy_provenance() for p in used}
         for product in products:
             for cube in product.cubes:
-                cube.data.mask |= combined_mask
+                _apply_mask(combined_mask, cube)
             for other in used:
                 if other.filename != product.filename:
                     product.wasderivedfrom(other)
@@ -552,6 +582,7 @@ def _get_fillvalues_mask(cube, threshold_fraction, min_value, time_window):
     # Make an aggregator
     spell_count = Aggregator('spell_count',
                              count_spells,
+                             lazy_func=_lazy_count_spells,
                              units_func=lambda units: 1)
 
     # Calculate the statistic.
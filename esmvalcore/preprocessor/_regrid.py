@@ -6,14 +6,11 @@ from copy import deepcopy
 
 import iris
 import numpy as np
-import stratify
 from iris.analysis import AreaWeighted, Linear, Nearest, UnstructuredNearest
 
 from ..cmor.fix import fix_file, fix_metadata
 from ..cmor.table import CMOR_TABLES
 from ._io import concatenate_callback, load
-from ._regrid_esmpy import ESMF_REGRID_METHODS
-from ._regrid_esmpy import regrid as esmpy_regrid
 
 # Regular expression to parse a "MxN" cell-specification.
 _CELL_SPEC = re.compile(
@@ -166,14 +163,15 @@ def _stock_cube(spec, lat_offset=True, lon_offset=True):
 
 def _attempt_irregular_regridding(cube, scheme):
     """Check if irregular regridding with ESMF should be used."""
-    if scheme in ESMF_REGRID_METHODS:
-        try:
-            lat_dim = cube.coord('latitude').ndim
-            lon_dim = cube.coord('longitude').ndim
-            if lat_dim == lon_dim == 2:
-                return True
-        except iris.exceptions.CoordinateNotFoundError:
-            pass
+    try:
+        lat_dim = cube.coord('latitude').ndim
+        lon_dim = cube.coord('longitude').ndim
+    except iris.exceptions.CoordinateNotFoundError:
+        return False
+    if lat_dim == lon_dim == 2:
+        # Imported here, because ESMF takes long to import
+        from ._regrid_esmpy import ESMF_REGRID_METHODS
+        return scheme in ESMF_REGRID_METHODS
     return False
 
 
@@ -252,6 +250,7 @@ def regrid(cube, target_grid, scheme, lat_offset=True, lon_offset=True):
 
     # Perform the horizontal regridding.
     if _attempt_irregular_regridding(cube, scheme):
+        from ._regrid_esmpy import regrid as esmpy_regrid
         cube = esmpy_regrid(cube, target_grid, scheme)
     else:
         cube = cube.regrid(target_grid, HORIZONTAL_SCHEMES[scheme])
@@ -356,25 +355,47 @@ def _vertical_interpolate(cube, levels, interpolation, extrapolation):
     src_levels_broadcast = np.broadcast_to(src_levels_reshaped,
                                            broadcast_shape)
 
-    # force mask onto data as nan's
-    if np.ma.is_masked(cube.data):
-        cube.data[cube.data.mask] = np.nan
-
-    # Now perform the actual vertical interpolation.
-    new_data = stratify.interpolate(
-        levels,
-        src_levels_broadcast,
-        cube.data,
-        axis=z_axis,
-        interpolation=interpolation,
-        extrapolation=extrapolation)
-
-    # Calculate the mask based on the any NaN values in the interpolated data.
-    mask = np.isnan(new_data)
-
-    if np.any(mask):
-        # Ensure that the data is masked appropriately.
-        new_data = np.ma.array(new_data, mask=mask, fill_value=_MDI)
+    # Imported here, because stratify takes long to import
+    import stratify
+
+    def _interpolate(data):
+        """Interpolate a numpy array."""
+        # force mask onto data as nan's
+        if np.ma.is_masked(data):
+            data = np.ma.filled(data, np.nan)
+
+        # Now perform the actual vertical interpolation.
+        new_data = stratify.interpolate(
+            levels,
+            src_levels_broadcast,
+            data,
+            axis=z_axis,
+            interpolation=interpolation,
+            extrapolation=extrapolation)
+
+        # Calculate the mask based on the any NaN values in the interpolated
+        # data.
+        mask = np.isnan(new_data)
+
+        if np.any(mask):
+            # Ensure that the data is masked appropriately.
+            new_data = np.ma.array(new_data, mask=mask, fill_value=_MDI)
+        return new_data
+
+    if cube.has_lazy_data():
+        # Interpolate chunk by chunk, each chunk must contain the complete
+        # dimensions that were used to broadcast the source levels.
+        data = cube.lazy_data().rechunk(
+            {dim: -1 for dim in range(z_axis, cube.ndim)})
+        chunks = list(data.chunks)
+        chunks[z_axis] = (len(levels), )
+        new_data = data.map_blocks(
+            lambda block: _interpolate(block).astype(data.dtype, copy=False),
+            chunks=chunks,
+            dtype=data.dtype,
+        )
+    else:
+        new_data = _interpolate(cube.data)
 
     # Construct the resulting cube with the interpolated data.
     return _create_cube(cube, new_data, levels.astype(float))
@@ -175,8 +175,7 @@ def get_time_weights(cube):
     coord_dim = cube.coord_dims('time')[0]
     slices[coord_dim] = slice(None)
     time_thickness = np.abs(time_thickness[tuple(slices)])
-    ones = np.ones_like(cube.data)
-    time_weights = time_thickness * ones
+    time_weights = np.broadcast_to(time_thickness, cube.shape)
     return time_weights
 
 
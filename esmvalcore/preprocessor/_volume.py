@@ -8,6 +8,7 @@ from copy import deepcopy
 
 import logging
 
+import dask.array as da
 import iris
 import numpy as np
 
@@ -176,7 +177,7 @@ def volume_statistics(
 
     The volume average is weighted acoording to the cell volume. Cell volume
     is calculated from iris's cartography tool multiplied by the cell
-    thickness.
+    thickness. Masked cells are ignored.
 
     Parameters
     ----------
@@ -199,6 +200,9 @@ def volume_statistics(
     """
     # TODO: Test sigma coordinates.
     # TODO: Add other operations.
+    if operator != 'mean':
+        raise ValueError('Volume operator ({}) not '
+                         'recognised.'.format(operator))
 
     # ####
     # Load z coordinate field and figure out which dim is which.
@@ -215,73 +219,46 @@ def volume_statistics(
 
             grid_volume = fx_cube.data
             grid_volume_found = True
-            cube_shape = cube.data.shape
 
     if not grid_volume_found:
         grid_volume = calculate_volume(cube)
 
     # Check whether the dimensions are right.
-    if cube.data.ndim == 4 and grid_volume.ndim == 3:
-        grid_volume = np.tile(grid_volume,
-                              [cube_shape[0], 1, 1, 1])
+    if cube.ndim == 4 and grid_volume.ndim == 3:
+        grid_volume = np.broadcast_to(grid_volume, cube.shape)
 
-    if cube.data.shape != grid_volume.shape:
+    if cube.shape != grid_volume.shape:
         raise ValueError('Cube shape ({}) doesn`t match grid volume shape '
-                         '({})'.format(cube.data.shape, grid_volume.shape))
+                         '({})'.format(cube.shape, grid_volume.shape))
 
     # #####
-    # Calculate global volume weighted average
-    result = []
-    # #####
-    # iterate over time and z-coordinate dimensions.
-    for time_itr in range(cube.shape[t_dim]):
-        # ####
-        # create empty output arrays
-        column = []
-        depth_volume = []
-
-        # ####
-        # iterate over time and z-coordinate dimensions.
-        for z_itr in range(cube.shape[1]):
-            # ####
-            # Calculate weighted mean for this time and layer
-            if operator == 'mean':
-                total = cube[time_itr, z_itr].collapsed(
-                    [cube.coord(axis='z'),
-                     'longitude', 'latitude'],
-                    iris.analysis.MEAN,
-                    weights=grid_volume[time_itr, z_itr]).data
-            else:
-                raise ValueError('Volume operator ({}) not '
-                                 'recognised.'.format(operator))
-            column.append(total)
-
-            try:
-                layer_vol = np.ma.masked_where(
-                    cube[time_itr, z_itr].data.mask,
-                    grid_volume[time_itr, z_itr]).sum()
-
-            except AttributeError:
-                # ####
-                # No mask in the cube data.
-                layer_vol = grid_volume.sum()
-            depth_volume.append(layer_vol)
-        # ####
-        # Calculate weighted mean over the water volumn
-        result.append(np.average(column, weights=depth_volume))
+    # Calculate global volume weighted average, ignoring masked points.
+    # This is done on the lazy data if possible, so the cube is never
+    # loaded into memory as a whole.
+    if cube.has_lazy_data():
+        array_module = da
+    else:
+        array_module = np
+    data = cube.core_data()
+    mask = array_module.ma.getmaskarray(data)
+    weights = array_module.where(mask, 0., grid_volume)
+    data = array_module.ma.filled(data, 0.)
+    axes = tuple(i for i in range(cube.ndim) if i != t_dim)
+    volume = weights.sum(axis=axes)
+    result = ((data * weights).sum(axis=axes) /
+              array_module.where(volume == 0., 1., volume))
+    result = array_module.ma.masked_where(volume == 0., result)
 
     # ####
     # Send time series and dummy cube to cube creating tool.
     times = np.array(cube.coord('time').points.astype(float))
-    result = np.array(result)
 
     # #####
     # Create a small dummy output array for the output cube
-    if operator == 'mean':
-        src_cube = cube[:2, :2].collapsed([cube.coord(axis='z'),
-                                           'longitude', 'latitude'],
-                                          iris.analysis.MEAN,
-                                          weights=grid_volume[:2, :2], )
+    src_cube = cube[:2, :2].collapsed([cube.coord(axis='z'),
+                                       'longitude', 'latitude'],
+                                      iris.analysis.MEAN,
+                                      weights=grid_volume[:2, :2], )
 
     return _create_cube_time(src_cube, result, times)
 
@@ -314,9 +291,9 @@ def depth_integration(cube):
         slices[coord_dim] = slice(None)
         thickness = np.abs(thickness[tuple(slices)])
 
-    ones = np.ones_like(cube.data)
-
-    weights = thickness * ones
+    # Broadcast instead of multiplying with an array of ones, to avoid
+    # loading the data of the cube.
+    weights = np.broadcast_to(thickness, cube.shape)
 
     result = cube.collapsed(cube.coord(axis='z'), iris.analysis.SUM,
                             weights=weights)
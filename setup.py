@@ -44,6 +44,11 @@ REQUIREMENTS = {
         'stratify',
         'yamale',
     ],
+    # Optional dependencies for running tasks on a Dask cluster
+    # Use pip install .[dask] to install them
+    'dask': [
+        'distributed',
+    ],
     # Test dependencies
     # Execute 'python setup.py test' to run tests
     'test': [
@@ -189,6 +194,7 @@ setup(
     install_requires=REQUIREMENTS['install'],
     tests_require=REQUIREMENTS['test'],
     extras_require={
+        'dask': REQUIREMENTS['dask'],
         'develop': REQUIREMENTS['develop'] + REQUIREMENTS['test'],
     },
     entry_points={
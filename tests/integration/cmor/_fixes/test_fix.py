@@ -46,6 +46,24 @@ class TestFix(unittest.TestCase):
     def test_get_fix_no_var(self):
         self.assertListEqual(Fix.get_fixes('CMIP5', 'BNU-ESM', 'BAD_VAR'), [])
 
+    def test_get_fixes_memoized(self):
+        fixes = Fix.get_fixes('CMIP5', 'BNU-ESM', 'ch4')
+        fixes.append(None)
+        other = Fix.get_fixes('CMIP5', 'bnu_esm', 'CH4')
+        self.assertEqual(len(other), 1)
+        self.assertIs(other[0], fixes[0])
+
+    def test_list_fixes(self):
+        fixes = Fix.list_fixes()
+        self.assertIn(('cmip5', 'bnu_esm', 'Ch4'), fixes)
+        self.assertIn(('cmip6', 'ukesm1_0_ll', 'AllVars'), fixes)
+        self.assertEqual(fixes, sorted(set(fixes)))
+
+    def test_list_fixes_project(self):
+        fixes = Fix.list_fixes('OBS4MIPS')
+        self.assertIn(('obs4mips', 'ssmi', 'Prw'), fixes)
+        self.assertEqual({fix[0] for fix in fixes}, {'obs4mips'})
+
     def test_fix_metadata(self):
         cube = Cube([0])
         reference = Cube([0])
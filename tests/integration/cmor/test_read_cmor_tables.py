@@ -1,5 +1,6 @@
 from pathlib import Path
 
+import esmvalcore.cmor.table
 from esmvalcore._config import read_config_developer_file
 from esmvalcore.cmor.table import CMOR_TABLES
 from esmvalcore.cmor.table import __file__ as root
@@ -33,3 +34,15 @@ def test_read_cmor_tables():
     table = CMOR_TABLES[project]
     assert Path(table._cmor_folder) == table_path / 'obs4mips' / 'Tables'
     assert table.strict is False
+
+
+def test_read_cmor_tables_cache_dir(tmp_path, monkeypatch):
+    """Test that the tables are only cached if a directory is configured."""
+    monkeypatch.setattr(esmvalcore.cmor.table, 'CACHE_DIR', None)
+    read_cmor_tables(read_config_developer_file(), str(tmp_path))
+    assert esmvalcore.cmor.table.CACHE_DIR == str(tmp_path)
+    assert CMOR_TABLES['CMIP6'].get_variable('Amon', 'tas')
+    assert len(list(tmp_path.iterdir())) == 1
+
+    read_cmor_tables(read_config_developer_file())
+    assert esmvalcore.cmor.table.CACHE_DIR is None
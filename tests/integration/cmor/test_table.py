@@ -3,6 +3,7 @@
 import os
 import unittest
 
+import esmvalcore.cmor.table
 from esmvalcore.cmor.table import CMIP5Info, CMIP6Info, CustomInfo
 
 
@@ -82,6 +83,15 @@ class TestCMIP6Info(unittest.TestCase):
         self.assertEqual(var.short_name, 'toz')
         self.assertEqual(var.frequency, 'mon')
 
+    def test_get_variable_memoized(self):
+        """Repeated lookups return the same object."""
+        self.variables_info.strict = False
+        var = self.variables_info.get_variable('Omon', 'ta')
+        self.assertIs(var, self.variables_info.get_variable('Omon', 'ta'))
+        self.assertIsNot(var, self.variables_info.get_variable('Amon', 'ta'))
+        self.assertEqual(
+            self.variables_info.get_variable('Amon', 'ta').frequency, 'mon')
+
     def test_get_institute_from_source(self):
         """Get institution for source ACCESS-CM2"""
         institute = self.variables_info.institutes['ACCESS-CM2']
@@ -234,6 +244,14 @@ class TestCMIP5Info(unittest.TestCase):
         self.assertEqual(var.short_name, 'toz')
         self.assertEqual(var.frequency, 'mon')
 
+    def test_table_not_modified_if_not_strict(self):
+        """Looking up a variable in another table does not modify it."""
+        self.variables_info.strict = False
+        var = self.variables_info.get_variable('Oyr', 'ta')
+        self.assertEqual(var.frequency, 'yr')
+        self.assertEqual(
+            self.variables_info.get_table('6hrLev')['ta'].frequency, '6hr')
+
 
 class TestCustomInfo(unittest.TestCase):
     """Test for the custom info class."""
@@ -264,3 +282,39 @@ class TestCustomInfo(unittest.TestCase):
     def test_get_bad_variable(self):
         """Get none if a variable is not in the given table."""
         self.assertIsNone(self.variables_info.get_variable('Omon', 'badvar'))
+
+
+def test_tables_cache(tmp_path, monkeypatch):
+    """Test that parsed tables are read lazily and cached."""
+    monkeypatch.setattr(esmvalcore.cmor.table, 'CACHE_DIR', str(tmp_path))
+
+    info = CMIP6Info('cmip6', default=CustomInfo(), strict=True)
+    assert info._tables is None
+    assert not os.listdir(tmp_path)
+    assert info.get_variable('Amon', 'tas').short_name == 'tas'
+    assert len(os.listdir(tmp_path)) == 1
+
+    def fail(*_):
+        raise AssertionError("Tables should be read from the cache")
+
+    monkeypatch.setattr(CMIP6Info, '_read_tables', fail)
+    info = CMIP6Info('cmip6', default=CustomInfo(), strict=True)
+    var = info.get_variable('Amon', 'tas')
+    assert var.short_name == 'tas'
+    assert var.frequency == 'mon'
+    assert var.coordinates['T'].standard_name == 'time'
+
+
+def test_tables_cache_untrusted(tmp_path, monkeypatch):
+    """Test that cache files owned by another user are not unpickled."""
+    monkeypatch.setattr(esmvalcore.cmor.table, 'CACHE_DIR', str(tmp_path))
+    assert CMIP6Info('cmip6', default=CustomInfo(), strict=True).tables
+    assert len(os.listdir(tmp_path)) == 1
+
+    def load(*_):
+        raise AssertionError("Untrusted cache file read")
+
+    monkeypatch.setattr(esmvalcore.cmor.table, '_is_trusted', lambda _: False)
+    monkeypatch.setattr(esmvalcore.cmor.table.pickle, 'load', load)
+    info = CMIP6Info('cmip6', default=CustomInfo(), strict=True)
+    assert info.get_variable('Amon', 'tas').short_name == 'tas'
@@ -0,0 +1,146 @@
+"""Tests for :class:`esmvalcore.preprocessor._io.IntermediaryCubeWriter`."""
+import os
+import threading
+
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+import esmvalcore.preprocessor._io
+from esmvalcore._file_metadata import NETCDF_LOCK
+from esmvalcore.preprocessor._io import IntermediaryCubeWriter
+
+
+def _create_cube():
+    lat = DimCoord([0., 10., 20.],
+                   standard_name='latitude',
+                   units='degrees_north')
+    lon = DimCoord([0., 10., 20.],
+                   standard_name='longitude',
+                   units='degrees_east')
+    return Cube(np.arange(9.).reshape(3, 3),
+                var_name='tas',
+                units='K',
+                dim_coords_and_dims=[(lat, 0), (lon, 1)])
+
+
+def test_write(tmp_path):
+    filename = str(tmp_path / 'tas.nc')
+    cube = _create_cube()
+    with IntermediaryCubeWriter() as writer:
+        writer.write([cube], filename, 'fix_data')
+        # Changes made by later steps are not saved
+        cube.data[:] = -1.
+        writer.write([cube], filename, 'regrid')
+
+    result = iris.load_cube(str(tmp_path / 'tas' / '00_fix_data.nc'))
+    np.testing.assert_array_equal(result.data, np.arange(9.).reshape(3, 3))
+    result = iris.load_cube(str(tmp_path / 'tas' / '01_regrid.nc'))
+    np.testing.assert_array_equal(result.data, -1.)
+
+
+def _is_locked():
+    """Check if another thread holds `NETCDF_LOCK`."""
+    result = []
+
+    def _try_lock():
+        if NETCDF_LOCK.acquire(blocking=False):
+            NETCDF_LOCK.release()
+            result.append(False)
+        else:
+            result.append(True)
+
+    thread = threading.Thread(target=_try_lock)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_write_lazy(tmp_path):
+    computed = []
+
+    def _compute(block):
+        # Dask may call this with an empty block to find the output type
+        if block.size:
+            computed.append((threading.current_thread(), _is_locked()))
+        return block
+
+    filename = str(tmp_path / 'tas.nc')
+    cube = _create_cube()
+    cube.data = da.from_array(cube.data, chunks=-1).map_blocks(
+        _compute, dtype=cube.dtype)
+    with IntermediaryCubeWriter() as writer:
+        writer.write([cube], filename, 'fix_data')
+
+    assert computed
+    for thread, locked in computed:
+        assert thread is not threading.main_thread()
+        assert not locked
+    result = iris.load_cube(str(tmp_path / 'tas' / '00_fix_data.nc'))
+    np.testing.assert_array_equal(result.data, np.arange(9.).reshape(3, 3))
+
+
+def test_write_selection(tmp_path):
+    filename = str(tmp_path / 'tas.nc')
+    region = {
+        'start_longitude': 5.,
+        'end_longitude': 25.,
+        'start_latitude': -5.,
+        'end_latitude': 15.,
+    }
+    with IntermediaryCubeWriter(steps=['regrid'], region=region) as writer:
+        writer.write([_create_cube()], filename, 'fix_data')
+        writer.write([_create_cube()], filename, 'regrid')
+
+    assert sorted(p.name for p in (tmp_path / 'tas').iterdir()) == [
+        '01_regrid.nc',
+    ]
+    result = iris.load_cube(str(tmp_path / 'tas' / '01_regrid.nc'))
+    assert result.shape == (2, 2)
+
+
+def test_write_max_queued_bytes(tmp_path, monkeypatch):
+    saving = threading.Event()
+    saved = []
+
+    def _save(cubes, filename):
+        saving.wait()
+        saved.append(filename)
+
+    monkeypatch.setattr(esmvalcore.preprocessor._io, 'save', _save)
+    filename = str(tmp_path / 'tas.nc')
+    cube = _create_cube()
+    writer = IntermediaryCubeWriter(max_queued_bytes=cube.data.nbytes)
+    writer.write([cube], filename, 'fix_data')
+    # Lazy data does not count, because it is not in memory yet
+    lazy_cube = cube.copy(da.from_array(cube.data))
+    writer.write([lazy_cube], filename, 'fix_metadata')
+
+    thread = threading.Thread(target=writer.write,
+                              args=([cube], filename, 'regrid'))
+    thread.start()
+    thread.join(0.1)
+    assert thread.is_alive()
+    saving.set()
+    thread.join()
+    writer.close()
+
+    assert [os.path.basename(p) for p in saved] == [
+        '00_fix_data.nc',
+        '01_fix_metadata.nc',
+        '02_regrid.nc',
+    ]
+
+
+def test_write_error(tmp_path, monkeypatch):
+    def _fail(cubes, filename):
+        raise OSError(filename)
+
+    monkeypatch.setattr(esmvalcore.preprocessor._io, 'save', _fail)
+    writer = IntermediaryCubeWriter()
+    writer.write([_create_cube()], str(tmp_path / 'tas.nc'), 'fix_data')
+    with pytest.raises(OSError):
+        writer.close()
@@ -3,6 +3,7 @@
 import os
 import tempfile
 import unittest
+from datetime import datetime
 
 import iris
 import numpy as np
@@ -18,6 +19,16 @@ def _create_sample_cube():
     return cube
 
 
+def _create_sample_time_cube():
+    coord = DimCoord([15., 45., 75., 105.],
+                     standard_name='time',
+                     units='days since 2000-01-01')
+    cube = Cube([1, 2, 3, 4],
+                var_name='sample',
+                dim_coords_and_dims=((coord, 0), ))
+    return cube
+
+
 class TestLoad(unittest.TestCase):
     """Tests for :func:`esmvalcore.preprocessor.load`."""
 
@@ -80,3 +91,39 @@ class TestLoad(unittest.TestCase):
         self.assertTrue((cube.coord('latitude').points == np.array([1,
                                                                     2])).all())
         self.assertEquals(cube.coord('latitude').units, 'degrees_north')
+
+    def test_load_time_slice(self):
+        """Test loading only the requested time steps."""
+        cube = _create_sample_time_cube()
+        temp_file = self._save_cube(cube)
+
+        cubes = load(temp_file,
+                     start_date=datetime(2000, 2, 1),
+                     end_date=datetime(2000, 4, 1))
+        cube = cubes[0]
+        self.assertEqual(1, len(cubes))
+        self.assertTrue(cube.has_lazy_data())
+        self.assertTrue((cube.data == np.array([2, 3])).all())
+        self.assertTrue(
+            (cube.coord('time').points == np.array([45., 75.])).all())
+
+    def test_load_time_slice_outside_period(self):
+        """Test loading a file without time steps in the period."""
+        cube = _create_sample_time_cube()
+        temp_file = self._save_cube(cube)
+
+        cubes = load(temp_file,
+                     start_date=datetime(2001, 1, 1),
+                     end_date=datetime(2002, 1, 1))
+        self.assertEqual(0, len(cubes))
+
+    def test_load_time_slice_no_time(self):
+        """Test that cubes without time are not sliced."""
+        cube = _create_sample_cube()
+        temp_file = self._save_cube(cube)
+
+        cubes = load(temp_file,
+                     start_date=datetime(2001, 1, 1),
+                     end_date=datetime(2002, 1, 1))
+        self.assertEqual(1, len(cubes))
+        self.assertTrue((cubes[0].data == np.array([1, 2])).all())
@@ -11,6 +11,7 @@ from iris.coords import DimCoord
 from iris.cube import Cube
 
 from esmvalcore.preprocessor import save
+from esmvalcore.preprocessor._io import _append
 
 
 class TestSave(unittest.TestCase):
@@ -101,6 +102,20 @@ class TestSave(unittest.TestCase):
         expected_chunks = [2, 1, 1]
         self._check_chunks(path, expected_chunks)
 
+    def test_append(self):
+        """Test appending to a saved file along the time dimension."""
+        cube, filename = self._create_sample_cube()
+        cube.coord('latitude').var_name = 'lat'
+        cube.coord('longitude').var_name = 'lon'
+        cube.coord('time').var_name = 'time'
+        cube.coord('time').guess_bounds()
+        save([cube[..., :1]], filename, unlimited_dimensions=['time'])
+        _append([cube[..., 1:]], filename)
+        loaded_cube = iris.load_cube(filename)
+        self._compare_cubes(cube, loaded_cube)
+        self.assertTrue((cube.coord('time').bounds ==
+                         loaded_cube.coord('time').bounds).all())
+
     def _check_chunks(self, path, expected_chunks):
         handler = netCDF4.Dataset(path, 'r')
         chunking = handler.variables['sample'].chunking()
@@ -0,0 +1,161 @@
+"""Tests for :class:`esmvalcore.preprocessor.PreprocessingTask`."""
+import threading
+import time
+
+import iris
+import numpy as np
+import pytest
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+import esmvalcore.preprocessor
+from esmvalcore._provenance import TrackedFile
+from esmvalcore.preprocessor import PreprocessingTask, PreprocessorFile
+
+
+class _FileAccess:
+    """Record the threads that load and save files."""
+
+    def __init__(self, monkeypatch):
+        self.threads = set()
+        load = esmvalcore.preprocessor.load
+        save = esmvalcore.preprocessor.save
+
+        # The name of the first argument sets how the step is applied
+        def _load(file, **kwargs):
+            return self._run(load, file, kwargs)
+
+        def _save(cubes, **kwargs):
+            return self._run(save, cubes, kwargs)
+
+        monkeypatch.setattr(esmvalcore.preprocessor, 'load', _load)
+        monkeypatch.setattr(esmvalcore.preprocessor, 'save', _save)
+
+    def _run(self, function, items, kwargs):
+        self.threads.add(threading.get_ident())
+        time.sleep(0.05)
+        return function(items, **kwargs)
+
+
+def _get_product(tmp_path, name):
+    input_file = str(tmp_path / 'input' / (name + '.nc'))
+    (tmp_path / 'input').mkdir(exist_ok=True)
+    iris.save(Cube(np.arange(4.), var_name='tas', units='K'), input_file)
+    return PreprocessorFile(
+        attributes={'filename': str(tmp_path / 'output' / (name + '.nc'))},
+        settings={'mask_above_threshold': {
+            'threshold': 1.5
+        }},
+        ancestors=[TrackedFile(input_file, {})],
+    )
+
+
+@pytest.mark.parametrize('read_ahead', [0, 1, 2])
+def test_read_ahead(tmp_path, read_ahead):
+    products = [_get_product(tmp_path, name) for name in 'abc']
+    task = PreprocessingTask(products, read_ahead=read_ahead)
+    task._run_blocks()
+
+    expected = np.ma.masked_greater(np.arange(4.), 1.5)
+    for product in products:
+        assert product.is_closed
+        cube = iris.load_cube(product.filename)
+        np.testing.assert_array_equal(cube.data.mask, expected.mask)
+
+
+def test_read_ahead_file_access(tmp_path, monkeypatch):
+    access = _FileAccess(monkeypatch)
+    products = [_get_product(tmp_path, name) for name in 'abcd']
+    task = PreprocessingTask(products, read_ahead=2)
+    task._run_blocks()
+
+    assert len(access.threads) > 1
+    for product in products:
+        assert product.is_closed
+
+
+def _get_yearly_product(tmp_path, years):
+    input_files = []
+    for year in range(years):
+        filename = str(tmp_path / 'input' / 'tas_{}.nc'.format(year))
+        (tmp_path / 'input').mkdir(exist_ok=True)
+        iris.save(Cube([float(year)], var_name='tas', units='K'), filename)
+        input_files.append(TrackedFile(filename, {}))
+    return PreprocessorFile(
+        attributes={'filename': str(tmp_path / 'output' / 'tas.nc')},
+        settings={
+            'fix_metadata': {
+                'short_name': 'tas',
+                'project': 'CMIP6',
+                'dataset': 'dataset',
+            },
+        },
+        ancestors=input_files,
+    )
+
+
+def test_load_parallel(tmp_path, monkeypatch):
+    access = _FileAccess(monkeypatch)
+    product = _get_yearly_product(tmp_path, 5)
+    product.load_workers = 3
+
+    product.apply('fix_metadata')
+
+    assert len(access.threads) > 1
+    assert [cube.data[0] for cube in product.cubes] == list(range(5))
+    for cube in product.cubes:
+        assert 'source_file' not in cube.attributes
+
+
+def test_load_parallel_overlaps(tmp_path, monkeypatch):
+    barrier = threading.Barrier(2, timeout=10)
+    load = esmvalcore.preprocessor.load
+
+    def _load(file, **kwargs):
+        # Fails if the files cannot be loaded at the same time
+        barrier.wait()
+        return load(file, **kwargs)
+
+    monkeypatch.setattr(esmvalcore.preprocessor, 'load', _load)
+    product = _get_yearly_product(tmp_path, 2)
+    product.load_workers = 2
+
+    product.apply('fix_metadata')
+
+    assert [cube.data[0] for cube in product.cubes] == [0., 1.]
+
+
+@pytest.mark.parametrize('target_grid,factor', [
+    ('10x10', 36 * 18 / 4),
+    ('180x180', 1),
+])
+def test_estimate_memory_regrid(tmp_path, target_grid, factor):
+    lat = DimCoord([-45., 45.],
+                   standard_name='latitude',
+                   units='degrees_north')
+    lon = DimCoord([90., 270.],
+                   standard_name='longitude',
+                   units='degrees_east')
+    input_file = str(tmp_path / 'tas.nc')
+    iris.save(
+        Cube(np.zeros((2, 2), dtype=np.float32),
+             var_name='tas',
+             units='K',
+             dim_coords_and_dims=[(lat, 0), (lon, 1)]), input_file)
+
+    def get_task(settings):
+        product = PreprocessorFile(
+            attributes={'filename': str(tmp_path / 'output' / 'tas.nc')},
+            settings=settings,
+            ancestors=[TrackedFile(input_file, {})],
+        )
+        return PreprocessingTask([product])
+
+    memory = get_task({}).estimate_memory()
+    task = get_task({
+        'regrid': {
+            'target_grid': target_grid,
+            'scheme': 'linear',
+        },
+    })
+    assert task.estimate_memory() == factor * memory
@@ -0,0 +1,49 @@
+"""Tests for preprocessing data one time window at a time."""
+import iris
+import numpy as np
+from cf_units import Unit
+from iris.coords import DimCoord
+from iris.cube import Cube
+
+from esmvalcore._provenance import TrackedFile
+from esmvalcore.preprocessor import PreprocessorFile
+
+
+def _create_input_file(filename):
+    time = DimCoord(np.arange(5.),
+                    var_name='time',
+                    standard_name='time',
+                    units=Unit('days since 2000-01-01', calendar='standard'))
+    time.guess_bounds()
+    lat = DimCoord([0., 1.],
+                   var_name='lat',
+                   standard_name='latitude',
+                   units='degrees_north')
+    cube = Cube(np.arange(10., dtype=np.float32).reshape(5, 2),
+                var_name='tas',
+                units='K',
+                dim_coords_and_dims=[(time, 0), (lat, 1)])
+    iris.save(cube, filename)
+    return cube
+
+
+def test_stream(tmp_path):
+    input_file = str(tmp_path / 'input.nc')
+    cube = _create_input_file(input_file)
+    output_file = str(tmp_path / 'output.nc')
+    product = PreprocessorFile(
+        attributes={'filename': output_file},
+        settings={'mask_above_threshold': {
+            'threshold': 6.
+        }},
+        ancestors=[TrackedFile(input_file, {})],
+    )
+
+    product.stream(['mask_above_threshold'], window=2)
+
+    assert product.is_closed
+    result = iris.load_cube(output_file)
+    expected = np.ma.masked_greater(cube.data, 6.)
+    np.testing.assert_array_equal(result.data, expected)
+    np.testing.assert_array_equal(result.data.mask, expected.mask)
+    assert result.coord('time') == cube.coord('time')
@@ -2,12 +2,14 @@
 import os
 import shutil
 import tempfile
+from copy import deepcopy
 
 import pytest
 import yaml
 
 import esmvalcore._config
-from esmvalcore._data_finder import get_input_filelist, get_output_file
+from esmvalcore._data_finder import (InputFilesCache, get_input_filelist,
+                                     get_output_file)
 from esmvalcore.cmor.table import read_cmor_tables
 
 # Initialize with standard config developer file
@@ -91,3 +93,70 @@ def test_get_input_filelist(root, cfg):
     # Test result
     reference = [os.path.join(root, file) for file in cfg['found_files']]
     assert sorted(input_filelist) == sorted(reference)
+
+
+@pytest.mark.parametrize('cfg', CONFIG['get_input_filelist'])
+def test_get_input_filelist_file_index(root, cfg):
+    """Test retrieving input filelist using the file index."""
+    create_tree(root, cfg.get('available_files'),
+                cfg.get('available_symlinks'))
+
+    # Find files
+    rootpath = {cfg['variable']['project']: [root]}
+    drs = {cfg['variable']['project']: cfg['drs']}
+    file_index = os.path.join(os.path.dirname(root), 'file_index.sqlite')
+    input_filelist = get_input_filelist(cfg['variable'], rootpath, drs,
+                                        file_index)
+
+    # Test result
+    reference = [os.path.join(root, file) for file in cfg['found_files']]
+    assert sorted(input_filelist) == sorted(reference)
+
+
+@pytest.mark.parametrize('cfg', CONFIG['get_input_filelist'])
+def test_get_input_filelist_threads(root, cfg):
+    """Test retrieving input filelist using multiple threads."""
+    create_tree(root, cfg.get('available_files'),
+                cfg.get('available_symlinks'))
+
+    # Find files
+    rootpath = {cfg['variable']['project']: [root, root + '2']}
+    drs = {cfg['variable']['project']: cfg['drs']}
+    input_filelist = get_input_filelist(cfg['variable'],
+                                        rootpath,
+                                        drs,
+                                        max_workers=4)
+    reference = get_input_filelist(cfg['variable'], rootpath, drs)
+
+    # Test result
+    assert input_filelist == reference
+    reference = [os.path.join(root, file) for file in cfg['found_files']]
+    assert sorted(input_filelist) == sorted(reference)
+
+
+@pytest.mark.parametrize('cfg', CONFIG['get_input_filelist'])
+def test_get_input_filelist_cache(root, cfg):
+    """Test retrieving input filelist using the recipe-wide cache."""
+    create_tree(root, cfg.get('available_files'),
+                cfg.get('available_symlinks'))
+
+    # Find files
+    rootpath = {cfg['variable']['project']: [root]}
+    drs = {cfg['variable']['project']: cfg['drs']}
+    cache = InputFilesCache()
+    input_filelist = cache.get_input_filelist(deepcopy(cfg['variable']),
+                                              rootpath, drs)
+    input_filelist.append('modified')
+    cached_filelist = cache.get_input_filelist(deepcopy(cfg['variable']),
+                                               rootpath, drs)
+
+    # Test result
+    assert (cache.hits, cache.misses) == (1, 1)
+    reference = [os.path.join(root, file) for file in cfg['found_files']]
+    assert sorted(cached_filelist) == sorted(reference)
+
+    # A different rootpath is a different entry
+    rootpath = {cfg['variable']['project']: [root + '2']}
+    assert cache.get_input_filelist(deepcopy(cfg['variable']), rootpath,
+                                    drs) == []
+    assert (cache.hits, cache.misses) == (1, 2)
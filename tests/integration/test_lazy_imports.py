@@ -0,0 +1,45 @@
+"""Test that optional libraries are not imported with the preprocessor."""
+import json
+import subprocess
+import sys
+
+# Modules that should only be imported when a preprocessor function or
+# derived variable that needs them is used. Libraries that are imported by
+# iris anyway, like cartopy and scipy, are not listed.
+LAZY_MODULES = (
+    'ESMF',
+    'fiona',
+    'shapely',
+    'stratify',
+)
+
+SCRIPT = """
+import json
+import sys
+
+import cf_units
+import dask.array
+import iris
+import numpy
+
+baseline = set(sys.modules)
+import esmvalcore.preprocessor
+print(json.dumps(sorted(set(sys.modules) - baseline)))
+"""
+
+
+def _import_preprocessor():
+    """Import the preprocessor in a new interpreter."""
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT])
+    return json.loads(output.decode().splitlines()[-1])
+
+
+def test_lazy_imports():
+    """Test that heavy dependencies are not imported with the preprocessor."""
+    imported = [
+        module for module in _import_preprocessor()
+        if any(module == name or module.startswith(name + '.')
+               for name in LAZY_MODULES)
+        or module.startswith('esmvalcore.preprocessor._derive.')
+    ]
+    assert imported == []
@@ -1,4 +1,8 @@
+import logging
 import os
+import threading
+import time
+from datetime import datetime
 from pathlib import Path
 from pprint import pformat
 from textwrap import dedent
@@ -9,7 +13,7 @@ import yaml
 from mock import create_autospec
 
 import esmvalcore
-from esmvalcore._recipe import TASKSEP, read_recipe_file
+from esmvalcore._recipe import TASKSEP, _map_in_threads, read_recipe_file
 from esmvalcore._recipe_checks import RecipeError
 from esmvalcore._task import DiagnosticTask
 from esmvalcore.preprocessor import DEFAULT_ORDER, PreprocessingTask
@@ -1300,3 +1304,309 @@ def test_extract_shape_raises(tmp_path, patched_datafinder, config_user,
         get_recipe(tmp_path, content, config_user)
         assert 'extract_shape' in exc.value
         assert invalid_arg in exc.value
+
+
+def test_start_end_date(tmp_path, patched_datafinder, config_user):
+    content = dedent("""
+        diagnostics:
+          diagnostic_name:
+            variables:
+              tas:
+                project: CMIP5
+                mip: 3hr
+                exp: historical
+                start_date: 2000-06-01
+                end_date: 2000-08-15T12:00:00
+                ensemble: r1i1p1
+                additional_datasets:
+                  - {dataset: CanESM2}
+            scripts: null
+        """)
+
+    recipe = get_recipe(tmp_path, content, config_user)
+
+    task = recipe.tasks.pop()
+    product = task.products.pop()
+    assert product.attributes['start_year'] == 2000
+    assert product.attributes['end_year'] == 2000
+    assert product.attributes['start_date'] == '2000-06-01T00:00:00'
+    assert product.attributes['end_date'] == '2000-08-15T12:00:00'
+    assert product.filename.endswith('_20000601-20000815T120000.nc')
+    assert product.settings['load']['start_date'] == datetime(2000, 6, 1)
+    assert product.settings['load']['end_date'] == datetime(
+        2000, 8, 15, 12)
+    assert product.settings['extract_time'] == {
+        'start_year': 2000,
+        'end_year': 2000,
+        'start_month': 6,
+        'end_month': 8,
+        'start_day': 1,
+        'end_day': 16,
+    }
+
+
+def test_start_end_date_invalid(tmp_path, patched_datafinder, config_user):
+    content = dedent("""
+        diagnostics:
+          diagnostic_name:
+            variables:
+              tas:
+                project: CMIP5
+                mip: 3hr
+                exp: historical
+                start_date: 2000-06-01
+                end_date: 2000-06-01
+                ensemble: r1i1p1
+                additional_datasets:
+                  - {dataset: CanESM2}
+            scripts: null
+        """)
+
+    with pytest.raises(RecipeError):
+        get_recipe(tmp_path, content, config_user)
+
+
+def test_map_in_threads(caplog):
+    logger = logging.getLogger(__name__)
+
+    def square(i):
+        # Make later items finish first
+        time.sleep(0.01 * (5 - i))
+        logger.info("Processing item %s", i)
+        if i == 3:
+            raise RecipeError("Item 3 failed")
+        return i * i
+
+    with caplog.at_level(logging.INFO):
+        result = _map_in_threads(square, [0, 1, 2], max_workers=3)
+    assert result == [0, 1, 4]
+    assert caplog.messages == [
+        "Processing item {}".format(i) for i in range(3)
+    ]
+
+    caplog.clear()
+    with caplog.at_level(logging.INFO):
+        with pytest.raises(RecipeError) as exc:
+            _map_in_threads(square, [0, 1, 2, 3, 4], max_workers=5)
+    assert str(exc.value) == "Item 3 failed"
+    assert caplog.messages[:4] == [
+        "Processing item {}".format(i) for i in range(4)
+    ]
+
+
+def test_map_in_threads_other_threads(caplog):
+    logger = logging.getLogger(__name__)
+    started = threading.Event()
+    logged = threading.Event()
+
+    def log_from_other_thread():
+        started.wait()
+        logger.info("Other thread")
+        logged.set()
+
+    def process(i):
+        started.set()
+        # Only return after the other thread has logged its message
+        assert logged.wait(5)
+        logger.info("Processing item %s", i)
+        return i
+
+    other = threading.Thread(target=log_from_other_thread)
+    other.start()
+    with caplog.at_level(logging.INFO):
+        result = _map_in_threads(process, [0, 1], max_workers=2)
+    other.join()
+    assert result == [0, 1]
+    assert caplog.messages == [
+        "Other thread",
+        "Processing item 0",
+        "Processing item 1",
+    ]
+
+
+def test_parallel_initialization(tmp_path, patched_datafinder, config_user,
+                                 caplog, monkeypatch):
+    find_files = esmvalcore._data_finder.find_files
+    lock = threading.Lock()
+
+    def locked_find_files(*args):
+        # The patched datafinder is not thread-safe
+        with lock:
+            return find_files(*args)
+
+    monkeypatch.setattr(esmvalcore._data_finder, 'find_files',
+                        locked_find_files)
+    content = dedent("""
+        diagnostics:
+          diagnostic_name:
+            variables:
+              ta:
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+                additional_datasets:
+                  - {dataset: bcc-csm1-1}
+                  - {dataset: GFDL-CM3}
+                  - {dataset: MPI-ESM-LR}
+            scripts: null
+        """)
+
+    def get_tasks(max_parallel_initialization):
+        caplog.clear()
+        cfg = dict(config_user)
+        cfg['max_parallel_initialization'] = max_parallel_initialization
+        with caplog.at_level(logging.INFO):
+            recipe = get_recipe(tmp_path, content, cfg)
+        task = next(iter(recipe.tasks))
+        products = {
+            p.filename: (p.settings, sorted(p.files))
+            for p in task.products
+        }
+        return products, list(caplog.messages)
+
+    assert get_tasks(3) == get_tasks(1)
+
+
+def test_deduplicate_products(tmp_path, patched_datafinder, config_user):
+    content = dedent("""
+        preprocessors:
+          regrid:
+            regrid:
+              target_grid: 2x2
+              scheme: linear
+
+        datasets:
+          - {dataset: bcc-csm1-1}
+
+        diagnostics:
+          diagnostic1:
+            variables:
+              ta:
+                preprocessor: regrid
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+            scripts: null
+          diagnostic2:
+            variables:
+              ta:
+                preprocessor: regrid
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+              pr:
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+            scripts: null
+        """)
+
+    recipe = get_recipe(tmp_path, content, config_user)
+    tasks = {t.name: t for task in recipe.tasks for t in task.flatten()}
+    task1 = tasks['diagnostic1' + TASKSEP + 'ta']
+    task2 = tasks['diagnostic2' + TASKSEP + 'ta']
+    product1 = next(iter(task1.products))
+    product2 = next(iter(task2.products))
+    assert product1.copy_of is None
+    assert product2.copy_of == product1.filename
+    assert task2.ancestors == [task1]
+    assert not tasks['diagnostic2' + TASKSEP + 'pr'].ancestors
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_split_preprocessing_tasks(tmp_path, patched_datafinder,
+                                   config_user, debug):
+    content = dedent("""
+        preprocessors:
+          regrid:
+            regrid:
+              target_grid: 2x2
+              scheme: linear
+          statistics:
+            regrid:
+              target_grid: 2x2
+              scheme: linear
+            multi_model_statistics:
+              span: overlap
+              statistics: [mean]
+
+        datasets:
+          - {dataset: bcc-csm1-1}
+          - {dataset: GFDL-CM3}
+
+        diagnostics:
+          diagnostic_name:
+            variables:
+              ta:
+                preprocessor: regrid
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+              pr:
+                preprocessor: statistics
+                project: CMIP5
+                mip: Amon
+                exp: historical
+                ensemble: r1i1p1
+                start_year: 2000
+                end_year: 2005
+            scripts: null
+        """)
+    config_user = dict(config_user)
+    config_user['max_parallel_tasks'] = 2
+    config_user['save_intermediary_cubes'] = debug
+
+    recipe = get_recipe(tmp_path, content, config_user)
+    tasks = {t.name: t for t in recipe.tasks}
+
+    # The single-model directories are removed, unless they contain the
+    # intermediary cubes
+    def removed(product, dirname):
+        cleanup = product.settings.get('cleanup', {})
+        return dirname in cleanup.get('remove', [])
+
+    # Without multi-model steps, the products are only linked
+    task = tasks['diagnostic_name' + TASKSEP + 'ta']
+    assert len(task.ancestors) == 2
+    for product in task.products:
+        unit = next(t for t in task.ancestors
+                    if os.path.basename(t.name) in product.copy_of)
+        unit_product = next(iter(unit.products))
+        assert unit_product.filename == product.copy_of
+        assert 'regrid' in unit_product.settings
+        assert unit.ancestors == []
+        assert removed(product, os.path.dirname(product.copy_of)) is not debug
+
+    # With multi-model steps, the products are loaded from the output of
+    # the single-model steps
+    task = tasks['diagnostic_name' + TASKSEP + 'pr']
+    assert len(task.ancestors) == 2
+    unit_files = {next(iter(t.products)).filename for t in task.ancestors}
+    for product in task.products:
+        assert product.copy_of is None
+        assert len(product.files) == 1
+        assert product.files[0] in unit_files
+        assert removed(product,
+                       os.path.dirname(product.files[0])) is not debug
+        assert 'regrid' in product.computed_steps
+        assert 'fix_metadata' in product.computed_steps
+        assert 'multi_model_statistics' not in product.computed_steps
+    for unit in task.ancestors:
+        unit_product = next(iter(unit.products))
+        assert 'regrid' in unit_product.settings
+        assert 'multi_model_statistics' not in unit_product.settings
@@ -1,12 +1,18 @@
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 from multiprocessing.pool import ThreadPool
+from types import SimpleNamespace
 
 import pytest
 
 import esmvalcore
-from esmvalcore._task import (BaseTask, _run_tasks_parallel,
-                              _run_tasks_sequential, run_tasks)
+from esmvalcore._task import (BaseTask, DaskExecutor, _run_tasks_parallel,
+                              _run_tasks_sequential, get_executor, run_tasks,
+                              set_critical_path_priority)
 
 
 @pytest.fixture
@@ -80,3 +86,216 @@ def test_runner_uses_priority(monkeypatch, runner, example_tasks):
     print(order)
     assert len(order) == 12
     assert order == sorted(order)
+
+
+def test_runner_raises_task_error(monkeypatch, example_tasks):
+    """Check that the parallel runner stops if a task fails."""
+    def _run(self, input_files):
+        if self.name == 'task1-ancestor1':
+            raise ValueError(self.name)
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    with pytest.raises(ValueError, match='task1-ancestor1'):
+        _run_tasks_parallel(example_tasks, max_parallel_tasks=2)
+
+
+def test_runner_respects_max_memory(monkeypatch):
+    """Check that the running tasks fit in the available memory."""
+    tasks = set()
+    for i, memory in enumerate([1, 1, 1, 1, 3]):
+        task = BaseTask(name=f'task{i}')
+        task.memory = memory * 2**30
+        tasks.add(task)
+
+    lock = threading.Lock()
+    in_use = []
+
+    def _run(self, input_files):
+        with lock:
+            in_use.append(self.memory)
+            assert sum(in_use) <= 2 * 2**30 or in_use == [self.memory]
+        time.sleep(0.01)
+        with lock:
+            in_use.remove(self.memory)
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    run_tasks(tasks, max_parallel_tasks=4, max_memory=2)
+    for task in tasks:
+        assert task.output_files
+
+
+def test_runner_reserves_memory(monkeypatch):
+    """Check that small tasks do not keep a large task waiting."""
+    tasks = set()
+    for i in range(8):
+        task = BaseTask(name=f'small{i}')
+        task.memory = 2**30
+        task.priority = 0 if i < 2 else 2
+        tasks.add(task)
+    large = BaseTask(name='large')
+    large.memory = 2 * 2**30
+    large.priority = 1
+    tasks.add(large)
+
+    lock = threading.Lock()
+    started = []
+
+    def _run(self, input_files):
+        with lock:
+            started.append(self.name)
+        time.sleep(0.01)
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    run_tasks(tasks, max_parallel_tasks=3, max_memory=3)
+    assert len(started) == 9
+    assert started.index('large') == 2
+
+
+def test_runner_records_runtime(monkeypatch, example_tasks):
+    """Check that the runtime and memory use of tasks are recorded."""
+    def _run(self, input_files):
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'Pool', ThreadPool)
+
+    for task in example_tasks:
+        for task0 in task.flatten():
+            task0.track_memory = True
+    _run_tasks_parallel(example_tasks, max_parallel_tasks=2)
+    for task in example_tasks:
+        for task0 in task.flatten():
+            assert task0.runtime >= 0
+            assert task0.peak_memory >= 0
+
+
+def test_peak_memory_excludes_baseline(monkeypatch):
+    """Check that memory in use before a task started is not counted."""
+    class Process:
+        """Process that uses 500 MB at the start and 600 MB afterwards."""
+
+        def __init__(self):
+            self.samples = 0
+
+        def children(self, recursive=False):
+            return []
+
+        def memory_info(self):
+            self.samples += 1
+            rss = 500 if self.samples == 1 else 600
+            return SimpleNamespace(rss=rss * 2**20)
+
+    def _run(self, input_files):
+        return [f'{self.name}_test.nc']
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task.psutil, 'Process', Process)
+
+    task = BaseTask(name='task')
+    task.track_memory = True
+    task.run()
+    assert task.peak_memory == 100 * 2**20
+
+
+def test_runner_does_not_track_memory(monkeypatch, example_tasks):
+    """Check that memory use is only sampled if requested."""
+    def _run(self, input_files):
+        return [f'{self.name}_test.nc']
+
+    def peak_memory_tracker():
+        raise AssertionError("Memory use should not be sampled")
+
+    monkeypatch.setattr(BaseTask, '_run', _run)
+    monkeypatch.setattr(esmvalcore._task, 'peak_memory_tracker',
+                        peak_memory_tracker)
+
+    _run_tasks_sequential(example_tasks)
+    for task in example_tasks:
+        for task0 in task.flatten():
+            assert task0.runtime >= 0
+            assert task0.peak_memory is None
+
+
+def test_set_critical_path_priority():
+    """Check that tasks on the longest path get the highest priority."""
+    short = BaseTask(name='short')
+    long = BaseTask(name='long')
+    diagnostic1 = BaseTask(name='diagnostic1', ancestors=[short])
+    diagnostic2 = BaseTask(name='diagnostic2', ancestors=[short, long])
+    for i, task in enumerate([short, long, diagnostic1, diagnostic2]):
+        task.priority = i
+    runtimes = {short: 10, long: 5, diagnostic1: 1, diagnostic2: 20}
+
+    set_critical_path_priority([diagnostic1, diagnostic2], runtimes)
+
+    # short -> diagnostic2 takes 30 seconds, long -> diagnostic2 25
+    ranked = sorted([short, long, diagnostic1, diagnostic2],
+                    key=lambda t: t.priority)
+    assert ranked == [short, long, diagnostic2, diagnostic1]
+
+
+class _NamedTask(BaseTask):
+    """Task that returns its name, it can be run in another process."""
+
+    def _run(self, input_files):
+        return [f'{self.name}_test.nc'] + sorted(input_files)
+
+
+def _check_outputs(tasks):
+    for task in tasks:
+        assert task.output_files[0] == f'{task.name}_test.nc'
+        assert task.output_files[1:] == sorted(
+            output for ancestor in task.ancestors
+            for output in ancestor.output_files)
+
+
+def _get_named_tasks():
+    tasks = set()
+    for i in range(3):
+        ancestors = [_NamedTask(name=f'task{i}-ancestor{j}') for j in range(2)]
+        tasks.add(_NamedTask(name=f'task{i}', ancestors=ancestors))
+    return tasks
+
+
+@pytest.mark.parametrize('max_parallel_tasks', [1, 2, None])
+def test_run_tasks_with_executor(max_parallel_tasks):
+    """Check that tasks can be run with another executor."""
+    tasks = _get_named_tasks()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        run_tasks(tasks, max_parallel_tasks, executor=executor)
+    _check_outputs(tasks)
+
+
+def test_run_tasks_with_dask():
+    """Check that tasks can be run on a Dask cluster."""
+    distributed = pytest.importorskip('dask.distributed')
+    tasks = _get_named_tasks()
+    with distributed.LocalCluster(n_workers=2, processes=False) as cluster:
+        executor = DaskExecutor(cluster.scheduler_address)
+        try:
+            assert executor.max_workers >= 2
+            run_tasks(tasks, executor=executor)
+        finally:
+            executor.shutdown()
+    _check_outputs(tasks)
+
+
+def test_get_executor():
+    assert get_executor({'task_executor': 'multiprocessing'}) is None
+    with pytest.raises(ValueError, match='Unknown task_executor'):
+        get_executor({'task_executor': 'mpi'})
+
+
+def test_get_executor_without_distributed(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'dask.distributed', None)
+    with pytest.raises(ImportError, match='esmvalcore\\[dask\\]'):
+        get_executor({'task_executor': 'dask'})
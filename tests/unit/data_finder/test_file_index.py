@@ -0,0 +1,92 @@
+"""Unit tests for :mod:`esmvalcore._file_index`."""
+import os
+
+from esmvalcore._file_index import FileIndex
+
+
+def _create_files(root, filenames):
+    for filename in filenames:
+        path = root / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+
+
+def test_find_files(tmp_path):
+    """Test that files are found in directories and subdirectories."""
+    root = tmp_path / 'data'
+    _create_files(root, [
+        'a/ta_1990.nc',
+        'a/b/ta_2000.nc',
+        'a/b/pr_2000.nc',
+        'a_b/ta_2010.nc',
+    ])
+    index = FileIndex(str(tmp_path / 'index.sqlite'))
+
+    files = index.find_files([str(root / 'a')], ['ta_*.nc'])
+
+    assert files == [
+        str(root / 'a' / 'ta_1990.nc'),
+        str(root / 'a' / 'b' / 'ta_2000.nc'),
+    ]
+
+
+def test_refresh_is_incremental(tmp_path):
+    """Test that only modified directories are listed again."""
+    root = tmp_path / 'data'
+    _create_files(root, ['a/ta_1990.nc', 'b/ta_1990.nc'])
+    index = FileIndex(str(tmp_path / 'index.sqlite'))
+
+    assert index.refresh(str(root)) == 3
+    assert index.refresh(str(root)) == 0
+
+    _create_files(root, ['b/ta_2000.nc'])
+    os.utime(root / 'b', (0, 0))
+    assert index.refresh(str(root)) == 1
+    assert index.find_files([str(root / 'b')], ['*.nc']) == [
+        str(root / 'b' / 'ta_1990.nc'),
+        str(root / 'b' / 'ta_2000.nc'),
+    ]
+
+
+def test_removed_directory(tmp_path):
+    """Test that removed directories are removed from the index."""
+    root = tmp_path / 'data'
+    _create_files(root, ['a/ta_1990.nc'])
+    index = FileIndex(str(tmp_path / 'index.sqlite'))
+    index.refresh(str(root))
+
+    os.remove(root / 'a' / 'ta_1990.nc')
+    os.rmdir(root / 'a')
+
+    assert index.find_files([str(root)], ['*.nc']) == []
+
+
+def test_case_sensitive(tmp_path):
+    """Test that directories differing only in case are distinct."""
+    root = tmp_path / 'data'
+    _create_files(root, ['CMIP6/a/ta_1990.nc'])
+    index = FileIndex(str(tmp_path / 'index.sqlite'))
+    index.refresh(str(root))
+
+    # Refreshing a directory that does not exist removes it from the index
+    index.refresh(str(root / 'cmip6'))
+
+    assert index.find_files([str(root / 'CMIP6')], ['*.nc']) == [
+        str(root / 'CMIP6' / 'a' / 'ta_1990.nc'),
+    ]
+
+
+def test_find_files_does_not_refresh(tmp_path, monkeypatch):
+    """Test that up to date directories are not walked again."""
+    root = tmp_path / 'data'
+    _create_files(root, ['a/b/ta_1990.nc'])
+    index = FileIndex(str(tmp_path / 'index.sqlite'))
+    index.refresh(str(root))
+
+    def _fail(*_):
+        raise AssertionError("Directory tree walked again")
+
+    monkeypatch.setattr(index, 'refresh', _fail)
+    assert index.find_files([str(root / 'a')], ['*.nc']) == [
+        str(root / 'a' / 'b' / 'ta_1990.nc'),
+    ]
@@ -0,0 +1,171 @@
+"""Unit tests for :mod:`esmvalcore._file_metadata`."""
+from datetime import datetime
+
+import numpy as np
+import pytest
+from netCDF4 import Dataset
+
+import esmvalcore._file_metadata
+from esmvalcore._data_finder import select_files
+from esmvalcore._file_metadata import (covers_period, get_attributes,
+                                       get_covered_years, get_data_size,
+                                       get_horizontal_size, get_time_coverage)
+
+
+def _create_file(path, start, end, bounds=True, calendar='standard'):
+    """Create a netCDF file with a monthly time coordinate."""
+    with Dataset(path, 'w') as dataset:
+        dataset.createDimension('time', None)
+        dataset.createDimension('bnds', 2)
+        time = dataset.createVariable('time', 'f8', ('time', ))
+        time.standard_name = 'time'
+        time.units = 'days since 1850-01-01'
+        time.calendar = calendar
+        points = np.arange(start, end, 30.) + 15.
+        time[:] = points
+        if bounds:
+            time.bounds = 'time_bnds'
+            time_bnds = dataset.createVariable('time_bnds', 'f8',
+                                               ('time', 'bnds'))
+            time_bnds[:] = np.stack([points - 15., points + 15.], axis=-1)
+    return str(path)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return str(tmp_path / 'file_metadata.sqlite')
+
+
+def test_get_time_coverage(tmp_path, cache):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.,
+                            calendar='360_day')
+    coverage = get_time_coverage(filename, cache)
+    assert coverage == {
+        'units': 'days since 1850-01-01',
+        'calendar': '360_day',
+        'start': 0.,
+        'end': 360.,
+        'bounds': True,
+    }
+    assert list(get_covered_years(coverage)) == [1850]
+    assert covers_period(coverage, datetime(1850, 6, 1), datetime(1851, 1, 1))
+    assert not covers_period(coverage, datetime(1851, 1, 1),
+                             datetime(1852, 1, 1))
+
+
+def test_get_time_coverage_no_time(tmp_path, cache):
+    filename = str(tmp_path / 'sftlf_fx.nc')
+    with Dataset(filename, 'w') as dataset:
+        dataset.createDimension('lat', 1)
+        dataset.createVariable('lat', 'f8', ('lat', ))
+    assert get_time_coverage(filename, cache) is None
+
+
+def test_get_time_coverage_cached(tmp_path, cache, monkeypatch):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.)
+    reference = get_time_coverage(filename, cache)
+
+    def read_time_coverage(_):
+        raise AssertionError("File read again")
+
+    monkeypatch.setattr(esmvalcore._file_metadata, 'read_time_coverage',
+                        read_time_coverage)
+    assert get_time_coverage(filename, cache) == reference
+
+
+def test_select_files(tmp_path, cache):
+    """Test that files touching the period at the edges are skipped."""
+    filenames = [
+        # Named after years, but covers 1850 only
+        _create_file(tmp_path / 'tas_1850-1851.nc', 0., 360.,
+                     calendar='360_day'),
+        _create_file(tmp_path / 'tas_1851-1852.nc', 360., 720.,
+                     calendar='360_day'),
+        _create_file(tmp_path / 'tas_1852-1853.nc', 720., 1080.,
+                     calendar='360_day'),
+    ]
+    selection = select_files(filenames, 1851, 1851, cache)
+    assert selection == filenames[1:2]
+    assert select_files(filenames, 1851, 1851) == filenames[:2]
+
+
+@pytest.mark.parametrize('units', ['days since', 'kg', 'days since x'])
+def test_covers_period_broken_units(units):
+    coverage = {
+        'units': units,
+        'calendar': 'standard',
+        'start': 0.,
+        'end': 360.,
+        'bounds': True,
+    }
+    assert covers_period(coverage, datetime(1851, 1, 1), datetime(1852, 1, 1))
+
+
+def test_select_files_broken_units(tmp_path, cache):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.)
+    with Dataset(filename, 'a') as dataset:
+        dataset.variables['time'].units = 'days since unknown'
+    assert select_files([filename], 1851, 1851, cache) == [filename]
+
+
+def _assert_attributes_equal(attributes, reference):
+    assert sorted(attributes) == sorted(reference)
+    for attr, value in reference.items():
+        assert type(attributes[attr]) is type(value)
+        np.testing.assert_array_equal(attributes[attr], value)
+        if isinstance(value, np.ndarray):
+            assert attributes[attr].dtype == value.dtype
+
+
+def test_get_attributes_cached(tmp_path, cache, monkeypatch):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.)
+    with Dataset(filename, 'a') as dataset:
+        dataset.tracking_id = 'abc'
+        dataset.realization = np.int32(1)
+        dataset.valid_range = np.array([0., 1.], dtype=np.float32)
+    reference = {
+        'tracking_id': 'abc',
+        'realization': np.int32(1),
+        'valid_range': np.array([0., 1.], dtype=np.float32),
+    }
+    _assert_attributes_equal(get_attributes(filename), reference)
+    _assert_attributes_equal(get_attributes(filename, cache), reference)
+
+    def read_attributes(_):
+        raise AssertionError("File read again")
+
+    monkeypatch.setattr(esmvalcore._file_metadata, 'read_attributes',
+                        read_attributes)
+    esmvalcore._file_metadata._FILE_METADATA_CACHES.clear()
+    _assert_attributes_equal(get_attributes(filename, cache), reference)
+
+
+def test_get_data_size(tmp_path, cache):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.)
+    with Dataset(filename, 'a') as dataset:
+        dataset.createDimension('lat', 10)
+        tas = dataset.createVariable('tas', 'i2', ('time', 'lat'))
+        tas.scale_factor = 0.1
+        pr = dataset.createVariable('pr', 'f4', ('time', 'lat'))
+        pr.units = 'kg m-2 s-1'
+    # time: 12 * 8, time_bnds: 12 * 2 * 8, tas: 12 * 10 * 8, pr: 12 * 10 * 4
+    assert get_data_size(filename, cache) == 1728
+    assert get_data_size(filename) == 1728
+
+    other = tmp_path / 'data.txt'
+    other.write_text('data')
+    assert get_data_size(str(other), cache) == 4
+
+
+def test_get_horizontal_size(tmp_path, cache):
+    filename = _create_file(tmp_path / 'tas_1850.nc', 0., 360.)
+    assert get_horizontal_size(filename, cache) is None
+    with Dataset(filename, 'a') as dataset:
+        dataset.createDimension('j', 3)
+        dataset.createDimension('i', 4)
+        lat = dataset.createVariable('latitude', 'f8', ('j', 'i'))
+        lat.standard_name = 'latitude'
+        lon = dataset.createVariable('longitude', 'f8', ('j', 'i'))
+        lon.standard_name = 'longitude'
+    assert get_horizontal_size(filename, cache) == 12
+    assert get_horizontal_size(filename) == 12
@@ -0,0 +1,48 @@
+"""Unit tests for :func:`esmvalcore._data_finder.select_files`."""
+from datetime import datetime
+
+import pytest
+
+from esmvalcore._data_finder import get_start_end_date, select_files
+
+FILENAMES = [
+    'tas_Amon_CanESM2_historical_r1i1p1_185001-185012.nc',
+    'tas_Amon_CanESM2_historical_r1i1p1_185101-185106.nc',
+    'tas_Amon_CanESM2_historical_r1i1p1_185107-185112.nc',
+    'tas_Amon_CanESM2_historical_r1i1p1_185201-185212.nc',
+]
+
+
+@pytest.mark.parametrize('filename,start,end', [
+    ('tas_1850.nc', datetime(1850, 1, 1), datetime(1851, 1, 1)),
+    ('tas_185003-185012.nc', datetime(1850, 3, 1), datetime(1851, 1, 1)),
+    ('tas_18500301-18500630.nc', datetime(1850, 3, 1), datetime(1850, 7, 1)),
+    ('tas_18501231.nc', datetime(1850, 12, 31), datetime(1851, 1, 1)),
+    ('tas_18500101-18501230.nc', datetime(1850, 1, 1), datetime(1850, 12,
+                                                                 31)),
+    ('tas_18500101-18500230.nc', datetime(1850, 1, 1), datetime(1851, 1, 1)),
+])
+def test_get_start_end_date(filename, start, end):
+    assert get_start_end_date(filename) == (start, end)
+
+
+def test_select_files_years():
+    assert select_files(FILENAMES, 1851, 1851) == FILENAMES[1:3]
+
+
+def test_select_files_dates():
+    selection = select_files(FILENAMES,
+                             1851,
+                             1851,
+                             start_date=datetime(1851, 8, 1),
+                             end_date=datetime(1851, 9, 1))
+    assert selection == FILENAMES[2:3]
+
+
+def test_select_files_dates_at_file_edges():
+    selection = select_files(FILENAMES,
+                             1851,
+                             1852,
+                             start_date=datetime(1851, 7, 1),
+                             end_date=datetime(1852, 1, 1))
+    assert selection == FILENAMES[2:3]
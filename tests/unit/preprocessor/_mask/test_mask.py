@@ -2,6 +2,7 @@
 
 import unittest
 
+import dask.array as da
 import numpy as np
 from numpy.testing import assert_array_equal, assert_equal
 
@@ -54,6 +55,14 @@ class Test(tests.Test):
                                  mask=dummy_fx_mask.mask)
         assert_array_equal(fixed_mask, app_mask)
 
+    def test_apply_fx_mask_lazy(self):
+        """Test _apply_fx_mask func on lazy data."""
+        dummy_fx_mask = np.array([True, False, True])
+        data = da.ma.masked_array(da.arange(3.), mask=[False, True, False])
+        app_mask = _apply_fx_mask(dummy_fx_mask, data)
+        self.assertIsInstance(app_mask, da.Array)
+        assert_array_equal(app_mask.compute().mask, [True, True, True])
+
     def test_check_dims(self):
         """Test _check_dims func."""
         malformed_cube = self.arr[0]
@@ -97,6 +106,13 @@ class Test(tests.Test):
         expected = np.ma.array(self.data2, mask=[[False, False], [True, True]])
         assert_array_equal(result.data, expected)
 
+    def test_mask_above_threshold_lazy(self):
+        """Test that masking above a threshold keeps the data lazy."""
+        cube = self.arr.copy(da.asarray(self.data2))
+        result = mask_above_threshold(cube, 1.5)
+        self.assertTrue(result.has_lazy_data())
+        assert_array_equal(result.data.mask, [[False, False], [True, True]])
+
     def test_mask_below_threshold(self):
         """Test to mask below a threshold."""
         result = mask_below_threshold(self.arr, 1.5)
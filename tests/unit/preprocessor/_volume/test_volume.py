@@ -2,6 +2,7 @@
 
 import unittest
 
+import dask.array as da
 import iris
 import numpy as np
 from cf_units import Unit
@@ -100,6 +101,35 @@ class Test(tests.Test):
         expected = np.array([1., 1., 1., 1.])
         self.assertArrayEqual(result.data, expected)
 
+    def test_volume_statistics_lazy(self):
+        """Test that the volume weighted average keeps the data lazy."""
+        data = da.ma.masked_array(self.grid_4d_2.core_data())
+        cube = self.grid_4d_2.copy(data)
+        result = volume_statistics(cube, 'mean')
+        self.assertTrue(result.has_lazy_data())
+        expected = np.array([1., 1., 1., 1.])
+        self.assertArrayEqual(result.data, expected)
+
+    def test_volume_statistics_weights(self):
+        """Test that the average is weighted by the unmasked volume."""
+        data = np.ma.masked_array(self.grid_4d_2.data.copy())
+        data[:, 0] = 2.
+        cube = self.grid_4d_2.copy(data)
+        result = volume_statistics(cube, 'mean')
+        volume = np.array([2.5, 22.5, 225.])
+        expected = (2. * volume[0] + volume[1:].sum()) / volume.sum()
+        self.assertArrayAlmostEqual(result.data[1:], [expected] * 3)
+
+    def test_volume_statistics_weights_unmasked(self):
+        """Test that layers are weighted by volume without a mask too."""
+        data = self.grid_4d_2.data.filled()
+        data[:, 0] = 2.
+        cube = self.grid_4d_2.copy(data)
+        result = volume_statistics(cube, 'mean')
+        volume = np.array([2.5, 22.5, 225.])
+        expected = (2. * volume[0] + volume[1:].sum()) / volume.sum()
+        self.assertArrayAlmostEqual(result.data, [expected] * 4)
+
     def test_depth_integration_1d(self):
         """Test to take the depth integration of a 3 layer cube."""
         result = depth_integration(self.grid_3d[:, 0, 0])
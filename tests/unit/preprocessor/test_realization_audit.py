@@ -0,0 +1,67 @@
+"""Tests for the audit of preprocessor steps that realize lazy data."""
+import logging
+
+import dask.array as da
+import iris
+import numpy as np
+import pytest
+
+import esmvalcore.preprocessor
+from esmvalcore.preprocessor import PreprocessorFile
+
+
+def _get_product(tmp_path, step='mask_above_threshold'):
+    product = PreprocessorFile(
+        attributes={'filename': str(tmp_path / 'tas.nc')},
+        settings={step: {'threshold': 1.}},
+    )
+    data = da.ma.masked_array(da.arange(4, dtype=np.float32))
+    product.cubes = [iris.cube.Cube(data, var_name='tas')]
+    return product
+
+
+def _realize(cube, threshold):
+    """Preprocessor function that loads the data into memory."""
+    cube.data = np.ma.masked_greater(cube.data, threshold)
+    return cube
+
+
+def test_lazy_step(tmp_path, caplog):
+    product = _get_product(tmp_path)
+    with caplog.at_level(logging.WARNING):
+        product.apply('mask_above_threshold', realization_audit='error')
+    assert product.cubes[0].has_lazy_data()
+    assert not caplog.records
+
+
+def test_realizing_step_warn(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(esmvalcore.preprocessor, 'mask_above_threshold',
+                        _realize)
+    product = _get_product(tmp_path)
+    with caplog.at_level(logging.WARNING):
+        product.apply('mask_above_threshold', realization_audit='warn')
+    assert not product.cubes[0].has_lazy_data()
+    assert 'mask_above_threshold loaded the data' in caplog.text
+
+
+def test_realizing_step_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(esmvalcore.preprocessor, 'mask_above_threshold',
+                        _realize)
+    product = _get_product(tmp_path)
+    with pytest.raises(ValueError, match='mask_above_threshold'):
+        product.apply('mask_above_threshold', realization_audit='error')
+
+
+def test_no_audit(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(esmvalcore.preprocessor, 'mask_above_threshold',
+                        _realize)
+    product = _get_product(tmp_path)
+    with caplog.at_level(logging.WARNING):
+        product.apply('mask_above_threshold')
+    assert not caplog.records
+
+
+def test_invalid_mode(tmp_path):
+    product = _get_product(tmp_path)
+    with pytest.raises(ValueError, match='realization_audit'):
+        product.apply('mask_above_threshold', realization_audit='warning')
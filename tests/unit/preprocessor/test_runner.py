@@ -1,5 +1,7 @@
 from esmvalcore.preprocessor import (DEFAULT_ORDER, MULTI_MODEL_FUNCTIONS,
-                                     _get_itype)
+                                     STREAMING_SETUP_FUNCTIONS,
+                                     TIME_LOCAL_FUNCTIONS, _get_itype,
+                                     _split_streaming_steps)
 
 
 def test_first_argument_name():
@@ -14,3 +16,17 @@ def test_first_argument_name():
 
 def test_multi_model_exist():
     assert MULTI_MODEL_FUNCTIONS.issubset(set(DEFAULT_ORDER))
+
+
+def test_time_local_exist():
+    assert TIME_LOCAL_FUNCTIONS.issubset(set(DEFAULT_ORDER))
+    assert STREAMING_SETUP_FUNCTIONS.issubset(set(DEFAULT_ORDER))
+    assert not TIME_LOCAL_FUNCTIONS & MULTI_MODEL_FUNCTIONS
+
+
+def test_split_streaming_steps():
+    steps = ['fix_metadata', 'concatenate', 'fix_data', 'regrid']
+    assert _split_streaming_steps(steps) == (
+        ['fix_metadata', 'concatenate'], ['fix_data', 'regrid'])
+    assert _split_streaming_steps(steps[:2]) is None
+    assert _split_streaming_steps(steps + ['annual_statistics']) is None
@@ -0,0 +1,139 @@
+"""Tests for :mod:`esmvalcore._fingerprint`."""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from esmvalcore._fingerprint import (find_previous_preproc_dir,
+                                     get_product_key, get_reusable_files,
+                                     get_settings_fingerprint,
+                                     get_task_fingerprint, link_file,
+                                     write_fingerprint)
+from esmvalcore._provenance import TrackedFile
+
+
+def _get_task(input_file, output_dir, **settings):
+    """Create a preprocessing task with a single product."""
+    filename = os.path.join(output_dir, 'preproc', 'diag', 'tas',
+                            'CMIP6_tas.nc')
+    settings.setdefault('save', {'filename': filename})
+    product = TrackedFile(filename, {
+        'filename': filename,
+        'short_name': 'tas',
+    }, [TrackedFile(input_file, {})])
+    product.settings = settings
+    return SimpleNamespace(name='diag/tas', products={product})
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    filename = tmp_path / 'input' / 'tas.nc'
+    filename.parent.mkdir()
+    filename.write_text('data')
+    return str(filename)
+
+
+def test_fingerprint(tmp_path, input_file):
+    run1 = str(tmp_path / 'recipe_test_20200101_000000')
+    run2 = str(tmp_path / 'recipe_test_20200102_000000')
+    fingerprint = get_task_fingerprint(
+        _get_task(input_file, run1), os.path.join(run1, 'preproc'))
+
+    # Identical for a different output directory
+    assert fingerprint == get_task_fingerprint(
+        _get_task(input_file, run2), os.path.join(run2, 'preproc'))
+
+    # Different if the settings change
+    assert fingerprint != get_task_fingerprint(
+        _get_task(input_file, run2, regrid={'target_grid': '2x2'}),
+        os.path.join(run2, 'preproc'))
+
+    # Different if the input data changes
+    with open(input_file, 'a') as file:
+        file.write('more data')
+    assert fingerprint != get_task_fingerprint(
+        _get_task(input_file, run2), os.path.join(run2, 'preproc'))
+
+
+def test_reuse_output(tmp_path, input_file):
+    run1 = str(tmp_path / 'recipe_test_20200101_000000')
+    run2 = str(tmp_path / 'recipe_test_20200102_000000')
+    os.makedirs(os.path.join(run2, 'preproc'))
+    assert find_previous_preproc_dir(run2) is None
+
+    # Create the output of the first run
+    task1 = _get_task(input_file, run1)
+    task1.fingerprint = get_task_fingerprint(task1,
+                                             os.path.join(run1, 'preproc'))
+    previous_file = next(iter(task1.products)).filename
+    os.makedirs(os.path.dirname(previous_file))
+    with open(previous_file, 'w') as file:
+        file.write('preprocessed data')
+    write_fingerprint(task1)
+
+    previous_preproc_dir = find_previous_preproc_dir(run2)
+    assert previous_preproc_dir == os.path.join(run1, 'preproc')
+
+    task2 = _get_task(input_file, run2)
+    task2.fingerprint = get_task_fingerprint(task2,
+                                             os.path.join(run2, 'preproc'))
+    files = get_reusable_files(task2, os.path.join(run2, 'preproc'),
+                               previous_preproc_dir)
+    filename = next(iter(task2.products)).filename
+    assert files == {filename: previous_file}
+
+    link_file(previous_file, filename)
+    with open(filename) as file:
+        assert file.read() == 'preprocessed data'
+
+    task2.fingerprint = 'other'
+    assert get_reusable_files(task2, os.path.join(run2, 'preproc'),
+                              previous_preproc_dir) is None
+
+
+def test_product_key(tmp_path, input_file):
+    run1 = str(tmp_path / 'recipe_a_20200101_000000')
+    run2 = str(tmp_path / 'recipe_b_20200102_000000')
+    product1 = next(iter(_get_task(input_file, run1).products))
+    product2 = next(iter(_get_task(input_file, run2).products))
+    product2.attributes['alias'] = 'other'
+    product2.settings['fix_file'] = {
+        'output_dir': os.path.join(run2, 'preproc', 'other', 'tas_fixed'),
+    }
+    product1.settings['fix_file'] = {
+        'output_dir': os.path.join(run1, 'preproc', 'diag', 'tas_fixed'),
+    }
+    key = get_product_key(product1, os.path.join(run1, 'preproc'))
+    assert key == get_product_key(product2, os.path.join(run2, 'preproc'))
+
+    product2.settings['save']['compress'] = True
+    assert key != get_product_key(product2, os.path.join(run2, 'preproc'))
+
+
+def test_settings_fingerprint(tmp_path, input_file):
+    run1 = str(tmp_path / 'recipe_test_20200101_000000')
+    run2 = str(tmp_path / 'recipe_test_20200102_000000')
+    settings = {'mask_landsea': {'fx_files': [input_file]}}
+    fingerprint = get_settings_fingerprint(
+        _get_task(input_file, run1, **settings), run1)
+
+    # Identical for a different output directory or changed input data
+    with open(input_file, 'a') as file:
+        file.write('more data')
+    assert fingerprint == get_settings_fingerprint(
+        _get_task(input_file, run2, **settings), run2)
+
+    # Different if the settings change
+    assert fingerprint != get_settings_fingerprint(
+        _get_task(input_file, run2, regrid={'target_grid': '2x2'},
+                  **settings), run2)
+
+    # Diagnostic tasks
+    diagnostic = SimpleNamespace(
+        script='examples/diagnostic.py',
+        settings={'run_dir': os.path.join(run1, 'run', 'diag', 'script')},
+    )
+    fingerprint = get_settings_fingerprint(diagnostic, run1)
+    diagnostic.settings['run_dir'] = os.path.join(run2, 'run', 'diag',
+                                                  'script')
+    assert fingerprint == get_settings_fingerprint(diagnostic, run2)
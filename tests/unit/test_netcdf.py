@@ -0,0 +1,97 @@
+"""Tests for :mod:`esmvalcore._netcdf`."""
+import threading
+
+import dask.array as da
+import iris
+import iris.fileformats.netcdf
+import numpy as np
+from iris.cube import Cube
+
+import esmvalcore.preprocessor  # noqa: F401, installs the wrappers in Iris
+from esmvalcore import _netcdf
+from esmvalcore._file_metadata import NETCDF_LOCK
+
+
+def _is_locked():
+    """Check if another thread holds `NETCDF_LOCK`."""
+    result = []
+
+    def _try_lock():
+        if NETCDF_LOCK.acquire(blocking=False):
+            NETCDF_LOCK.release()
+            result.append(False)
+        else:
+            result.append(True)
+
+    thread = threading.Thread(target=_try_lock)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class _Variable:
+    """Record if `NETCDF_LOCK` is held while accessing a variable."""
+
+    def __init__(self):
+        self.locked = []
+        self.values = {}
+
+    def __getitem__(self, key):
+        self.locked.append(_is_locked())
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.locked.append(_is_locked())
+        self.values[key] = value
+
+    def ncattrs(self):
+        self.locked.append(_is_locked())
+        return []
+
+
+def test_calls_hold_lock():
+    variable = _Variable()
+    wrapper = _netcdf._ThreadSafe(variable)
+
+    wrapper[0] = 1.
+    assert wrapper[0] == 1.
+    assert wrapper.ncattrs() == []
+    assert variable.locked == [True, True, True]
+    assert not _is_locked()
+
+
+def test_lazy_value_computed_without_lock():
+    computed = []
+
+    def _compute(block):
+        # Dask may call this with an empty block to find the output type
+        if block.size:
+            computed.append(_is_locked())
+        return block
+
+    variable = _Variable()
+    wrapper = _netcdf._ThreadSafe(variable)
+    wrapper[0] = da.arange(3, chunks=-1).map_blocks(_compute, dtype=int)
+
+    assert computed == [False]
+    np.testing.assert_array_equal(variable.values[0], np.arange(3))
+
+
+def test_iris_uses_wrappers():
+    assert iris.fileformats.netcdf.netCDF4.Dataset is _netcdf.Dataset
+
+
+def test_lazy_read_waits_for_lock(tmp_path):
+    filename = str(tmp_path / 'tas.nc')
+    iris.save(Cube(np.arange(4.), var_name='tas', units='K'), filename)
+    cube = iris.load_cube(filename)
+    assert cube.has_lazy_data()
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(cube.data))
+    with NETCDF_LOCK:
+        thread.start()
+        thread.join(0.1)
+        assert thread.is_alive()
+    thread.join()
+    np.testing.assert_array_equal(result[0], np.arange(4.))
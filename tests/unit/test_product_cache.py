@@ -0,0 +1,46 @@
+"""Tests for :mod:`esmvalcore._product_cache`."""
+import os
+
+from esmvalcore._product_cache import ProductCache, get_product_cache
+
+
+def _create_file(path, size):
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_get_product_cache(tmp_path):
+    assert get_product_cache({'preprocessing_cache_dir': None}) is None
+    cache = get_product_cache({
+        'preprocessing_cache_dir': str(tmp_path / 'cache'),
+        'preprocessing_cache_max_size': 1,
+    })
+    assert cache.path == str(tmp_path / 'cache')
+    assert cache.max_size == 2**30
+
+
+def test_publish_link(tmp_path):
+    cache = ProductCache(str(tmp_path / 'cache'))
+    filename = _create_file(tmp_path / 'tas.nc', 10)
+    target = str(tmp_path / 'preproc' / 'tas.nc')
+
+    assert not cache.link('abc', target)
+    cache.publish('abc', filename)
+    os.remove(filename)
+    assert cache.link('abc', target)
+    with open(target, 'rb') as file:
+        assert file.read() == b'x' * 10
+
+
+def test_evict(tmp_path):
+    cache = ProductCache(str(tmp_path / 'cache'), max_size=25 / 2**30)
+    for key in ('a1', 'b2', 'c3'):
+        cache.publish(key, _create_file(tmp_path / (key + '.nc'), 10))
+        if key == 'b2':
+            # Use the first file, so the second becomes least recently used
+            assert cache.link('a1', str(tmp_path / 'out' / 'a1.nc'))
+
+    assert os.path.exists(cache.get_path('a1'))
+    assert not os.path.exists(cache.get_path('b2'))
+    assert os.path.exists(cache.get_path('c3'))
+    assert not cache.link('b2', str(tmp_path / 'out' / 'b2.nc'))
@@ -0,0 +1,47 @@
+"""Tests for :mod:`esmvalcore._provenance`."""
+import pickle
+from types import SimpleNamespace
+
+import pytest
+
+from esmvalcore._provenance import (TrackedFile, get_recipe_provenance,
+                                    get_task_provenance)
+
+
+@pytest.fixture
+def product(tmp_path):
+    recipe = get_recipe_provenance({'description': 'test'},
+                                   str(tmp_path / 'recipe_test.yml'))
+    activity = get_task_provenance(SimpleNamespace(name='diag/tas'), recipe)
+    ancestor = TrackedFile(str(tmp_path / 'input.nc'), {'tracking_id': 'x'})
+    product = TrackedFile(str(tmp_path / 'output.nc'), {'short_name': 'tas'},
+                          [ancestor])
+    product.initialize_provenance(activity)
+    return product
+
+
+def test_compact(product, tmp_path):
+    compact = product.compact()
+    assert (tmp_path / 'output_provenance.xml').exists()
+    assert compact.filename == product.filename
+    assert compact.attributes == product.attributes
+    assert compact.ancestors == []
+    assert len(pickle.dumps(compact)) < len(pickle.dumps(product))
+
+    # The provenance is read from file when it is used
+    assert compact._provenance is None
+    assert compact.entity.identifier == product.entity.identifier
+    assert compact.activity.identifier == product.activity.identifier
+    ancestor = product.ancestors[0]
+    assert compact.provenance.get_record('file:' + ancestor.filename)
+
+
+def test_copy_provenance_from_compact(product):
+    target = TrackedFile(product.filename, {})
+    product.compact().copy_provenance(target=target)
+    assert target.attributes == product.attributes
+    assert target._provenance is None
+    assert target.entity.identifier == product.entity.identifier
+
+    with pytest.raises(ValueError):
+        TrackedFile(product.filename, {}).compact()
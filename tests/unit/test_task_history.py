@@ -0,0 +1,39 @@
+"""Tests for :mod:`esmvalcore._task_history`."""
+import pytest
+
+from esmvalcore._task_history import (DEFAULT_THROUGHPUT, TaskHistory,
+                                      estimate_runtimes, get_task_history_path)
+
+
+def test_get_task_history_path(tmp_path):
+    path = get_task_history_path({'auxiliary_data_dir': str(tmp_path)})
+    assert path == str(tmp_path / 'task_history.sqlite')
+
+
+def test_task_history(tmp_path):
+    history = TaskHistory(str(tmp_path / 'aux' / 'task_history.sqlite'))
+    assert history.get('diag/tas', 'abc') is None
+
+    history.add([('diag/tas', 'abc', 10.5, 2**30)])
+    assert history.get('diag/tas', 'abc') == (10.5, 2**30)
+    assert history.get('diag/tas', 'def') is None
+
+    # Only the last run is kept
+    history.add([('diag/tas', 'abc', 5., None)])
+    assert TaskHistory(history.path).get('diag/tas', 'abc') == (5., None)
+
+
+def test_estimate_runtimes():
+    runtimes = {'a': 10., 'c': 4.}
+    sizes = {'a': 100, 'b': 50, 'd': 0}
+    assert estimate_runtimes(runtimes, sizes) == {
+        'a': 10.,
+        'b': 5.,
+        'c': 4.,
+        'd': 0.,
+    }
+
+
+def test_estimate_runtimes_without_history():
+    estimates = estimate_runtimes({}, {'a': DEFAULT_THROUGHPUT})
+    assert estimates == {'a': pytest.approx(1.)}